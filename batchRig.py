@@ -0,0 +1,280 @@
+'''Rig curves across many scene files, in parallel headless Maya sessions.
+
+    python batchRig.py manifest.json                 #one mayapy per core
+    python batchRig.py manifest.json -j 4 --mayapy /path/to/mayapy
+    python batchRig.py manifest.json --fake          #plain python on mockCmds
+
+The manifest is json, a list of jobs or {'defaults': {...}, 'jobs': [...]}.
+Each job names a scene and the curves to rig in it, as rigCurves specs:
+
+    {"scene": "instrument01.ma",
+     "curves": [{"crv": "cable1", "geo": "cable1_geo", "numJoints": 40}, "cable2"],
+     "output": "instrument01_rigged.ma"}
+
+defaults are rigFromCurve keyword args for every curve, which a curve's own
+spec overrides. A job can also give a 'template' (a PlanTemplate json file,
+see RigCurveTool.captureTemplate), a 'name' (the scene as written otherwise) and
+an 'output' (<scene>_rigged.<ext> otherwise; the scene itself is never
+overwritten unless output says so).
+
+Every job runs in its own worker process, which opens the scene, rigs the
+curves and saves the output. A job that fails on any curve isn't saved.
+Finished jobs are appended to a status file (<manifest>.status.jsonl) as
+they come in, and a later run skips the jobs it holds as ok, so a batch
+can be resumed after failures or an interrupt. Each worker's output goes
+to <manifest>_logs/<job>.log.
+
+With --fake the workers are plain python running on mockCmds, so the
+driver can be tried without Maya. Scenes still have to exist; the curves
+and geo a job names are made up in each opened scene.
+'''
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKER = os.path.abspath(__file__)
+
+
+def loadManifest(path):
+    '''the jobs in a manifest file, with defaults merged into every curve spec'''
+    with open(path) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    names = set()
+    for job in manifest['jobs']:
+        if 'scene' not in job or not job.get('curves'):
+            raise ValueError('every job needs a scene and some curves: %s' % json.dumps(job))
+        job = dict(job)
+        job.setdefault('name', job['scene'])
+        job['scene'] = _fromManifest(path, job['scene'])
+        if job['name'] in names:
+            raise ValueError('two jobs are called %s, give them names' % job['name'])
+        names.add(job['name'])
+        if job.get('output'):
+            job['output'] = _fromManifest(path, job['output'])
+        else:
+            base, ext = os.path.splitext(job['scene'])
+            job['output'] = base + '_rigged' + ext
+        if job.get('template'):
+            job['template'] = _fromManifest(path, job['template'])
+        curves = []
+        for spec in job['curves']:
+            if not isinstance(spec, dict):
+                spec = {'crv': spec}
+            if not job.get('template'):
+                spec = dict(defaults, **spec)
+            curves.append(spec)
+        job['curves'] = curves
+        jobs.append(job)
+    return jobs
+
+
+def _fromManifest(manifest, path):
+    '''paths in a manifest are relative to it'''
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(manifest)), path))
+
+
+def readStatus(path):
+    '''{job name: its last result} from a status file'''
+    status = dict()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    status[result['name']] = result
+    return status
+
+
+def workerCommand(mayapy=None, fake=False):
+    '''the command line a worker runs with, before the job and result paths'''
+    if fake:
+        return [sys.executable, WORKER, '--worker', '--fake']
+    return [mayapy or 'mayapy', WORKER, '--worker']
+
+
+def runBatch(jobs, statusPath, logDir, workers=None, command=None, timeout=None, report=print):
+    '''Run jobs over a pool of worker processes, at most workers (one per
+    core by default) at a time. Jobs statusPath holds as ok are skipped.
+    command is the worker command line (see workerCommand). A job taking
+    longer than timeout seconds is killed and counted as failed.
+    report is called with a line of text as each job starts and finishes.
+    Returns the results of the jobs run, in the order they finished.
+    '''
+    workers = workers or multiprocessing.cpu_count()
+    command = command or workerCommand()
+    done = readStatus(statusPath)
+    todo = [job for job in jobs if done.get(job['name'], {}).get('status') != 'ok']
+    if len(todo) < len(jobs):
+        report('skipping %d jobs already done' % (len(jobs) - len(todo)))
+    if not os.path.isdir(logDir):
+        os.makedirs(logDir)
+    scratch = tempfile.mkdtemp(prefix='batchRig')
+    running = []
+    results = []
+    start = time.time()
+    try:
+        while todo or running:
+            while todo and len(running) < workers:
+                running.append(_startJob(todo.pop(0), command, scratch, logDir))
+            time.sleep(0.05)
+            for task in list(running):
+                finished = task['process'].poll() is not None
+                late = timeout and time.time() - task['start'] > timeout
+                if not (finished or late):
+                    continue
+                if late and not finished:
+                    task['process'].kill()
+                    task['process'].wait()
+                running.remove(task)
+                result = _finishJob(task, 'timed out after %ds' % timeout if late and not finished else None)
+                with open(statusPath, 'a') as f:
+                    f.write(json.dumps(result, sort_keys=True) + '\n')
+                results.append(result)
+                report('[%d/%d] %-6s %6.1fs  %s%s' % (len(results), len(results) + len(todo) + len(running),
+                    result['status'], result['time'], result['name'],
+                    '  (%s)' % result['error'] if result['error'] else ''))
+    finally:
+        #interrupted, don't leave workers behind
+        for task in running:
+            task['process'].kill()
+            task['process'].wait()
+            task['log'].close()
+        shutil.rmtree(scratch, ignore_errors=True)
+    wall = time.time() - start
+    busy = sum(result['time'] for result in results)
+    failed = len([result for result in results if result['status'] != 'ok'])
+    report('%d jobs, %d failed, %.1fs (%.1fs of work, %.1fx)' % (len(results), failed, wall, busy,
+        busy / wall if wall else 0.0))
+    return results
+
+
+def _startJob(job, command, scratch, logDir):
+    key = re.sub(r'[^\w.-]', '_', job['name'])
+    jobPath = os.path.join(scratch, key + '.job.json')
+    resultPath = os.path.join(scratch, key + '.result.json')
+    with open(jobPath, 'w') as f:
+        json.dump(job, f)
+    if os.path.exists(resultPath):
+        os.remove(resultPath)
+    log = open(os.path.join(logDir, key + '.log'), 'w')
+    process = subprocess.Popen(command + [jobPath, resultPath], stdout=log, stderr=subprocess.STDOUT)
+    return {'job': job, 'process': process, 'log': log, 'result': resultPath, 'start': time.time()}
+
+
+def _finishJob(task, error=None):
+    '''the job's result, from what the worker wrote or how it died'''
+    task['log'].close()
+    job = task['job']
+    result = {'name': job['name'], 'scene': job['scene'], 'output': None, 'rigs': [],
+        'time': time.time() - task['start'], 'error': error}
+    if not error and os.path.exists(task['result']):
+        with open(task['result']) as f:
+            result.update(json.load(f))
+    elif not error:
+        result['error'] = 'worker exited with %s, see %s' % (task['process'].returncode, task['log'].name)
+    result['status'] = 'failed' if result['error'] else 'ok'
+    return result
+
+
+#Worker side, run inside mayapy (or plain python with --fake)
+def runJob(job, fake=False):
+    '''Open the job's scene, rig its curves and save the output.
+    Returns {'output', 'rigs', 'error'}, rigs holding one entry per curve
+    with its rig, build time, stages and error.
+    '''
+    import maya.cmds as cmds
+    import curveRigger
+    import rigPlan
+    cmds.file(job['scene'], open=True, force=True)
+    if fake:
+        _fakeScene(cmds, job)
+    template = rigPlan.PlanTemplate.load(job['template']) if job.get('template') else None
+    specs = [dict((k, v) for k, v in spec.items() if not template or k in ('crv', 'geo', 'geoBind')) for spec in job['curves']]
+    #nobody undoes in a worker, so skip the undo records
+    built = curveRigger.rigCurves(specs, template=template, fast=True)
+    rigs = [{'crv': r['crv'], 'rig': r['rig'], 'time': r['time'], 'error': r['error'],
+        'stages': r['info'].get('stages', [])} for r in built]
+    errors = ['%s: %s' % (r['crv'], r['error']) for r in built if r['error']]
+    if errors:
+        return {'output': None, 'rigs': rigs, 'error': '; '.join(errors)}
+    cmds.file(rename=job['output'])
+    sceneType = 'mayaBinary' if job['output'].lower().endswith('.mb') else 'mayaAscii'
+    cmds.file(save=True, type=sceneType, force=True)
+    return {'output': job['output'], 'rigs': rigs, 'error': None}
+
+
+def _fakeScene(cmds, job):
+    '''make up the curves and geo a job names, in an empty mock scene'''
+    for spec in job['curves']:
+        if not cmds.objExists(spec['crv']):
+            pts = [(i * 2.0, (i % 3) - 1.0, 0.0) for i in range(8)]
+            cmds.rename(cmds.curve(d=3, p=pts, k=[0, 0] + list(range(6)) + [5, 5]), spec['crv'])
+        geo = spec.get('geo')
+        if geo and not cmds.objExists(geo):
+            shape = cmds.createNode('mesh', n=geo + 'Shape')
+            cmds.rename(cmds.listRelatives(shape, p=True)[0], geo)
+
+
+def workerMain(jobPath, resultPath, fake=False):
+    '''run one job file, and write its result where the driver looks'''
+    with open(jobPath) as f:
+        job = json.load(f)
+    if fake:
+        import mockCmds
+        mockCmds.install()
+    else:
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+    try:
+        result = runJob(job, fake)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        result = {'output': None, 'rigs': [], 'error': '%s: %s' % (type(e).__name__, e)}
+    with open(resultPath, 'w') as f:
+        json.dump(result, f)
+    if not fake:
+        maya.standalone.uninitialize()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('manifest', help='job manifest json')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes, one per core by default')
+    parser.add_argument('--mayapy', default=None, help='mayapy to run workers with, mayapy on the PATH by default')
+    parser.add_argument('--fake', action='store_true', help='run workers on mockCmds instead of Maya')
+    parser.add_argument('--timeout', type=float, default=None, help='kill jobs running this many seconds')
+    parser.add_argument('--status', default=None, help='status file, <manifest>.status.jsonl by default')
+    parser.add_argument('--restart', action='store_true', help='ignore the status file and run every job')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args, extra = parser.parse_known_args(argv)
+
+    if args.worker:
+        #the worker is called with the job file in place of a manifest
+        return workerMain(args.manifest, extra[0], args.fake)
+
+    base = os.path.splitext(args.manifest)[0]
+    statusPath = args.status or base + '.status.jsonl'
+    if args.restart and os.path.exists(statusPath):
+        os.remove(statusPath)
+    jobs = loadManifest(args.manifest)
+    results = runBatch(jobs, statusPath, base + '_logs', args.workers,
+        workerCommand(args.mayapy, args.fake), args.timeout)
+    return 1 if [result for result in results if result['status'] != 'ok'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
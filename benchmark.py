@@ -0,0 +1,406 @@
+'''Build cost benchmark for curveRigger, run outside Maya on mockCmds.
+
+    python benchmark.py            #check against benchmark_baseline.json
+    python benchmark.py --update   #store the current numbers as the baseline
+    python benchmark.py --stretch  #compare the ways of measuring stretch
+    python benchmark.py --bake     #compare live playback with a bake
+
+Rigs a test curve across joint counts, control counts and attach modes,
+then updates and clones a large rig, binds geo both ways, rebuilds a rig
+from a warm curveCache and rigs a bundle. For every build it reports the maya.cmds
+calls, the nodes made and the wall time of each stage, as the tool's own
+profiler (see rigProfile) splits them. It exits with 1 if any count goes
+over the baseline. Counts are exact, so they're what it checks. Times
+vary from run to run and machine to machine, so stages that take over
+--time-tolerance times their baseline time are only noted. Times are
+measured on the mock, so they track the tool's own python overhead, not
+what Maya would spend.
+
+--stretch builds rigs with each stretchSamples setting instead, and
+reports how many nodes measure the strip's length and are evaluated per
+frame, how long the sums those nodes do take in numpy, and how far the
+sampled length's stretch is off curveInfo's when the strip is posed.
+RigCurveTool.compareStretch times the same settings in Maya.
+
+--bake builds rigs with skinned geo, bakes them over BAKE_FRAMES frames
+(see curveBake) and reports how many nodes each frame of playback has to
+evaluate to deform the geo, live and from the bake (keys included), and
+what the bake took and its file size. The mock doesn't evaluate, so there
+are no playback rates here; in Maya, RigCurveTool.compareBake times a shot
+both ways.
+'''
+from __future__ import print_function
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import mockCmds
+
+MOCK = mockCmds.install()
+import numpy as np
+import curveCache
+import curveGeometry
+import curveRigger
+import rigProfile
+
+JOINTS = (2, 10, 50, 150)
+CTRLS = (2, 10, 50)
+MODES = ('classic', 'matrix')
+#updateRig changes made to a 150 joint rig, each should cost about what it changes
+UPDATES = (('numJoints', 151), ('numCtrls', 11), ('uMin', 0.1), ('falloff', 'smoothstep'), ('proxyJoints', 12))
+#stretchSamples compared by --stretch, 0 is the curveInfo
+STRETCH_SAMPLES = (0, 4, 8, 16, 32)
+#frames --bake bakes, and the joint counts it bakes (skinned geo needs more than 2)
+BAKE_FRAMES = 240
+BAKE_JOINTS = (10, 50, 150)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def makeCurve(name, offset=0.0):
+    '''a wavy test curve with enough CVs to be worth rigging, moved offset along Z'''
+    cmds = sys.modules['maya.cmds']
+    pts = [(i * 2.0, math.sin(i * 0.7) * 3.0, math.cos(i * 0.4) * 2.0 + offset) for i in range(16)]
+    knots = [0, 0] + list(range(len(pts) - 2)) + [len(pts) - 3] * 2
+    crv = cmds.curve(d=3, p=pts, k=knots)
+    return cmds.rename(crv, name)
+
+
+def makeGeo(name, crv, rings=200, sides=8):
+    '''a tube of mesh vertices around crv, for the geo to bind'''
+    cmds = sys.modules['maya.cmds']
+    curve = curveGeometry.readCurve(crv)
+    centers = curve.evaluate(np.linspace(curve.domain[0], curve.domain[1], rings))
+    angles = np.linspace(0.0, 2.0 * np.pi, sides, endpoint=False)
+    ring = np.stack([np.zeros(sides), 0.5 * np.cos(angles), 0.5 * np.sin(angles)], axis=1)
+    shape = cmds.createNode('mesh', n=name + 'Shape')
+    MOCK._shape(shape).data = {'points': [tuple(p) for p in (centers[:, None] + ring).reshape(-1, 3)]}
+    return cmds.listRelatives(shape, p=True)[0]
+
+
+def runCase(numJoints, numCtrls, attachMode, update=None, clone=False, proxyJoints=0, geoBind='wire', cached=False,
+        stretchSamples=0, bundle=0):
+    '''build one rig on a fresh mock scene, returns {stage: totals}.
+    If update is given as (setting, value) only the updateRig call that
+    changes it is measured, not the build. With clone, a second curve is
+    cloned from the first rig's template and only that is measured. With
+    cached, the rig is built once into a new curveCache, and only the same
+    build on a fresh scene after it is measured. With bundle, that many
+    cables beside the curve are rigged along it with rigBundle, each with
+    its own geo.
+    '''
+    MOCK.reset()
+    crv = makeCurve('bench')
+    geo = makeGeo('benchGeo', crv)
+    tool = curveRigger.RigCurveTool(showUI=False)
+    #a cache from the environment would make the counts depend on past runs
+    tool.cache = curveCache.CurveCache(tempfile.mkdtemp(prefix='curveRiggerBench')) if cached else None
+    builds = []
+    tool.metricsHook = builds.append
+    try:
+        if update or clone or cached:
+            tool.rigFromCurve(crv, numSpans=12, numJoints=numJoints, numCtrls=numCtrls,
+                geo=geo, attachMode=attachMode, proxyJoints=proxyJoints, geoBind=geoBind,
+                stretchSamples=stretchSamples)
+        if clone:
+            template = tool.captureTemplate(crv)
+            crv = makeCurve('benchClone')
+        if cached:
+            MOCK.reset()
+            crv = makeCurve('bench')
+            geo = makeGeo('benchGeo', crv)
+        tool.profiler = rigProfile.BuildProfiler(count=True)
+        del builds[:]
+        if update:
+            tool.updateRig(crv, **dict([update]))
+        elif clone:
+            tool.cloneRig(template, crv, geo=geo)
+        elif bundle:
+            cables = []
+            for i in range(bundle):
+                cable = makeCurve('benchCable%d' % i, 0.2 * (i + 1))
+                cables.append({'crv': cable, 'geo': makeGeo('benchCable%dGeo' % i, cable)})
+            tool.rigBundle(crv, cables, numSpans=12, numJoints=numJoints, numCtrls=numCtrls,
+                geo=geo, attachMode=attachMode, proxyJoints=proxyJoints, geoBind=geoBind,
+                stretchSamples=stretchSamples)
+        else:
+            tool.rigFromCurve(crv, numSpans=12, numJoints=numJoints, numCtrls=numCtrls,
+                geo=geo, attachMode=attachMode, proxyJoints=proxyJoints, geoBind=geoBind,
+                stretchSamples=stretchSamples)
+    finally:
+        if cached:
+            shutil.rmtree(tool.cache.directory, ignore_errors=True)
+    stages = dict(builds[-1]['stages'])
+    stages['total'] = builds[-1]['total']
+    return stages
+
+
+def runAll():
+    '''{case name: {stage: totals}} for every case'''
+    results = dict()
+    for attachMode in MODES:
+        for numJoints in JOINTS:
+            for numCtrls in CTRLS:
+                name = '%s_j%03d_c%02d' % (attachMode, numJoints, numCtrls)
+                results[name] = runCase(numJoints, numCtrls, attachMode)
+        for update in UPDATES:
+            name = '%s_update_%s' % (attachMode, update[0])
+            results[name] = runCase(150, 10, attachMode, update)
+        results['%s_clone_j150_c10' % attachMode] = runCase(150, 10, attachMode, clone=True)
+        results['%s_j150_c10_proxy12' % attachMode] = runCase(150, 10, attachMode, proxyJoints=12)
+        results['%s_j150_c10_skinGeo' % attachMode] = runCase(150, 10, attachMode, geoBind='skin')
+        results['%s_update_numJoints_skinGeo' % attachMode] = runCase(150, 10, attachMode, ('numJoints', 151), geoBind='skin')
+        results['%s_j150_c10_skinGeo_cached' % attachMode] = runCase(150, 10, attachMode, geoBind='skin', cached=True)
+        results['%s_j150_c10_stretch16' % attachMode] = runCase(150, 10, attachMode, stretchSamples=16)
+        #the guide and 3 cables, compare with 4 times j150_c10
+        results['%s_bundle4_j150_c10' % attachMode] = runCase(150, 10, attachMode, bundle=3)
+    return results
+
+
+def downstream(node):
+    '''every node fed by node's (or its shapes') outputs, however
+    indirectly, from the mock's graph
+    '''
+    feeds = dict()
+    for dst, src in MOCK.connections.items():
+        if not dst.endswith('.message') and not src.endswith('.message'):
+            feeds.setdefault(src.split('.')[0], set()).add(dst.split('.')[0])
+    found = set()
+    todo = [node] + (MOCK.listRelatives(node, s=True) or [])
+    while todo:
+        for dst in feeds.get(todo.pop(), ()):
+            if dst not in found:
+                found.add(dst)
+                todo.append(dst)
+    return found
+
+
+def poseStrip(surface):
+    '''{pose: curveGeometry.NurbsSurface} of surface pulled out of shape:
+    stretched and squashed unevenly along X, and curled up around Z
+    '''
+    cvs = surface.cvs
+    start = cvs.reshape(-1, 3).min(axis=0)
+    size = np.ptp(cvs.reshape(-1, 3), axis=0)
+    t = (cvs[..., 0] - start[0]) / size[0]
+    angle = t * np.pi
+    curled = cvs.copy()
+    curled[..., 0] = start[0] + (cvs[..., 0] - start[0]) * np.cos(angle) - cvs[..., 1] * np.sin(angle)
+    curled[..., 1] = (cvs[..., 0] - start[0]) * np.sin(angle) + cvs[..., 1] * np.cos(angle)
+    stretched = cvs.copy()
+    stretched[..., 0] += t * t * size[0] * 0.5
+    squashed = cvs.copy()
+    squashed[..., 0] -= t * t * size[0] * 0.3
+    poses = {'stretch': stretched, 'squash': squashed, 'curl': curled}
+    return dict((name, curveGeometry.NurbsSurface(posed, surface.knotsU, surface.knotsV, surface.degreeU, surface.degreeV))
+        for name, posed in poses.items())
+
+
+def stretchCase(numJoints, stretchSamples):
+    '''{measure: value} for a rig measuring its length with stretchSamples'''
+    MOCK.reset()
+    crv = makeCurve('bench')
+    tool = curveRigger.RigCurveTool(showUI=False)
+    tool.cache = None
+    tool.metricsHook = lambda info: None
+    tool.rigFromCurve(crv, numSpans=12, numJoints=numJoints, numCtrls=10, stretchSamples=stretchSamples)
+    rig = curveRigger.getRig(crv)
+    surface = curveGeometry.readSurface(rig['surface'])
+
+    def measure(surface):
+        iso = surface.isoCurve(0.5)
+        return iso.length(), iso.chordLength(stretchSamples) if stretchSamples else iso.length()
+    rest, sampledRest = measure(surface)
+    #what the rig's stretch node works out, rest over current length, and
+    #how far down the strip (in length) that puts the last joint off
+    error = slip = 0.0
+    for posed in poseStrip(surface).values():
+        length, sampled = measure(posed)
+        exact, approx = rest / length, sampledRest / sampled
+        error = max(error, abs(approx / exact - 1.0))
+        slip = max(slip, abs(approx - exact) * length)
+    #the sums the length nodes do each frame, in numpy: an arc length
+    #integral down the iso curve, or the sample points and their chords
+    #(the iso curve itself is evaluated either way, the motionPaths ride it)
+    iso = surface.isoCurve(0.5)
+    samples = np.linspace(0.0, 1.0, stretchSamples)
+
+    def evaluate():
+        if stretchSamples:
+            points = surface.evaluate(np.full(stretchSamples, 0.5), samples)
+            return np.linalg.norm(np.diff(points, axis=0), axis=1).sum()
+        iso._table = None
+        return iso.length()
+    kernel = min(timeit.repeat(evaluate, number=100, repeat=5)) / 100
+    return {'lengthNodes': len(rig['lengthNodes']), 'perFrame': len(downstream(rig['surface'])),
+        'kernel': 1e6 * kernel, 'error': 100.0 * error, 'slip': slip}
+
+
+def stretchReport():
+    '''print stretchCase for each joint count and stretchSamples setting'''
+    print('%-22s %11s %9s %9s %9s %9s' % ('case', 'lengthNodes', 'perFrame', 'kernel us', 'error %', 'slip'))
+    for numJoints in JOINTS:
+        for stretchSamples in STRETCH_SAMPLES:
+            name = 'j%03d_%s' % (numJoints, 'samples%02d' % stretchSamples if stretchSamples else 'curveInfo')
+            case = stretchCase(numJoints, stretchSamples)
+            print('%-22s %11d %9d %9.1f %9.3f %9.4f' % (name, case['lengthNodes'], case['perFrame'], case['kernel'],
+                case['error'], case['slip']))
+
+
+def upstream(nodes):
+    '''every node nodes' inputs come from, however indirectly, from the
+    mock's graph, with the DAG parents world matrices depend on
+    '''
+    sources = dict()
+    for dst, src in MOCK.connections.items():
+        if not dst.endswith('.message') and not src.endswith('.message'):
+            sources.setdefault(dst.split('.')[0], set()).add(src.split('.')[0])
+    found = set()
+    todo = list(nodes)
+    while todo:
+        node = MOCK.nodes[todo.pop()]
+        inputs = set(sources.get(node.name, ()))
+        if node.parent:
+            inputs.add(node.parent.name)
+        for src in inputs - found:
+            found.add(src)
+            todo.append(src)
+    return found
+
+
+def swaying(joints):
+    '''getAttr for maya.cmds that gives joints world matrices that move
+    over time, as they would in a shot, so baking them makes keys
+    '''
+    getAttr = MOCK.getAttr
+    index = dict((joint, i) for i, joint in enumerate(joints))
+
+    def swayingGetAttr(plug, **kwargs):
+        node, attr = plug.split('.', 1)
+        if attr != 'worldMatrix[0]' or node not in index:
+            return getAttr(plug, **kwargs)
+        angle = 0.05 * MOCK.time + 0.1 * index[node]
+        return [math.cos(angle), math.sin(angle), 0, 0, -math.sin(angle), math.cos(angle), 0, 0,
+            0, 0, 1, 0, index[node], math.sin(angle), 0, 1]
+    return swayingGetAttr
+
+
+def bakeCase(numJoints, attachMode, directory):
+    '''{measure: value} for a rig with skinned geo baked over BAKE_FRAMES'''
+    MOCK.reset()
+    crv = makeCurve('bench')
+    geo = makeGeo('benchGeo', crv)
+    tool = curveRigger.RigCurveTool(showUI=False)
+    tool.cache = None
+    tool.metricsHook = lambda info: None
+    tool.rigFromCurve(crv, numSpans=12, numJoints=numJoints, numCtrls=10, geo=geo, attachMode=attachMode, geoBind='skin')
+    rig = curveRigger.getRig(crv)
+    skins = tool.bakeSkins(rig)
+    live = len(upstream(skins))
+    MOCK.playback = (1.0, float(BAKE_FRAMES))
+    cmds = sys.modules['maya.cmds']
+    cmds.getAttr = swaying(rig['skinJoints'])
+    try:
+        path = tool.bakeRig(crv, path=os.path.join(directory, '%s_j%03d.npy' % (attachMode, numJoints)))
+    finally:
+        cmds.getAttr = MOCK.getAttr
+    baked = len(upstream(skins))
+    return {'live': live, 'baked': baked, 'bakeSeconds': tool.buildInfo['total']['seconds'],
+        'megabytes': os.path.getsize(path) / float(2 ** 20)}
+
+
+def bakeReport():
+    '''print bakeCase for each joint count and attach mode'''
+    directory = tempfile.mkdtemp(prefix='curveRiggerBake')
+    try:
+        print('%-14s %9s %9s %9s %9s' % ('case', 'liveNodes', 'baked', 'bake s', 'MB'))
+        for attachMode in MODES:
+            for numJoints in BAKE_JOINTS:
+                case = bakeCase(numJoints, attachMode, directory)
+                print('%-14s %9d %9d %9.3f %9.2f' % ('%s_j%03d' % (attachMode, numJoints), case['live'], case['baked'],
+                    case['bakeSeconds'], case['megabytes']))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def compare(results, baseline):
+    '''list of regressions in command and node counts, as readable strings'''
+    problems = []
+    for case in sorted(results):
+        if case not in baseline:
+            problems.append('%s: not in the baseline, run with --update' % case)
+            continue
+        for stage, totals in sorted(results[case].items()):
+            old = baseline[case].get(stage)
+            if old is None:
+                problems.append('%s %s: stage not in the baseline' % (case, stage))
+                continue
+            for key in ('commands', 'nodes'):
+                if totals[key] > old[key]:
+                    problems.append('%s %s: %d %s, baseline %d' % (case, stage, totals[key], key, old[key]))
+    return problems
+
+
+def slower(results, baseline, timeTolerance):
+    '''list of stages over timeTolerance times their baseline time, as
+    readable strings. Only for information, times aren't repeatable
+    '''
+    notes = []
+    for case in sorted(results):
+        for stage, totals in sorted(results[case].items()):
+            old = baseline.get(case, {}).get(stage)
+            #a little absolute slack, tiny stages are all noise
+            if old and totals['seconds'] > old['seconds'] * timeTolerance + 0.01:
+                notes.append('%s %s: %.3fs, baseline %.3fs' % (case, stage, totals['seconds'], old['seconds']))
+    return notes
+
+
+def report(results):
+    print('%-22s %-11s %9s %7s %9s' % ('case', 'stage', 'commands', 'nodes', 'seconds'))
+    for case in sorted(results):
+        for stage, totals in sorted(results[case].items()):
+            print('%-22s %-11s %9d %7d %9.4f' % (case, stage, totals['commands'], totals['nodes'], totals['seconds']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--update', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--stretch', action='store_true', help='compare the ways of measuring stretch, then stop')
+    parser.add_argument('--bake', action='store_true', help='compare live playback with a bake, then stop')
+    parser.add_argument('--time-tolerance', type=float, default=2.0,
+        help='note stages that take this many times their baseline time')
+    args = parser.parse_args(argv)
+    if args.stretch:
+        stretchReport()
+        return 0
+    if args.bake:
+        bakeReport()
+        return 0
+
+    results = runAll()
+    report(results)
+    if args.update:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print('baseline written to %s' % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print('no baseline at %s, run with --update first' % args.baseline)
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    for note in slower(results, baseline, args.time_tolerance):
+        print('SLOWER (not checked) ' + note)
+    problems = compare(results, baseline)
+    for problem in problems:
+        print('REGRESSION ' + problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+'''Baked playback for cable rigs whose animation is final.
+A live rig evaluates its strip, stretch and attach networks every frame,
+just to place the skin joints. Once the animation won't change, the joints'
+world matrices can be sampled over the shot once (sampleMatrices) and
+played back from keys instead: one plain transform per joint, keyed only
+on the channels that move, with every key of a channel set in one setAttr
+(keyChannels). The skinClusters are pointed at those transforms instead of
+the joints, and can be pointed back (see RigCurveTool.useBake).
+
+Samples are kept in a .npy file of (frames, joints, 4, 4) world matrices,
+written through a memory map a frame at a time, so a long shot is never all
+in memory, with a .json beside it naming the joints and the frames.
+timePlayback times stepping through a frame range, to compare the live rig
+with its bake. Only the Maya functions need Maya.
+'''
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import curveGeometry
+
+#bump when what's stored changes, so old bakes are never read
+FORMAT = 1
+#channels keyChannels keys, and the animCurve type for each
+CHANNELS = (('translate', 'animCurveTL'), ('rotate', 'animCurveTA'), ('scale', 'animCurveTU'))
+#channels that move less than this over the bake are set, not keyed
+STILL = 1e-6
+
+
+def defaultPath(name):
+    '''where a bake of name goes if no path is given: beside the scene,
+    or in the temp directory if the scene hasn't been saved
+    '''
+    import maya.cmds as cmds
+    scene = cmds.file(q=True, sceneName=True)
+    if not scene:
+        return os.path.join(tempfile.gettempdir(), '%s_bake.npy' % name)
+    base = os.path.splitext(os.path.basename(scene))[0]
+    return os.path.join(os.path.dirname(scene), '%s_%s_bake.npy' % (base, name))
+
+
+def infoPath(path):
+    '''the .json kept beside the bake at path'''
+    return os.path.splitext(path)[0] + '.json'
+
+
+def frameRange(start=None, end=None, step=1.0):
+    '''the times from start to end (the playback range by default), step apart'''
+    import maya.cmds as cmds
+    if start is None:
+        start = cmds.playbackOptions(q=True, minTime=True)
+    if end is None:
+        end = cmds.playbackOptions(q=True, maxTime=True)
+    if end < start or step <= 0:
+        raise ValueError('can\'t step from frame %s to %s by %s' % (start, end, step))
+    return start + step * np.arange(int(np.floor((end - start) / step + 1e-9)) + 1)
+
+
+def sampleMatrices(nodes, times, path):
+    '''Step the scene through times, writing nodes' world matrices to a
+    memory mapped .npy at path, and the nodes and times to infoPath(path).
+    The current frame is put back afterwards. Returns path
+    '''
+    import maya.cmds as cmds
+    times = np.asarray(times, dtype=float)
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    matrices = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(len(times), len(nodes), 4, 4))
+    current = cmds.currentTime(q=True)
+    try:
+        for i, t in enumerate(times):
+            cmds.currentTime(t, update=True)
+            for j, node in enumerate(nodes):
+                matrices[i, j] = np.reshape(cmds.getAttr(node + '.worldMatrix[0]'), (4, 4))
+        matrices.flush()
+    finally:
+        cmds.currentTime(current, update=True)
+        del matrices
+    with open(infoPath(path), 'w') as f:
+        json.dump({'format': FORMAT, 'nodes': list(nodes), 'times': times.tolist()}, f, indent=1)
+    return path
+
+
+def loadBake(path):
+    '''(matrices, info) of the bake at path, the matrices memory mapped
+    read only. Raises ValueError if it's from another version or doesn't
+    match its .json
+    '''
+    with open(infoPath(path)) as f:
+        info = json.load(f)
+    if info.get('format') != FORMAT:
+        raise ValueError('%s was baked by another version, bake it again' % path)
+    matrices = np.load(path, mmap_mode='r')
+    if matrices.shape[:2] != (len(info['times']), len(info['nodes'])):
+        raise ValueError('%s doesn\'t match %s, bake it again' % (path, infoPath(path)))
+    return matrices, info
+
+
+def matrixChannels(matrices):
+    '''{channel: (n,3) values} from (n,4,4) world matrices of one node over
+    time. Rotations are XYZ euler degrees, unwound so they don't jump 360
+    degrees between samples. Shear is dropped.
+    '''
+    m = np.asarray(matrices, dtype=float)
+    scale = np.linalg.norm(m[:, :3, :3], axis=2)
+    rotate = curveGeometry.matrixToEuler(m[:, :3, :3] / np.where(scale == 0.0, 1.0, scale)[:, :, None])
+    rotate = np.degrees(np.unwrap(np.radians(rotate), axis=0))
+    return {'translate': m[:, 3, :3], 'rotate': rotate, 'scale': scale}
+
+
+def keyChannels(node, times, channels):
+    '''Key node's channels ({channel: (n,3) values} at times, see
+    matrixChannels) with one animCurve each, all keys set in one setAttr.
+    Channels that don't move are set instead. Keys are linear, so sub
+    frames in between blend straight across. Returns the animCurves made
+    '''
+    import maya.cmds as cmds
+    curves = []
+    for channel, curveType in CHANNELS:
+        values = np.asarray(channels[channel], dtype=float)
+        for axis, column in zip('XYZ', values.T):
+            plug = '%s.%s%s' % (node, channel, axis)
+            if np.ptp(column) < STILL:
+                cmds.setAttr(plug, float(column[0]))
+                continue
+            curve = cmds.createNode(curveType, n='%s_%s%s' % (node, channel, axis), ss=True)
+            keys = np.stack((times, column), axis=1).ravel()
+            cmds.setAttr('%s.ktv[0:%d]' % (curve, len(times) - 1), *keys.tolist())
+            cmds.connectAttr(curve + '.output', plug)
+            curves.append(curve)
+    if curves:
+        cmds.keyTangent(curves, e=True, itt='linear', ott='linear')
+    return curves
+
+
+def timePlayback(start=None, end=None, plugs=None, refresh=False):
+    '''Time stepping through start to end (the playback range by default)
+    a frame at a time. plugs are evaluated each frame (with dgeval), e.g. a
+    deformed mesh's outMesh; with refresh the viewport is redrawn too, like
+    playback. The current frame is put back afterwards.
+    Returns {'frames', 'seconds', 'fps'}
+    '''
+    import maya.cmds as cmds
+    times = frameRange(start, end)
+    current = cmds.currentTime(q=True)
+    began = time.time()
+    try:
+        for t in times:
+            cmds.currentTime(t, update=True)
+            if plugs:
+                cmds.dgeval(plugs)
+            if refresh:
+                cmds.refresh(force=True)
+        seconds = time.time() - began
+    finally:
+        cmds.currentTime(current, update=True)
+    return {'frames': len(times), 'seconds': seconds, 'fps': len(times) / seconds if seconds else float('inf')}
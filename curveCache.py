@@ -0,0 +1,150 @@
+'''Disk cache for what rig builds work out from curves.
+Rebuilding a rig on a curve that hasn't changed works the same things out
+again: the strip extruded and rebuilt from it, the strip's rest length and
+where the controls sit, and the computed skin weights. A CurveCache keeps
+them as compressed numpy arrays (.npz), one file per entry, so the next
+build can read them back instead.
+
+Entries are keyed by a hash of the geometry they were worked out from (the
+CVs, knots and degree of a curve or surface, or a mesh's points) plus the
+settings that went in, so a changed curve or setting is simply a miss and
+nothing has to be invalidated. The directory is kept under a size limit
+by deleting the entries least recently used. Several processes can share
+one directory: entries are written to a temporary file and moved into place.
+
+RigCurveTool uses the cache named by the CURVERIGGER_CACHE environment
+variable, if it's set (see fromEnvironment).
+'''
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+#bump when what's stored changes, so old entries are never read
+FORMAT = 1
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+
+class CurveCache(object):
+    '''A directory of cached arrays, at most maxBytes of them.
+    hits and misses count the loads since the cache was made.
+    '''
+    def __init__(self, directory, maxBytes=DEFAULT_MAX_BYTES):
+        object.__init__(self)
+        self.directory = os.path.abspath(directory)
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        '''{name: array} stored under key, or None. A hit counts as a use'''
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = dict((name, data[name]) for name in data.files)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError, zipfile.BadZipfile):
+            #missing, or half written by a process that died
+            if os.path.exists(path):
+                self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def save(self, key, arrays):
+        '''store {name: array} under key, then trim the cache to maxBytes'''
+        handle, temp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            #os.replace overwrites on windows too, where there is one (python 3)
+            getattr(os, 'replace', os.rename)(temp, self.path(key))
+        except Exception:
+            self._remove(temp)
+            raise
+        self.evict()
+
+    def evict(self):
+        '''delete the least recently used entries until the cache fits in maxBytes'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            self._remove(os.path.join(self.directory, name))
+            total -= size
+
+    def size(self):
+        '''bytes the cache's entries take up'''
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if name.endswith('.npz'))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                self._remove(os.path.join(self.directory, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            #another process got there first
+            pass
+
+
+def fromEnvironment():
+    '''CurveCache in $CURVERIGGER_CACHE, at most $CURVERIGGER_CACHE_MB
+    megabytes, or None if it's not set
+    '''
+    directory = os.environ.get('CURVERIGGER_CACHE')
+    if not directory:
+        return None
+    megabytes = os.environ.get('CURVERIGGER_CACHE_MB')
+    return CurveCache(directory, int(float(megabytes) * 2 ** 20) if megabytes else DEFAULT_MAX_BYTES)
+
+
+def contentKey(kind, arrays, **params):
+    '''Key for the kind of thing worked out from arrays ({name: array},
+    see curveArrays and surfaceArrays) with params (json-able values).
+    '''
+    digest = hashlib.sha1(json.dumps([FORMAT, kind, sorted(params.items())]).encode('utf-8'))
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name], dtype=float)
+        digest.update(('%s%s' % (name, array.shape)).encode('utf-8'))
+        digest.update(array.tobytes())
+    return '%s_%s' % (kind, digest.hexdigest())
+
+
+def curveArrays(curve):
+    '''a curveGeometry.NurbsCurve as {name: array}'''
+    return {'cvs': curve.cvs, 'knots': curve.knots, 'degree': np.array(curve.degree)}
+
+
+def surfaceArrays(surface):
+    '''a curveGeometry.NurbsSurface as {name: array}, see toSurface'''
+    return {'cvs': surface.cvs, 'knotsU': surface.knotsU, 'knotsV': surface.knotsV,
+        'degrees': np.array([surface.degreeU, surface.degreeV])}
+
+
+def toSurface(arrays):
+    '''the curveGeometry.NurbsSurface surfaceArrays made arrays from'''
+    import curveGeometry
+    degreeU, degreeV = [int(degree) for degree in arrays['degrees']]
+    return curveGeometry.NurbsSurface(arrays['cvs'], arrays['knotsU'], arrays['knotsV'], degreeU, degreeV)
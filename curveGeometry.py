@@ -0,0 +1,314 @@
+'''NURBS geometry kernel used while building rigs.
+Curves and surfaces are read from Maya once (readCurve, readSurface) and
+everything after that is numpy: evaluation, arc length tables and frames.
+This replaces temporary attach networks and curveInfo nodes that were only
+made to get a position or a length back out.
+
+Only readCurve, readSurface and readMeshPoints need Maya; the rest can
+be used (and checked against analytic curves) in any python with numpy.
+Geometry is treated as non-rational, which is what the rig builds.
+'''
+import numpy as np
+
+#Gauss-Legendre nodes and weights on [-1,1], used for arc length
+GAUSS_X, GAUSS_W = np.polynomial.legendre.leggauss(5)
+
+
+def fullKnots(mayaKnots):
+    '''Maya stores two fewer knots than the textbook form, pad the ends.
+    The padding knots never affect the curve inside its domain.
+    '''
+    knots = np.asarray(mayaKnots, dtype=float)
+    return np.concatenate(([knots[0]], knots, [knots[-1]]))
+
+
+def basisFunctions(knots, degree, params, deriv=0):
+    '''B-spline basis values (or their deriv'th derivatives) for every
+    param at once. Returns a dense (len(params), numCVs) matrix, so
+    evaluating is just basis.dot(cvs).
+    '''
+    knots = np.asarray(knots, dtype=float)
+    numCVs = len(knots) - degree - 1
+    t = np.clip(np.atleast_1d(np.asarray(params, dtype=float)), knots[degree], knots[numCVs])
+    span = np.searchsorted(knots, t, side='right') - 1
+    span = np.clip(span, degree, numCVs - 1)
+    basis = np.zeros((len(t), len(knots) - 1))
+    basis[np.arange(len(t)), span] = 1.0
+    for p in range(1, degree + 1):
+        count = len(knots) - 1 - p
+        left = knots[:count]
+        right = knots[p:p + count]
+        left1 = knots[1:count + 1]
+        right1 = knots[p + 1:p + 1 + count]
+        leftDen = _safeInverse(right - left)
+        rightDen = _safeInverse(right1 - left1)
+        if p <= degree - deriv:
+            basis = ((t[:, None] - left) * leftDen * basis[:, :count] +
+                (right1 - t[:, None]) * rightDen * basis[:, 1:count + 1])
+        else:
+            basis = p * (leftDen * basis[:, :count] - rightDen * basis[:, 1:count + 1])
+    return basis[:, :numCVs]
+
+
+def _safeInverse(values):
+    '''1/values, with 0 where values is 0 (repeated knots)'''
+    result = np.zeros_like(values)
+    nonZero = values != 0
+    result[nonZero] = 1.0 / values[nonZero]
+    return result
+
+
+def normalize(vectors):
+    '''unit length rows, zero rows are left alone'''
+    vectors = np.asarray(vectors, dtype=float)
+    lengths = np.linalg.norm(vectors, axis=-1)[..., None]
+    return vectors / np.where(lengths == 0, 1.0, lengths)
+
+
+class NurbsCurve(object):
+    '''Non-rational NURBS curve.
+    cvs is (numCVs,3), knots is the full knot vector (see fullKnots)
+    '''
+    def __init__(self, cvs, knots, degree):
+        self.cvs = np.asarray(cvs, dtype=float)
+        self.knots = np.asarray(knots, dtype=float)
+        self.degree = int(degree)
+        if len(self.knots) != len(self.cvs) + self.degree + 1:
+            raise ValueError('%d knots do not fit %d cvs of degree %d' %
+                (len(self.knots), len(self.cvs), self.degree))
+        self._table = None
+
+    @property
+    def domain(self):
+        return (self.knots[self.degree], self.knots[len(self.cvs)])
+
+    def evaluate(self, params, deriv=0):
+        '''points (or deriv'th derivatives) at params, shape (len(params),3)'''
+        return basisFunctions(self.knots, self.degree, params, deriv).dot(self.cvs)
+
+    def greville(self):
+        '''the parameter each CV has the most influence at (knot averages)'''
+        if self.degree == 0:
+            return self.knots[:-1].copy()
+        kernel = np.ones(self.degree) / self.degree
+        return np.convolve(self.knots[1:-1], kernel, mode='valid')
+
+    def _intervals(self, samplesPerSpan):
+        '''param breakpoints: every distinct knot, each span split evenly'''
+        start, end = self.domain
+        spans = np.unique(self.knots[(self.knots >= start) & (self.knots <= end)])
+        steps = np.linspace(0.0, 1.0, samplesPerSpan + 1)[:-1]
+        params = (spans[:-1, None] + (spans[1:] - spans[:-1])[:, None] * steps).ravel()
+        return np.append(params, end)
+
+    def _integrate(self, starts, ends):
+        '''arc length over each [start,end] param interval'''
+        half = 0.5 * (ends - starts)
+        mids = 0.5 * (ends + starts)
+        params = (mids[:, None] + half[:, None] * GAUSS_X).ravel()
+        speed = np.linalg.norm(self.evaluate(params, 1), axis=1).reshape(len(starts), len(GAUSS_X))
+        return speed.dot(GAUSS_W) * half
+
+    def arcLengthTable(self, samplesPerSpan=16):
+        '''(params, cumulative lengths) sampled along the curve'''
+        if self._table is None or self._table[0] != samplesPerSpan:
+            params = self._intervals(samplesPerSpan)
+            lengths = np.concatenate(([0.0], np.cumsum(self._integrate(params[:-1], params[1:]))))
+            self._table = (samplesPerSpan, params, lengths)
+        return self._table[1], self._table[2]
+
+    def length(self):
+        return self.arcLengthTable()[1][-1]
+
+    def chordLength(self, samples):
+        '''length of the polyline through samples points evenly spaced in
+        param, what a chain of distanceBetween nodes over them measures
+        '''
+        points = self.evaluate(np.linspace(self.domain[0], self.domain[1], samples))
+        return np.linalg.norm(np.diff(points, axis=0), axis=1).sum()
+
+    def lengthAt(self, params):
+        '''arc length from the start of the curve to each param'''
+        tableParams, tableLengths = self.arcLengthTable()
+        params = np.clip(np.atleast_1d(np.asarray(params, dtype=float)), *self.domain)
+        index = np.clip(np.searchsorted(tableParams, params, side='right') - 1, 0, len(tableParams) - 2)
+        return tableLengths[index] + self._integrate(tableParams[index], params)
+
+    def paramsAtFractions(self, fractions, iterations=3):
+        '''params at the given fractions (0-1) of total arc length.
+        Interpolates the arc length table, then polishes with Newton steps.
+        '''
+        tableParams, tableLengths = self.arcLengthTable()
+        targets = np.clip(np.atleast_1d(np.asarray(fractions, dtype=float)), 0.0, 1.0) * tableLengths[-1]
+        params = np.interp(targets, tableLengths, tableParams)
+        for i in range(iterations):
+            speed = np.linalg.norm(self.evaluate(params, 1), axis=1)
+            step = (self.lengthAt(params) - targets) / np.where(speed == 0, 1.0, speed)
+            params = np.clip(params - step, *self.domain)
+        return params
+
+    def closestParams(self, points, samplesPerSpan=16, iterations=1):
+        '''param of the closest point on the curve to each of points.
+        Finds the nearest of a dense set of samples, projects on to the
+        sample segments either side of it, then polishes with Newton steps
+        on (C(t)-P).C'(t) = 0.
+        '''
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        samples = self._intervals(samplesPerSpan)
+        samplePoints = self.evaluate(samples)
+        params = np.empty(len(points))
+        #a block of points at a time, to keep the distance and basis matrices small
+        block = max(1, 2 ** 20 // max(len(samples), len(self.cvs)))
+        squared = (samplePoints ** 2).sum(axis=1)
+        for start in range(0, len(points), block):
+            near = points[start:start + block]
+            #|P-S|^2 less |P|^2, as one matrix product
+            index = np.argmin(squared - 2.0 * near.dot(samplePoints.T), axis=1)
+            t = samples[index]
+            best = None
+            for first in (np.maximum(index - 1, 0), np.minimum(index, len(samples) - 2)):
+                a, b = samplePoints[first], samplePoints[first + 1]
+                edge = b - a
+                along = np.clip(((near - a) * edge).sum(axis=1) / np.maximum((edge * edge).sum(axis=1), 1e-24), 0.0, 1.0)
+                dist = ((a + edge * along[:, None] - near) ** 2).sum(axis=1)
+                guess = samples[first] + (samples[first + 1] - samples[first]) * along
+                if best is None:
+                    best, t = dist, guess
+                else:
+                    t = np.where(dist < best, guess, t)
+            for i in range(iterations):
+                delta = self.evaluate(t) - near
+                first = self.evaluate(t, 1)
+                second = self.evaluate(t, 2)
+                numer = (delta * first).sum(axis=1)
+                denom = (first * first).sum(axis=1) + (delta * second).sum(axis=1)
+                step = numer / np.where(np.abs(denom) < 1e-12, 1.0, denom)
+                t = np.clip(t - step, *self.domain)
+            params[start:start + block] = t
+        return params
+
+
+class NurbsSurface(object):
+    '''Non-rational NURBS surface.
+    cvs is (numCVsInU,numCVsInV,3), knots are full knot vectors
+    '''
+    def __init__(self, cvs, knotsU, knotsV, degreeU, degreeV):
+        self.cvs = np.asarray(cvs, dtype=float)
+        self.knotsU = np.asarray(knotsU, dtype=float)
+        self.knotsV = np.asarray(knotsV, dtype=float)
+        self.degreeU = int(degreeU)
+        self.degreeV = int(degreeV)
+
+    @property
+    def domainU(self):
+        return (self.knotsU[self.degreeU], self.knotsU[self.cvs.shape[0]])
+
+    @property
+    def domainV(self):
+        return (self.knotsV[self.degreeV], self.knotsV[self.cvs.shape[1]])
+
+    def evaluate(self, u, v, derivU=0, derivV=0):
+        '''points (or partial derivatives) at paired u,v params'''
+        u, v = np.broadcast_arrays(np.atleast_1d(u), np.atleast_1d(v))
+        basisU = basisFunctions(self.knotsU, self.degreeU, u, derivU)
+        basisV = basisFunctions(self.knotsV, self.degreeV, v, derivV)
+        return np.einsum('pi,pj,ijk->pk', basisU, basisV, self.cvs)
+
+    def isoCurve(self, u):
+        '''the curve running down V at the given u'''
+        basisU = basisFunctions(self.knotsU, self.degreeU, [u])[0]
+        return NurbsCurve(np.einsum('i,ijk->jk', basisU, self.cvs), self.knotsV, self.degreeV)
+
+    def frames(self, u, v):
+        '''(positions, rotation matrices) at paired u,v params.
+        Matrix rows are the X,Y,Z axes: X along V, Y toward U, matching an
+        aimConstraint aimed down tangent V with tangent U as up vector.
+        '''
+        positions = self.evaluate(u, v)
+        aim = normalize(self.evaluate(u, v, derivV=1))
+        up = self.evaluate(u, v, derivU=1)
+        side = normalize(np.cross(aim, up))
+        up = np.cross(side, aim)
+        return positions, np.stack((aim, up, side), axis=1)
+
+
+def matrixToEuler(matrices):
+    '''XYZ rotate order euler angles in degrees from (n,3,3) rotation
+    matrices whose rows are the X,Y,Z axes (Maya's row vector convention)
+    '''
+    m = np.asarray(matrices, dtype=float)
+    y = np.arcsin(np.clip(-m[:, 0, 2], -1.0, 1.0))
+    x = np.arctan2(m[:, 1, 2], m[:, 2, 2])
+    z = np.arctan2(m[:, 0, 1], m[:, 0, 0])
+    gimbal = np.abs(m[:, 0, 2]) > 1.0 - 1e-9
+    #looking straight down Y, so fold X into Z
+    x = np.where(gimbal, 0.0, x)
+    z = np.where(gimbal, np.arctan2(-m[:, 1, 0], m[:, 1, 1]), z)
+    return np.degrees(np.stack((x, y, z), axis=1))
+
+
+def placeOnStrip(surface, fractions, u=None):
+    '''Positions and XYZ euler rotations (degrees) for objects placed at
+    fractions of arc length down the middle of a rig strip, oriented the
+    way attachObjToSurf orients them.
+    '''
+    positions, matrices = framesOnStrip(surface, fractions, u)
+    return positions, matrixToEuler(matrices)
+
+
+def framesOnStrip(surface, fractions, u=None):
+    '''(positions, rotation matrices) of frames placed like placeOnStrip's'''
+    if u is None:
+        u = 0.5 * sum(surface.domainU)
+    v = surface.isoCurve(u).paramsAtFractions(fractions)
+    return surface.frames(np.full(len(v), u), v)
+
+
+def offsetsOnStrip(surface, fractions, curve, normalUp=False):
+    '''Where curve passes each of the frames placed at fractions down the
+    middle of a rig strip (as placeOnStrip places them): the closest point
+    on curve to each frame, in the frame's space. With normalUp the frames'
+    Y is the surface normal and Z toward tangent U, rather than Y toward
+    tangent U, like planAttachMatrix's frames.
+    '''
+    positions, matrices = framesOnStrip(surface, fractions)
+    if normalUp:
+        matrices = matrices[:, [0, 2, 1]] * np.array([1.0, -1.0, 1.0])[:, None]
+    points = curve.evaluate(curve.closestParams(positions))
+    return np.einsum('pij,pj->pi', matrices, points - positions)
+
+
+def readCurve(name):
+    '''NurbsCurve from a curve in the scene, in world space'''
+    import maya.api.OpenMaya as om
+    fn = om.MFnNurbsCurve(_shapePath(name))
+    cvs = [(p.x, p.y, p.z) for p in fn.cvPositions(om.MSpace.kWorld)]
+    return NurbsCurve(cvs, fullKnots(fn.knots()), fn.degree)
+
+
+def readSurface(name):
+    '''NurbsSurface from a surface in the scene, in world space'''
+    import maya.api.OpenMaya as om
+    fn = om.MFnNurbsSurface(_shapePath(name))
+    points = [(p.x, p.y, p.z) for p in fn.cvPositions(om.MSpace.kWorld)]
+    cvs = np.reshape(points, (fn.numCVsInU, fn.numCVsInV, 3))
+    return NurbsSurface(cvs, fullKnots(fn.knotsInU()), fullKnots(fn.knotsInV()),
+        fn.degreeInU, fn.degreeInV)
+
+
+def readMeshPoints(name):
+    '''(numVertices,3) array of a mesh's vertices, in world space'''
+    import maya.api.OpenMaya as om
+    fn = om.MFnMesh(_shapePath(name))
+    return np.array([(p.x, p.y, p.z) for p in fn.getPoints(om.MSpace.kWorld)], dtype=float).reshape(-1, 3)
+
+
+def _shapePath(name):
+    '''dag path to name's shape, accepting either a transform or a shape'''
+    import maya.api.OpenMaya as om
+    sel = om.MSelectionList()
+    sel.add(name)
+    dag = sel.getDagPath(0)
+    if dag.hasFn(om.MFn.kTransform):
+        dag.extendToShape()
+    return dag
@@ -1,6 +1,40 @@
 
 '''Cable Rigging Tool. Drag this script to shelf, or execute from editor to run'''
+from __future__ import print_function
+import contextlib
+import math
+import time
 import maya.cmds as cmds
+import curveBake
+import curveCache
+import curveGeometry
+import curveWeights
+import rigPlan
+import rigProfile
+
+ATTACH_MODES = ('classic','matrix')
+#how the strip and skinned curve are weighted, 'closest' keeps Maya's closest point bind
+SKIN_FALLOFFS = ('closest',) + curveWeights.FALLOFFS
+#settings kept on each rig's top node, so updateRig can tell what changed
+RIG_SETTINGS = ('numSpans','numJoints','numCtrls','stripWidth','ctrlWidth','uMin','uMax','attachMode','falloff','proxyJoints','stretchSamples')
+#enum settings, and the values they can take
+RIG_CHOICES = {'attachMode':ATTACH_MODES,'falloff':SKIN_FALLOFFS}
+#message attrs on each rig's metadata node (see getRig), one part each...
+META_PARTS = ('curve','rig','hidden','surface','path','stretch','stretchBlender','skinJointGroup',
+    'stripJointGroup','ctrlGroup','skinnedCurve','stripSkin','curveSkin',
+    'lod','proxyJointGroup','proxySkinnedCurve','proxyCurveSkin','bundle','bake')
+#...and a list of parts each, in order
+META_LISTS = ('skinJoints','stretchCtrls','ctrls','stripJoints','wires','proxyJoints','proxyStretchCtrls','geoSkins','lengthNodes',
+    'bundleCables')
+#parts a cable in a bundle (see rigBundle) shares with its guide's rig
+BUNDLE_SHARED = ('rig','hidden','surface','path','stretch','stretchBlender','stripJointGroup','ctrlGroup','stripSkin',
+    'ctrls','stripJoints','lengthNodes')
+#how cable geo follows the rig: wired to the skinned curve, or skinned to the joints
+GEO_BINDS = ('wire','skin')
+#values of the lod attr on the first control of rigs with a proxy chain
+LOD_LEVELS = ('full','proxy')
+#rough share of a build's time spent making the planned network, for progress bars
+BUILD_NETWORK_SHARE = 0.9
 
 class RigCurveTool(object):
     '''Creates a rig from the given curve.
@@ -11,10 +45,14 @@ class RigCurveTool(object):
     Use the skin joints to drive your mesh.
     
     The stretch attr is put on the first control, which is larger.
-    Rigging the same curve twice may cause errors, since everything is named
-    based on the curve name.
+    Everything is named based on the curve name, so rigging the same curve
+    twice may cause errors. Once built, the rig's parts are found through
+    its metadata node (see getRig), so they can be renamed freely.
+
+    Pass showUI=False to use the rigging methods from a script without
+    opening the window. See also rigCurves for building many rigs at once.
     '''
-    def __init__(self):
+    def __init__(self,showUI=True):
         object.__init__(self)
         self.widgets = dict()
         self.defaults = dict()
@@ -26,7 +64,33 @@ class RigCurveTool(object):
         self.defaults['width']=0.1
         self.defaults['uMin']=0.0
         self.defaults['uMax']=1.0
-        self.showWindow()
+        self.defaults['attach']='classic'
+        self.defaults['falloff']='closest'
+        self.defaults['proxy']=0
+        self.defaults['stretchSamples']=0
+        self.defaults['geoBind']='wire'
+        self.defaults['fast']=False
+        self.buildInfo = dict()
+        #applies build plans, swap for rigPlan.ModifierExecutor() to skip cmds
+        self.executor = rigPlan.CmdsExecutor()
+        self.lastPlan = None
+        #times each build's stages, use rigProfile.BuildProfiler(count=True)
+        #to count commands and nodes too, or profile=True for cProfile
+        self.profiler = rigProfile.BuildProfiler()
+        #called with buildInfo after each build, instead of printing its stages
+        self.metricsHook = None
+        #the build startBuild is running, if any
+        self.running = None
+        #curveCache.CurveCache to keep strips, fits and weights worked out
+        #from curves in, so unchanged cables skip them when rebuilt
+        self.cache = curveCache.fromEnvironment()
+        #Build with undo recording and viewport refresh off (see fastMode).
+        #Each fast build is kept as {'crv','rig','nodes'} for undoRig
+        self.fastBuild = False
+        self.fastBuilds = []
+        self.fastActive = False
+        if showUI:
+            self.showWindow()
         
     def showWindow(self):
         window = cmds.window(title='Rig Curve')
@@ -61,6 +125,30 @@ class RigCurveTool(object):
             defaultuMax = cmds.optionVar(q='CableRigger_uMax')
         else:
             defaultuMax = self.defaults['uMax']  
+        if cmds.optionVar(exists='CableRigger_attach'):
+            defaultAttach = cmds.optionVar(q='CableRigger_attach')
+        else:
+            defaultAttach = self.defaults['attach']
+        if cmds.optionVar(exists='CableRigger_falloff'):
+            defaultFalloff = cmds.optionVar(q='CableRigger_falloff')
+        else:
+            defaultFalloff = self.defaults['falloff']
+        if cmds.optionVar(exists='CableRigger_proxy'):
+            defaultProxy = cmds.optionVar(q='CableRigger_proxy')
+        else:
+            defaultProxy = self.defaults['proxy']
+        if cmds.optionVar(exists='CableRigger_stretchSamples'):
+            defaultStretchSamples = cmds.optionVar(q='CableRigger_stretchSamples')
+        else:
+            defaultStretchSamples = self.defaults['stretchSamples']
+        if cmds.optionVar(exists='CableRigger_geoBind'):
+            defaultGeoBind = cmds.optionVar(q='CableRigger_geoBind')
+        else:
+            defaultGeoBind = self.defaults['geoBind']
+        if cmds.optionVar(exists='CableRigger_fast'):
+            defaultFast = cmds.optionVar(q='CableRigger_fast')
+        else:
+            defaultFast = self.defaults['fast']
         
         #Curve Selector
         sel = cmds.ls(sl=True)
@@ -85,6 +173,14 @@ class RigCurveTool(object):
             bc=self.geoNameButtonPush 
             )
 
+        #Cables bundled along the curve, see rigBundle
+        self.widgets['bundleGrp'] = cmds.textFieldButtonGrp(
+            label='Bundle Cables:',
+            text='',
+            buttonLabel='<<<<',
+            bc=self.bundleButtonPush
+            )
+
         
         #Other Widgets\
         cmds.button(label='Reset below to default',width=500,command=self.setDefaults)
@@ -97,6 +193,14 @@ class RigCurveTool(object):
             maxValue=150,
             value=defaultJoints
         )
+        self.widgets['proxyGrp'] = cmds.intSliderGrp(
+            label='Proxy Joints',
+            field=True,
+            fieldMinValue=0,
+            minValue=0,
+            maxValue=50,
+            value=defaultProxy
+        )
         self.widgets['controlsGrp'] = cmds.intSliderGrp(
             label='Controls', 
             field=True,
@@ -131,6 +235,26 @@ class RigCurveTool(object):
             fieldMaxValue=1,
             value=defaultuMax
         )
+        self.widgets['attachGrp'] = cmds.optionMenuGrp(label='Joint Attach')
+        cmds.menuItem(label='classic')
+        cmds.menuItem(label='matrix')
+        cmds.optionMenuGrp(self.widgets['attachGrp'],e=True,value=defaultAttach)
+        self.widgets['falloffGrp'] = cmds.optionMenuGrp(label='Skin Weights')
+        for falloff in SKIN_FALLOFFS:
+            cmds.menuItem(label=falloff)
+        cmds.optionMenuGrp(self.widgets['falloffGrp'],e=True,value=defaultFalloff)
+        self.widgets['geoBindGrp'] = cmds.optionMenuGrp(label='Geo Bind')
+        for geoBind in GEO_BINDS:
+            cmds.menuItem(label=geoBind)
+        cmds.optionMenuGrp(self.widgets['geoBindGrp'],e=True,value=defaultGeoBind)
+        self.widgets['stretchSamplesGrp'] = cmds.intSliderGrp(
+            label='Stretch Samples',
+            field=True,
+            fieldMinValue=0,
+            minValue=0,
+            maxValue=64,
+            value=defaultStretchSamples
+        )
         cmds.text(label='')
         cmds.text(label="Adjust NURBS Strip:")
         self.widgets['spansGrp'] = cmds.intSliderGrp(
@@ -150,8 +274,17 @@ class RigCurveTool(object):
             value=defaultWidth
         )
         cmds.text(label='')
+        self.widgets['fastBox'] = cmds.checkBox(label='Fast Build (no undo, use Undo Last Rig)',value=defaultFast)
         cmds.button(label="\nRig Curve!",h=60,w=500,command=self.doIt)
-        cmds.button(label="Wire Geo Only (Rig already built)",h=30,w=500,command=self.wireOnly)
+        self.widgets['progressBar'] = cmds.progressBar(w=500,maxValue=100)
+        self.widgets['progressText'] = cmds.text(label='',w=500,align='left')
+        self.widgets['cancelButton'] = cmds.button(label="Cancel Build",h=30,w=500,enable=False,command=self.cancelBuild)
+        cmds.button(label="Rig Bundle (Curve is the guide)",h=30,w=500,command=self.bundleIt)
+        cmds.button(label="Update Existing Rig",h=30,w=500,command=self.updateIt)
+        cmds.button(label="Bind Geo Only (Rig already built)",h=30,w=500,command=self.wireOnly)
+        cmds.button(label="Undo Last Rig (Fast Build)",h=30,w=500,command=self.undoIt)
+        cmds.button(label="Bake Playback (over the playback range)",h=30,w=500,command=self.bakeIt)
+        cmds.button(label="Use Live Rig (drop the bake)",h=30,w=500,command=self.liveIt)
         cmds.showWindow(window)
         
     def curveNameButtonPush(self,*args,**kwargs):
@@ -168,44 +301,73 @@ class RigCurveTool(object):
             raise RuntimeError("select the cable geo")
         cmds.textFieldButtonGrp(self.widgets['geoNameGrp'],e=True,text=sel[0])
         
+    def bundleButtonPush(self,*args,**kwargs):
+        '''pops the selected curves into the bundle field'''
+        sel = cmds.ls(sl=True)
+        if not sel:
+            raise RuntimeError("select the cables to bundle")
+        cmds.textFieldButtonGrp(self.widgets['bundleGrp'],e=True,text=' '.join(sel))
+
     def setDefaults(self,*args,**kwargs):
         '''sets the sliders to defaults'''
         cmds.intSliderGrp(self.widgets['jointGrp'],e=True,v=self.defaults['joints'])
+        cmds.intSliderGrp(self.widgets['proxyGrp'],e=True,v=self.defaults['proxy'])
         cmds.intSliderGrp( self.widgets['controlsGrp'], e=True,v=self.defaults['ctrls'])
         cmds.floatSliderGrp(self.widgets['sizeGrp'], e=True,v=self.defaults['size'])
         cmds.intSliderGrp(self.widgets['spansGrp'], e=True,v=self.defaults['spans'])
         cmds.floatSliderGrp(self.widgets['widthGrp'] , e=True,v=self.defaults['width'])
         cmds.floatSliderGrp(self.widgets['uMinGrp'] , e=True,v=self.defaults['uMin'])
         cmds.floatSliderGrp(self.widgets['uMaxGrp'] , e=True,v=self.defaults['uMax'])
+        cmds.optionMenuGrp(self.widgets['attachGrp'],e=True,value=self.defaults['attach'])
+        cmds.optionMenuGrp(self.widgets['falloffGrp'],e=True,value=self.defaults['falloff'])
+        cmds.optionMenuGrp(self.widgets['geoBindGrp'],e=True,value=self.defaults['geoBind'])
+        cmds.intSliderGrp(self.widgets['stretchSamplesGrp'],e=True,v=self.defaults['stretchSamples'])
+        cmds.checkBox(self.widgets['fastBox'],e=True,value=self.defaults['fast'])
 
     def wireOnly(self,*args,**kwargs):
-        '''if the rig already exists, just wire geo'''
+        '''if the rig already exists, just bind geo, the way Geo Bind says'''
         crv = cmds.textFieldButtonGrp(self.widgets["curveNameGrp"],q=True,text=True)
         geo = cmds.textFieldButtonGrp(self.widgets["geoNameGrp"],q=True,text=True)
+        geoBind = cmds.optionMenuGrp(self.widgets["geoBindGrp"],q=True,value=True)
 
         if not crv or not geo or not cmds.objExists(geo):
             raise RuntimeError("Specify a curve and a geo to wire to an already existing rig")
 
-        #Find nodes based on name, do some error checking
-        rigNode = crv + "_Rig"
-        hiddenStuff = crv + "_NOTOUCH"
-        wireCrv = crv + "_skinned"
-        if not cmds.objExists(rigNode):
-            raise RuntimeError("%s not found in scene, rig not built yet?"%rigNode)
-        allKids = cmds.listRelatives(rigNode,ad=True)
-        if not cmds.objExists(wireCrv) and not wireCrv in allKids:
-            raise RuntimeError("wire curve %s not found under %s, wire curve deleted or not rigged?" %(wireCrv,rigNode))
-        if not cmds.objExists(hiddenStuff) and not hiddenStuff in allKids:
-            raise RuntimeError("Couldn't find the NOTOUCH node for this rig, curve not rigged?")
+        rig = getRig(crv)
+        if rig:
+            wireCrv = rig['skinnedCurve']
+            if not wireCrv:
+                raise RuntimeError("%s has no skinned curve, wire curve deleted?" % rig['rig'])
+        else:
+            #Rigs older than the metadata node. Find nodes based on name, do some error checking
+            rigNode = crv + "_Rig"
+            hiddenStuff = crv + "_NOTOUCH"
+            wireCrv = crv + "_skinned"
+            if not cmds.objExists(rigNode):
+                raise RuntimeError("%s not found in scene, rig not built yet?"%rigNode)
+            allKids = cmds.listRelatives(rigNode,ad=True)
+            if not cmds.objExists(wireCrv) and not wireCrv in allKids:
+                raise RuntimeError("wire curve %s not found under %s, wire curve deleted or not rigged?" %(wireCrv,rigNode))
+            if not cmds.objExists(hiddenStuff) and not hiddenStuff in allKids:
+                raise RuntimeError("Couldn't find the NOTOUCH node for this rig, curve not rigged?")
+            if geoBind == 'skin':
+                raise RuntimeError("%s was built before rigs had metadata, geo can only be wired to it" % rigNode)
 
-        #Make wire
-        cmds.wire(geo,w=wireCrv,n=crv + "_wire",dds=(0,10),en=1.0,ce=0,li=0)
-        print "wire done"
+        #Make wire, or skin
+        if rig:
+            self.bindGeo(crv,geo,rig,geoBind,self.rigSettings(rig['rig']) if geoBind == 'skin' else None)
+        else:
+            cmds.wire(geo,w=wireCrv,n=crv + "_wire",dds=(0,10),en=1.0,ce=0,li=0)
+        print("%s done" % geoBind)
 
 
-    def doIt(self,*args,**kwargs):
-        '''reads widget values and calls rigFromCurve'''
+    def readOptions(self):
+        '''reads widget values and saves them as optionVars.
+        Returns them as rigFromCurve keyword args, plus crv.
+        Fast Build isn't a rig setting, it sets self.fastBuild
+        '''
         joints = cmds.intSliderGrp(self.widgets["jointGrp"],q=True,v=True)
+        proxy = cmds.intSliderGrp(self.widgets["proxyGrp"],q=True,v=True)
         ctrls = cmds.intSliderGrp(self.widgets["controlsGrp"],q=True,v=True)
         size = cmds.floatSliderGrp(self.widgets["sizeGrp"],q=True,v=True)
         spans = cmds.intSliderGrp(self.widgets["spansGrp"],q=True,v=True)
@@ -214,89 +376,508 @@ class RigCurveTool(object):
         geo = cmds.textFieldButtonGrp(self.widgets["geoNameGrp"],q=True,text=True)
         uMin = cmds.floatSliderGrp(self.widgets["uMinGrp"],q=True,v=True)
         uMax = cmds.floatSliderGrp(self.widgets["uMaxGrp"],q=True,v=True)
-
+        attachMode = cmds.optionMenuGrp(self.widgets["attachGrp"],q=True,value=True)
+        falloff = cmds.optionMenuGrp(self.widgets["falloffGrp"],q=True,value=True)
+        geoBind = cmds.optionMenuGrp(self.widgets["geoBindGrp"],q=True,value=True)
+        stretchSamples = cmds.intSliderGrp(self.widgets["stretchSamplesGrp"],q=True,v=True)
+        self.fastBuild = bool(cmds.checkBox(self.widgets["fastBox"],q=True,value=True))
         
         #save options
         cmds.optionVar( iv=('CableRigger_joints', joints))
+        cmds.optionVar( iv=('CableRigger_proxy', proxy))
         cmds.optionVar( iv=('CableRigger_ctrls', ctrls))
         cmds.optionVar( fv=('CableRigger_size', size))
         cmds.optionVar( iv=('CableRigger_spans', spans))
         cmds.optionVar( fv=('CableRigger_width', width))
         cmds.optionVar( fv=('CableRigger_uMin', uMin))
         cmds.optionVar( fv=('CableRigger_uMax', uMax))
+        cmds.optionVar( sv=('CableRigger_attach', attachMode))
+        cmds.optionVar( sv=('CableRigger_falloff', falloff))
+        cmds.optionVar( sv=('CableRigger_geoBind', geoBind))
+        cmds.optionVar( iv=('CableRigger_stretchSamples', stretchSamples))
+        cmds.optionVar( iv=('CableRigger_fast', int(self.fastBuild)))
 
-        
+        return {'crv':crv,
+            'numSpans':spans,
+            'numJoints':joints,
+            'numCtrls':ctrls,
+            'stripWidth':width,
+            'ctrlWidth':size,
+            'geo':geo,
+            'uMin':uMin,
+            'uMax':uMax,
+            'attachMode':attachMode,
+            'falloff':falloff,
+            'proxyJoints':proxy,
+            'stretchSamples':stretchSamples,
+            'geoBind':geoBind
+        }
+
+    def doIt(self,*args,**kwargs):
+        '''reads widget values and starts a build with them, see startBuild'''
+        options = self.readOptions()
+        crv = options.pop('crv')
+        self.checkCurve(crv)
+        self.startBuild(crv,**options)
+
+    def bundleIt(self,*args,**kwargs):
+        '''reads widget values and rigs a bundle with them: the curve is the
+        guide, and the cables in the bundle field ride it. See rigBundle
+        '''
+        if self.running:
+            raise RuntimeError("%s is still being built" % self.running['crv'])
+        options = self.readOptions()
+        crv = options.pop('crv')
+        self.checkCurve(crv)
+        cables = cmds.textFieldButtonGrp(self.widgets['bundleGrp'],q=True,text=True).split()
+        if not cables:
+            raise RuntimeError("no cables to bundle, fill in Bundle Cables")
+        self.rigBundle(crv,cables,**options)
+
+    def updateIt(self,*args,**kwargs):
+        '''reads widget values and calls updateRig on the curve's rig.
+        Geo is left as it is
+        '''
+        if self.running:
+            raise RuntimeError("%s is still being built" % self.running['crv'])
+        options = self.readOptions()
+        crv = options.pop('crv')
+        del options['geo'], options['geoBind']
+        self.updateRig(crv,**options)
+        print("cable rig updated: %s" % (", ".join(self.buildInfo['changed']) or "nothing changed"))
+
+    def undoIt(self,*args,**kwargs):
+        '''deletes the last rig built with Fast Build, see undoRig'''
+        if self.running:
+            raise RuntimeError("%s is still being built, cancel it instead" % self.running['crv'])
+        print("%s undone" % self.undoRig())
+
+    def bakeIt(self,*args,**kwargs):
+        '''bakes the curve's rig over the playback range and plays it back
+        from the bake, see bakeRig
+        '''
+        crv = cmds.textFieldButtonGrp(self.widgets["curveNameGrp"],q=True,text=True)
+        path = self.bakeRig(crv)
+        print("%s baked to %s" % (crv,path))
+
+    def liveIt(self,*args,**kwargs):
+        '''puts the curve's rig back in charge of its skin, see useLiveRig'''
+        crv = cmds.textFieldButtonGrp(self.widgets["curveNameGrp"],q=True,text=True)
+        self.useLiveRig(crv)
+        print("%s is live" % crv)
+
+    def checkCurve(self,crv):
+        '''raise if crv isn't a nurbs curve in the scene'''
         if not crv or not cmds.objExists(crv):
             raise RuntimeError("%s not found in scene" % crv)
 
         shapes = cmds.listRelatives(crv,s=1)
         if not shapes or cmds.nodeType(shapes[0]) != 'nurbsCurve':
             raise RuntimeError("Selection is not a curve")
-            
-        self.rigFromCurve(crv,numSpans=spans,
-            numJoints=joints,
-            numCtrls=ctrls,
-            stripWidth=width,
-            ctrlWidth=size,
-            geo=geo,
-            uMin=uMin,
-            uMax=uMax
-        )
-        print "cable rig complete"
 
-    def rigFromCurve(self,crv,numSpans=8,numJoints=10,numCtrls=5,stripWidth = 1.0,ctrlWidth=2.0,geo=None,uMin=0.0,uMax=1.0):
+    def rigFromCurve(self,crv,numSpans=8,numJoints=10,numCtrls=5,stripWidth = 1.0,ctrlWidth=2.0,geo=None,uMin=0.0,uMax=1.0,attachMode='classic',falloff='closest',proxyJoints=0,geoBind='wire',stretchSamples=0):
         '''make a cable rig from the given curve
             numSpans = number of spans in Nurbs strip
             numJoints = number of joints riding on nurbs strip
             numCtrls = number of controls to make  
             stripWidth = width of nurbs strip (can make it easier to paint weights if wider) 
             ctrlWidth = size of ctrls 
+            attachMode = how skin joints ride the strip:
+                'classic' - locator + aimConstraint + parentConstraint per joint
+                'matrix' - surface info drives the joint through a matrix node,
+                    a much smaller graph that is faster to evaluate
+            falloff = how the strip and skinned curve are weighted:
+                'closest' - Maya's closest point bind
+                'linear', 'smoothstep', 'bspline' - computed from each CV's
+                    place down the curve (see curveWeights)
+            proxyJoints = number of joints in a low res proxy chain riding
+                the same strip, 0 for none. The first control gets an lod
+                attr picking the chain geo follows; the other chain is frozen
+                (see planLod)
+            geoBind = how geo follows the rig:
+                'wire' - wired to the skinned curve
+                'skin' - skinned straight to the skin joints, with weights
+                    worked out from the curve (see skinGeo). Cheaper to
+                    play back than a wire on dense geo. Not with proxyJoints
+            stretchSamples = how the strip's current length is measured for
+                stretch: 0 integrates the live curve's arc length with a
+                curveInfo, 2 or more sums distanceBetween nodes over that
+                many points down the strip, a fixed cost that slightly
+                underestimates the length (see planLength)
+        Returns the rig's top node (<crv>_Rig)
+        Build stats (like nodesPerJoint, and the time each stage took) are
+        left in self.buildInfo, see reportBuild
+        With self.fastBuild set, the build isn't undoable, see fastMode
         '''
+        settings = self.checkSettings(numSpans,numJoints,numCtrls,stripWidth,ctrlWidth,uMin,uMax,attachMode,falloff,proxyJoints,stretchSamples)
+        self.checkGeoBind(geoBind,proxyJoints)
     
-        shapes = cmds.listRelatives(crv,s=1)
-        crvShape = shapes[0]
+        with self.fastMode():
+            journal = rigPlan.NodeJournal()
+            self.profiler.begin()
+            try:
+                topNull = self.buildRig(crv,settings,geo,geoBind)
+            except Exception:
+                #roll back the whole build, so a failure leaves nothing half made
+                journal.rollback()
+                raise
+            finally:
+                report = self.profiler.end()
+                journal.stop()
+        self.keepJournal(crv,topNull,journal)
+        self.reportBuild(report,'build')
+        return topNull
+
+    def startBuild(self,crv,chunk=10,geo=None,geoBind='wire',onDone=None,**kwargs):
+        '''Starts a build like rigFromCurve's (kwargs are its settings) that
+        doesn't hold Maya up until it's done. It runs a step at a time from
+        the idle queue (evalDeferred), the network chunk skin joints' worth
+        at a time, and shows its progress and the time left on the window.
+        cancelBuild stops it and deletes what it made. When it's done it's
+        reported like any build, and onDone is called with the rig's top node.
+        The report only covers the steps, not the idle time in between.
+        Each step is its own undo chunk: delete the rig to get rid of it.
+        With self.fastBuild set, the steps aren't undoable, see fastMode.
+        '''
+        if self.running:
+            raise RuntimeError("%s is still being built, cancel it first" % self.running['crv'])
+        settings = self.checkSettings(**kwargs)
+        self.checkGeoBind(geoBind,settings['proxyJoints'])
+        #started again for each step (see buildChunk), so nodes made in
+        #between are never rolled back
+        journal = rigPlan.NodeJournal()
+        journal.stop()
+        self.running = {'crv':crv,'joints':settings['numJoints'],'onDone':onDone,'work':0.0,'fast':self.fastBuild,
+            'journal':journal,'steps':self.buildSteps(crv,settings,geo,chunk,geoBind)}
+        self.profiler.begin()
+        self.profiler.pause()
+        self.showProgress(0.0,"building %s" % crv)
+        cmds.evalDeferred(self.buildChunk,lowestPriority=True)
+
+    def buildChunk(self):
+        '''runs the next step of the build startBuild began, and queues the one after'''
+        running = self.running
+        if not running:
+            #cancelled
+            return
+        start = time.time()
+        #only what the build makes is journalled and profiled, not what's made in between
+        self.profiler.resume()
+        with self.fastMode(running['fast']):
+            running['journal'].start()
+            try:
+                progress = next(running['steps'],None)
+            except Exception:
+                self.endBuild()
+                running['journal'].rollback()
+                raise
+            finally:
+                running['journal'].stop()
+                self.profiler.pause()
+        running['work'] += time.time() - start
+        if progress is None:
+            self.keepJournal(running['crv'],self.buildInfo['rig'],running['journal'],running['fast'])
+            self.reportBuild(self.endBuild(),'build')
+            print("cable rig complete")
+            if running['onDone']:
+                running['onDone'](self.buildInfo['rig'])
+            return
+
+        #time left at what the joints so far have cost, plus the skinning and wiring after
+        joints = running['joints']
+        jointsDone = min(progress / BUILD_NETWORK_SHARE,1.0) * joints
+        message = "building %s" % running['crv']
+        if jointsDone:
+            left = running['work'] / jointsDone * (joints - jointsDone) / BUILD_NETWORK_SHARE
+            message = "building %s: %d of %d joints, about %ds left" % (running['crv'],jointsDone,joints,math.ceil(left))
+        self.showProgress(progress,message)
+        cmds.evalDeferred(self.buildChunk,lowestPriority=True)
+
+    def cancelBuild(self,*args,**kwargs):
+        '''stops the build startBuild began, and deletes everything it made'''
+        running = self.running
+        if not running:
+            return
+        running['steps'].close()
+        self.endBuild()
+        with self.fastMode(running['fast']):
+            running['journal'].rollback()
+        print("cable rig cancelled")
+
+    def endBuild(self):
+        '''clears the running build and its progress bar, returns its profile report'''
+        self.running = None
+        self.showProgress(None)
+        return self.profiler.end()
+
+    def showProgress(self,progress,message=''):
+        '''shows how far along (0-1) a build is on the window, None once it's over'''
+        bar = self.widgets.get('progressBar')
+        if not bar or not cmds.control(bar,exists=True):
+            return
+        cmds.progressBar(bar,e=True,progress=int(round(100 * (progress or 0.0))))
+        cmds.text(self.widgets['progressText'],e=True,label=message)
+        cmds.button(self.widgets['cancelButton'],e=True,enable=progress is not None)
+
+    def checkSettings(self,numSpans=8,numJoints=10,numCtrls=5,stripWidth=1.0,ctrlWidth=2.0,uMin=0.0,uMax=1.0,attachMode='classic',falloff='closest',proxyJoints=0,stretchSamples=0):
+        '''rigFromCurve's settings as a RIG_SETTINGS dict, raises if any are bad'''
+        if attachMode not in ATTACH_MODES:
+            raise RuntimeError("unknown attachMode %s" % attachMode)
+        if falloff not in SKIN_FALLOFFS:
+            raise RuntimeError("unknown falloff %s" % falloff)
+        self.checkProxyJoints(proxyJoints,numJoints)
+        self.checkStretchSamples(stretchSamples)
+        return {'numSpans':numSpans,'numJoints':numJoints,'numCtrls':numCtrls,
+            'stripWidth':stripWidth,'ctrlWidth':ctrlWidth,'uMin':uMin,'uMax':uMax,'attachMode':attachMode,'falloff':falloff,
+            'proxyJoints':proxyJoints,'stretchSamples':stretchSamples}
+
+    def checkGeoBind(self,geoBind,proxyJoints=0):
+        '''raise if geoBind isn't one of GEO_BINDS, or can't go with a
+        proxy chain of proxyJoints
+        '''
+        if geoBind not in GEO_BINDS:
+            raise RuntimeError("unknown geoBind %s" % geoBind)
+        if geoBind == 'skin' and proxyJoints:
+            #skinGeo binds the full chain only, which the LOD switch freezes
+            raise RuntimeError("geo can't be skinned to a rig with a proxy chain, it would freeze when lod is proxy. Wire it instead")
+
+    def checkProxyJoints(self,proxyJoints,numJoints):
+        '''raise if a proxy chain of proxyJoints can't go with numJoints'''
+        if proxyJoints and not 2 <= proxyJoints < numJoints:
+            raise RuntimeError("proxyJoints should be 0 (no proxy chain), or at least 2 and fewer than numJoints (%d)" % numJoints)
+
+    def checkStretchSamples(self,stretchSamples):
+        '''raise if stretchSamples isn't 0 (curveInfo) or a usable sample count'''
+        if stretchSamples == 1 or stretchSamples < 0:
+            raise RuntimeError("stretchSamples should be 0 (measure with curveInfo), or at least 2")
+
+    @contextlib.contextmanager
+    def fastMode(self,fast=None):
+        '''With block for a build. If fast (self.fastBuild by default), undo recording
+        and viewport refresh are off inside it: thousands of commands don't
+        each leave an undo record, so big builds are quicker and the undo
+        queue doesn't grow. Undo is put back the way it was however the block
+        ends. The build's nodes are journalled instead (see rigPlan.NodeJournal),
+        to roll a failure back or delete the rig with undoRig.
+        A block inside another leaves it to the outer one.
+        '''
+        if fast is None:
+            fast = self.fastBuild
+        if not fast or self.fastActive:
+            yield
+            return
+        undo = cmds.undoInfo(q=True,state=True)
+        self.fastActive = True
+        cmds.undoInfo(stateWithoutFlush=False)
+        cmds.refresh(suspend=True)
+        try:
+            yield
+        finally:
+            self.fastActive = False
+            cmds.refresh(suspend=False)
+            cmds.undoInfo(stateWithoutFlush=undo)
+
+    def keepJournal(self,crv,topNull,journal,fast=None):
+        '''keep a finished build's nodes for undoRig, if it was fast
+        (self.fastBuild by default)
+        '''
+        if fast is None:
+            fast = self.fastBuild
+        if fast:
+            self.fastBuilds.append({'crv':crv,'rig':topNull,'nodes':journal.created()})
+
+    def undoRig(self,crv=None):
+        '''Take back a fast build (see fastMode): delete exactly the nodes
+        it made, the way undo would have, for the last fast build of crv or
+        the last one of all. Nodes it made that are gone already are skipped.
+        The deletes are one undo chunk. Rigs built with undo on are undone
+        with Maya's undo.
+        Returns the undone rig's top node name, as it was built
+        '''
+        builds = [i for i,build in enumerate(self.fastBuilds) if crv is None or build['crv'] == crv]
+        if not builds:
+            raise RuntimeError("no fast build%s to undo" % (" of %s" % crv if crv else ""))
+        build = self.fastBuilds.pop(builds[-1])
+        nodes = cmds.ls(build['nodes']) if build['nodes'] else []
+        cmds.undoInfo(openChunk=True,chunkName='undoRig')
+        try:
+            for node in reversed(nodes):
+                if cmds.objExists(node):
+                    cmds.delete(node)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        return build['rig']
+
+    def stage(self,name):
+        '''with block that books its time to build stage name, see rigProfile'''
+        return self.profiler.stage(name)
+
+    def reportBuild(self,report,action):
+        '''Keep a finished build's profile in buildInfo: 'stages' as
+        [(name, totals)], 'total' and 'profile' (see rigProfile). Then hand
+        buildInfo to metricsHook, or print the stages if there's no hook.
+        '''
+        if report is None:
+            return
+        self.buildInfo['stages'] = report['stages']
+        self.buildInfo['total'] = report['total']
+        self.buildInfo['profile'] = report['profile']
+        if self.metricsHook:
+            self.metricsHook(self.buildInfo)
+        else:
+            print(rigProfile.formatReport(report,"%s %s" % (self.buildInfo['rig'],action)))
+
+    def buildRig(self,crv,settings,geo,geoBind='wire'):
+        '''does the work for rigFromCurve, settings as checkSettings returns
+        them. Returns the rig's top node
+        '''
+        for progress in self.buildSteps(crv,settings,geo,geoBind=geoBind):
+            pass
+        return self.buildInfo['rig']
+
+    def buildSteps(self,crv,settings,geo,chunk=None,geoBind='wire'):
+        '''Generator doing buildRig's work a step at a time, yielding how
+        far along the build is (0-1) after each. Geometry steps run directly,
+        the rest of the network is planned (see planRig) and made by
+        self.executor, chunk skin joints' worth of ops per step (all in one
+        step if chunk is None). Stages are only timed while a step runs.
+        '''
+        with self.stage('strip'):
+            surf = self.makeStrip(crv,settings['numSpans'],settings['stripWidth'])
+        yield 0.0
+
+        #Controls are curves, so they're made up front. The plan places them.
+        with self.stage('ctrlCurves'):
+            ctrls = self.makeCtrls(crv,settings['numCtrls'],settings['ctrlWidth'])
+        yield 0.0
+
+        #Read the strip once. Lengths and control placement are
+        #worked out from this in numpy, instead of with temporary nodes
+        with self.stage('geometry'):
+            fitted = self.fitPlugs(crv,curveGeometry.readSurface(surf),ctrls,settings['uMin'],settings['uMax'],settings['stretchSamples'])
+        with self.stage('plan'):
+            plan,nodesPerJoint = self.planRig(crv,surf,ctrls,fitted,settings)
+        yield 0.0
+
+        #the network is most of the work, call it BUILD_NETWORK_SHARE of it
+        names = dict()
+        opsPerChunk = None
+        if chunk:
+            joints = settings['numJoints'] + settings['proxyJoints']
+            opsPerChunk = int(math.ceil(len(plan.ops) * chunk / float(joints)))
+        steps = self.executor.steps(plan,names,opsPerChunk)
+        while True:
+            with self.stage('network'):
+                done = next(steps,None)
+            if done is None:
+                break
+            yield BUILD_NETWORK_SHARE * done / float(len(plan.ops))
+        self.finishRig(crv,surf,ctrls,plan,settings,geo,nodesPerJoint,names,geoBind)
+        yield 1.0
+
+    def makeCtrls(self,crv,numCtrls,ctrlWidth):
+        '''makes the rig's controls, returns them as (zero,ctrl) pairs'''
+        ctrls = []
+        for i in range(numCtrls):
+            #The first control is larger, and has the stretch attr
+            size = ctrlWidth*1.8 if i == 0 else ctrlWidth
+            ctrls.append(self.makeCubeCtrl(crv + "_Ctrl%02d"%i,size=size))
+        return ctrls
+
+    def fitPlugs(self,crv,stripGeo,ctrls,uMin,uMax,stretchSamples=0):
+        '''Values for the plugs of crv's rig that depend on where the curve
+        is, rather than on the rig's settings: the strip's rest length and
+        where the controls sit. These are the plan's geometric setAttrs.
+        ctrls are (zero,ctrl) pairs. The rest length is measured the way
+        stretchSamples says the rig measures it (see planLength).
+        Returns {plug: value}
+        '''
+        offsetCrv = crv + "_driverSurfCrv"
+        fit = self.cachedArrays('fit',curveCache.surfaceArrays(stripGeo),
+            lambda: self.fitStrip(stripGeo,len(ctrls),uMin,uMax,stretchSamples),
+            numCtrls=len(ctrls),uMin=uMin,uMax=uMax,stretchSamples=stretchSamples)
+        arcLength = float(fit['arcLength'])
+        fitted = {offsetCrv + "Stretch.input1X":arcLength, offsetCrv + "StretchBlender.c1r":arcLength}
+        for i,(zero,ctrl) in enumerate(ctrls):
+            fitted[zero + ".translate"] = [float(x) for x in fit['positions'][i]]
+            fitted[zero + ".rotate"] = [float(x) for x in fit['rotations'][i]]
+        return fitted
+
+    def fitStrip(self,stripGeo,numCtrls,uMin,uMax,stretchSamples=0):
+        '''the numbers fitPlugs needs from the strip: its rest length and where the controls sit on it'''
+        #work out where all the ctrls go in one go
+        ctrlPositions,ctrlRotations = curveGeometry.placeOnStrip(stripGeo,self.ctrlPercentages(numCtrls,uMin,uMax))
+        iso = stripGeo.isoCurve(0.5)
+        arcLength = iso.chordLength(stretchSamples) if stretchSamples else iso.length()
+        return {'arcLength':arcLength,'positions':ctrlPositions,'rotations':ctrlRotations}
+
+    def cachedArrays(self,kind,inputs,make,**params):
+        '''make()'s {name: array}, worked out from the inputs arrays with
+        params. With a cache, what it holds for the same kind, inputs and
+        params is returned instead, and new results are stored in it
+        '''
+        if not self.cache:
+            return make()
+        key = curveCache.contentKey(kind,inputs,**params)
+        arrays = self.cache.load(key)
+        if arrays is None:
+            arrays = make()
+            self.cache.save(key,arrays)
+        return arrays
+
+    def planRig(self,crv,surf,ctrls,fitted,settings):
+        '''Plans the rig's node network around an existing strip and controls.
+        ctrls are (zero,ctrl) pairs, fitted comes from fitPlugs and settings
+        holds RIG_SETTINGS.
+        Returns (plan, nodes made per skin joint)
+        '''
+        stripWidth = settings['stripWidth']
+        attachMode = settings['attachMode']
+        plan = rigPlan.BuildPlan(crv)
         #Make rig top nulls to parent stuff under
-        topNull = cmds.createNode('transform',n=crv + "_Rig")
-        hiddenStuff = cmds.createNode('transform',n=crv + "_NOTOUCH",p=topNull)
-        cmds.setAttr(hiddenStuff + ".inheritsTransform", 0)
-        cmds.setAttr(hiddenStuff + ".visibility", 0)
-        cmds.addAttr(topNull, ln="stretchAmount",dv=1.0,min=0,max=1)
-        cmds.addAttr(topNull, ln='slideAmount',dv=0.0)
+        topNull = plan.createNode('transform',crv + "_Rig")
+        hiddenStuff = plan.createNode('transform',crv + "_NOTOUCH",parent=topNull)
+        plan.setAttr(hiddenStuff + ".inheritsTransform", 0)
+        plan.setAttr(hiddenStuff + ".visibility", 0)
+        plan.addAttr(topNull,"stretchAmount",dv=1.0,min=0,max=1)
+        plan.addAttr(topNull,'slideAmount',dv=0.0)
+        plan.parent(surf,hiddenStuff)
 
-        #make nurbs strip using extrude
-        crossCurve = cmds.curve(d=1,p=[(0,0,-0.5 * stripWidth),(0,0,0.5 * stripWidth)],k=(0,1))
-        cmds.select([crossCurve,crv],r=1)
-        surf = cmds.extrude(ch=False,po=0,et=2,ucp=1,fpt=1,upn=1,rotation=0,scale=1,rsp=1)[0]
-        cmds.delete(crossCurve)
-        surf = cmds.rename(surf, crv + "_driverSurf")
-        cmds.parent(surf,hiddenStuff)
+        #keep the settings on the rig, so updateRig can tell what changed
+        for attr in ('numSpans','numJoints','numCtrls','proxyJoints','stretchSamples'):
+            plan.addAttr(topNull,attr,at='long',dv=settings[attr])
+        for attr in ('stripWidth','ctrlWidth','uMin','uMax'):
+            plan.addAttr(topNull,attr,at='double',dv=float(settings[attr]))
+        for attr,choices in sorted(RIG_CHOICES.items()):
+            plan.addAttr(topNull,attr,at='enum',en=':'.join(choices),dv=choices.index(settings[attr]))
 
-        #Rebuild strip to proper number of spans
-        cmds.rebuildSurface(surf,ch=0,rpo=1,rt=0,end=1,kr=0,kcp=0,kc=1,sv=numSpans,su=0,du=1,tol=0.01,fr=0,dir=2)
+        #metadata node, every part of the rig is connected to it (see getRig)
+        meta = plan.createNode('network',crv + "_RigMeta")
+        plan.addAttr(meta,'cableRigMeta',at='long',dv=1)
+        for attr in META_PARTS:
+            plan.addAttr(meta,attr,at='message')
+        for attr in META_LISTS:
+            plan.addAttr(meta,attr,at='message',m=True)
 
         #make live curve on surface down the middle 
         #this is used later for noStretch
-        curvMaker = cmds.createNode('curveFromSurfaceIso', n = surf+"CurveIso")
-        cmds.setAttr(curvMaker + ".isoparmValue", 0.5)
-        cmds.setAttr(curvMaker + ".isoparmDirection", 1)
-        cmds.connectAttr(surf + ".worldSpace[0]", curvMaker + ".inputSurface")
-
-        offsetCrvShp = cmds.createNode("nurbsCurve", n=crv + "_driverSurfCrvShape")
-        offsetCrv = cmds.listRelatives(p=1)[0]
-        offsetCrv = cmds.rename(offsetCrv,crv + "_driverSurfCrv")
-        cmds.connectAttr(curvMaker + ".outputCurve", offsetCrvShp + ".create")
-        cmds.parent(offsetCrv, hiddenStuff)
+        curvMaker = plan.createNode('curveFromSurfaceIso',surf+"CurveIso")
+        plan.setAttr(curvMaker + ".isoparmValue", 0.5)
+        plan.setAttr(curvMaker + ".isoparmDirection", 1)
+        plan.connectAttr(surf + ".worldSpace[0]", curvMaker + ".inputSurface")
+
+        offsetCrv = plan.createNode("transform",crv + "_driverSurfCrv",parent=hiddenStuff)
+        offsetCrvShp = plan.createNode("nurbsCurve",crv + "_driverSurfCrvShape",parent=offsetCrv)
+        plan.connectAttr(curvMaker + ".outputCurve", offsetCrvShp + ".create")
     
         #Measure curve length and divide by start length. 
         #This turns curve length into a normalized value that is
         #useful for multiplying by UV values later to control stretch
-        crvInfo = cmds.createNode('curveInfo', n=offsetCrv + "Info")
-        cmds.connectAttr(offsetCrv + ".worldSpace[0]", crvInfo + ".ic")
-        arcLength = cmds.getAttr(crvInfo + ".al")
-        stretchAmountNode = cmds.createNode('multiplyDivide', n=offsetCrv + "Stretch")
-        cmds.setAttr(stretchAmountNode + ".op" , 2) #divide
-        cmds.setAttr(stretchAmountNode + ".input1X", arcLength)
-        cmds.connectAttr( crvInfo + ".al",stretchAmountNode + ".input2X")
+        length = self.planLength(plan,meta,surf,offsetCrv,settings['stretchSamples'])
+        stretchAmountNode = plan.createNode('multiplyDivide',offsetCrv + "Stretch")
+        plan.setAttr(stretchAmountNode + ".op" , 2) #divide
+        plan.setAttr(stretchAmountNode + ".input1X", fitted[stretchAmountNode + ".input1X"], geometric=True)
+        plan.connectAttr(length,stretchAmountNode + ".input2X")
     
         #Stretch Blender blends start length with current length
         #and pipes it back into stretchAmoundNode's startLength, to "trick" it into
@@ -304,151 +885,1117 @@ class RigCurveTool(object):
         #That way, when user turns on this "noStretch" attr, the startLength will
         #be made to equal current length, and stretchAmountNode will always be 1.
         #so the chain will not stretch. 
-        stretchBlender = cmds.createNode('blendColors', n =offsetCrv + "StretchBlender")
-        cmds.setAttr(stretchBlender + ".c1r", arcLength)
-        cmds.connectAttr(crvInfo + ".al", stretchBlender + ".c2r")
-        cmds.connectAttr(stretchBlender + ".opr", stretchAmountNode + ".input1X")
-        cmds.connectAttr(topNull + ".stretchAmount",stretchBlender + ".blender")
+        stretchBlender = plan.createNode('blendColors',offsetCrv + "StretchBlender")
+        plan.setAttr(stretchBlender + ".c1r", fitted[stretchBlender + ".c1r"], geometric=True)
+        plan.connectAttr(length, stretchBlender + ".c2r")
+        plan.connectAttr(stretchBlender + ".opr", stretchAmountNode + ".input1X")
+        plan.connectAttr(topNull + ".stretchAmount",stretchBlender + ".blender")
     
         #make skin joints and attach to surface
-        skinJoints = []
-        skinJointParent = cmds.createNode('transform',n=crv + "_skinJoints",p=topNull)
+        skinJointParent = plan.createNode('transform',crv + "_skinJoints",parent=topNull)
+        if attachMode == 'matrix':
+            #matrix joints are driven in world space, so keep the rig's transform off them
+            plan.setAttr(skinJointParent + ".inheritsTransform", 0)
+        #the parts new joints and controls hang off, shaped like getRig's result
+        parts = {'meta':meta,'curve':crv,'rig':topNull,'hidden':hiddenStuff,'surface':surf,
+            'path':offsetCrv,'stretch':stretchAmountNode,'stretchBlender':stretchBlender,
+            'skinJointGroup':skinJointParent}
+        if settings['proxyJoints']:
+            self.planLod(plan,parts,ctrls[0][1],attachMode)
+        nodeCount = plan.nodeCount()
+        percentages = self.jointPercentages(settings['numJoints'],settings['uMin'],settings['uMax'])
+        self.planSkinJoints(plan,crv,parts,percentages,stripWidth,attachMode)
+        #every node made per joint, including the joint itself
+        nodesPerJoint = (plan.nodeCount() - nodeCount) / float(settings['numJoints'])
+        if settings['proxyJoints']:
+            percentages = self.jointPercentages(settings['proxyJoints'],settings['uMin'],settings['uMax'])
+            self.planSkinJoints(plan,crv,parts,percentages,stripWidth,attachMode,proxy=True)
+
+        #add controls
+        parts['stripJointGroup'] = plan.createNode('transform',crv + "_stripJoints",parent=hiddenStuff)
+        parts['ctrlGroup'] = plan.createNode('transform',crv+"_Ctrls",parent=topNull)
+        for i,(zero,ctrl) in enumerate(ctrls):
+            if i == 0:
+                plan.addAttr(ctrl,"noStretch",dv=0.0,min=0,max=1,k=1,s=1)
+                plan.addAttr(ctrl,'slideAmount',dv=0.0,min=-1.0,max=1.0,k=1,s=1)
+                plan.connectAttr(ctrl + ".noStretch",topNull + ".stretchAmount")
+                plan.connectAttr(ctrl + ".slideAmount",topNull + ".slideAmount")
+            self.planCtrl(plan,parts,i,zero,ctrl,fitted,stripWidth)
+
+        for attr in META_PARTS:
+            if attr in parts:
+                plan.connectAttr(parts[attr] + ".message",meta + "." + attr)
+        return plan,nodesPerJoint
+
+    def finishRig(self,crv,surf,ctrls,plan,settings,geo,nodesPerJoint,names=None,geoBind='wire'):
+        '''Builds a rig planned by planRig, then skins it and binds geo to it.
+        If the plan's been executed already, names is what executing it
+        returned. Returns the rig's top node
+        '''
+        if names is None:
+            with self.stage('network'):
+                names = self.executor.execute(plan)
+        self.lastPlan = plan
+        topNull = names[crv + "_Rig"]
+        meta = names[crv + "_RigMeta"]
+        skinJoints = [names[crv + "_driverJoint%02d"%i] for i in range(settings['numJoints'])]
+        stripJoints = [names[ctrl + "StripJnt"] for zero,ctrl in ctrls]
+        attachMode = settings['attachMode']
+        self.buildInfo = {'rig':topNull,'attachMode':attachMode,'nodesPerJoint':nodesPerJoint,'ops':plan.counts()}
+        
+        with self.stage('stripSkin'):
+            stripSkin = self.skinStrip(stripJoints,surf)
+            self.linkRigPart(meta,'stripSkin',stripSkin)
+        with self.stage('skinnedCurve'):
+            newCurve,curveSkin = self.makeSkinnedCurve(crv,topNull,skinJoints,settings['numJoints'])
+            self.linkRigPart(meta,'skinnedCurve',newCurve)
+            self.linkRigPart(meta,'curveSkin',curveSkin)
+            if settings['proxyJoints']:
+                proxyJoints = [names[crv + "_proxyJoint%02d"%i] for i in range(settings['proxyJoints'])]
+                proxyCurve,proxySkin = self.makeSkinnedCurve(crv,topNull,proxyJoints,settings['proxyJoints'],"_proxySkinned")
+                self.linkRigPart(meta,'proxySkinnedCurve',proxyCurve)
+                self.linkRigPart(meta,'proxyCurveSkin',proxySkin)
+        if settings['falloff'] != 'closest':
+            with self.stage('weights'):
+                self.weightStrip(stripSkin,surf,stripJoints,settings)
+                self.weightCurve(curveSkin,newCurve,skinJoints,settings)
+                if settings['proxyJoints']:
+                    self.weightCurve(proxySkin,proxyCurve,proxyJoints,settings)
+        if geo:
+            self.bindGeo(crv,geo,{'meta':meta,'hidden':names[crv + "_NOTOUCH"],'lod':names.get(crv + "_lod"),
+                'skinnedCurve':newCurve,'proxySkinnedCurve':proxyCurve if settings['proxyJoints'] else None,
+                'ctrls':[ctrl for zero,ctrl in ctrls],'skinJoints':skinJoints},geoBind,settings)
+        return topNull
+
+    def makeStrip(self,crv,numSpans,stripWidth):
+        '''make the rig's nurbs strip along crv, returns it'''
+        #a strip made on the same curve before is made straight from its cvs
+        key = None
+        if self.cache:
+            key = curveCache.contentKey('strip',curveCache.curveArrays(curveGeometry.readCurve(crv)),numSpans=numSpans,stripWidth=stripWidth)
+            arrays = self.cache.load(key)
+            if arrays is not None:
+                return self.surfaceFromArrays(crv + "_driverSurf",arrays)
+
+        #make nurbs strip using extrude
+        crossCurve = cmds.curve(d=1,p=[(0,0,-0.5 * stripWidth),(0,0,0.5 * stripWidth)],k=(0,1))
+        cmds.select([crossCurve,crv],r=1)
+        surf = cmds.extrude(ch=False,po=0,et=2,ucp=1,fpt=1,upn=1,rotation=0,scale=1,rsp=1)[0]
+        cmds.delete(crossCurve)
+        surf = cmds.rename(surf, crv + "_driverSurf")
+
+        #Rebuild strip to proper number of spans
+        cmds.rebuildSurface(surf,ch=0,rpo=1,rt=0,end=1,kr=0,kcp=0,kc=1,sv=numSpans,su=0,du=1,tol=0.01,fr=0,dir=2)
+        if key:
+            self.cache.save(key,curveCache.surfaceArrays(curveGeometry.readSurface(surf)))
+        return surf
+
+    def surfaceFromArrays(self,name,arrays):
+        '''make a nurbs surface from curveCache.surfaceArrays, returns it'''
+        surface = curveCache.toSurface(arrays)
+        #maya leaves off the first and last of the full knot vectors
+        return cmds.surface(du=surface.degreeU,dv=surface.degreeV,
+            ku=[float(k) for k in surface.knotsU[1:-1]],kv=[float(k) for k in surface.knotsV[1:-1]],
+            p=[tuple(float(x) for x in cv) for cv in surface.cvs.reshape(-1,3)],n=name)
+
+    def jointPercentages(self,numJoints,uMin,uMax):
+        '''how far down the strip (0-1) each skin joint rides'''
+        percentages = []
         for i in range(numJoints):
-            cmds.select(clear=True)
-            jnt = cmds.joint(p=(0,0,0),n=crv + "_driverJoint%02d"%i) 
-            locator = cmds.spaceLocator(n=crv + "driverLoc%02d"%i)[0]
-            cmds.setAttr(locator + ".localScale",stripWidth,stripWidth,stripWidth)
-            cmds.parent(locator,hiddenStuff)
             percentage = float(i)/(numJoints-1.0)
-            print "percentage:", percentage
-            print i
             if i > 1 and i < numJoints-2:
                 percentage = uMin + (percentage * (uMax-uMin))
-                print "\tinterp percent", percentage
-            posNode,aimCnss,moPath,slider = self.attachObjToSurf(locator,surf,offsetCrv,stretchAmountNode,percentage)
-            cmds.connectAttr(topNull + ".slideAmount", slider + ".i2")
-            cmds.parentConstraint(locator,jnt,mo=False)
-            if len(skinJoints):
-                cmds.parent(jnt,skinJoints[-1])
-            else:
-                cmds.parent(jnt,skinJointParent)
-            skinJoints.append(jnt)
-            cmds.setAttr(jnt + ".radius",stripWidth) #just cosmetic
-        
-        #add controls
-        ctrls = []
-        stripJoints = []
-        stripJointParent = cmds.createNode('transform',n=crv + "_stripJoints",p=hiddenStuff)
-        ctrlParent = cmds.createNode('transform',n=crv+"_Ctrls",p=topNull)
-    
+            percentages.append(percentage)
+        return percentages
+
+    def ctrlPercentages(self,numCtrls,uMin,uMax):
+        '''how far down the strip (0-1) each control sits'''
+        percentages = []
         for i in range(numCtrls):
-            #The first control is larger, and has the stretch attr
-            if i == 0:
-                zero,ctrl = self.makeCubeCtrl(crv + "_Ctrl%02d"%i,size=ctrlWidth*1.8)
-                cmds.addAttr(ctrl,ln="noStretch",dv=0.0,min=0,max=1,k=1,s=1)
-                cmds.addAttr(ctrl,ln='slideAmount',dv=0.0,min=-1.0,max=1.0,k=1,s=1)
-                cmds.connectAttr(ctrl + ".noStretch",topNull + ".stretchAmount")
-                cmds.connectAttr(ctrl + ".slideAmount",topNull + ".slideAmount")
-            else:
-                zero,ctrl = self.makeCubeCtrl(crv + "_Ctrl%02d"%i,size=ctrlWidth)
-            
-            #Make the joint the control. These drive the nurbs strip.
-            cmds.select(clear=True)
-            jnt = cmds.joint(p=(0,0,0),n=ctrl + "StripJnt")
-            cmds.parentConstraint(ctrl,jnt,mo=False)
-            cmds.setAttr(jnt + ".radius", stripWidth * 1.3) #just cosmetic
-        
-            #briefly attach ctrls to strip to align them
             percentage = float(i)/(numCtrls-1.0)
-            print "ctrl percentage:",percentage
             if i > 0 and i < numCtrls-1:
                 percentage = uMin + (percentage * (uMax-uMin))
-                print '\tinterp percentage:', percentage
-            cmds.delete(self.attachObjToSurf(zero,surf,offsetCrv,stretchAmountNode,percentage))
-            ctrls.append(ctrl)
-            cmds.parent(jnt,stripJointParent)
-            stripJoints.append(jnt)
-            cmds.parent(zero,ctrlParent)
-        
-        #skin strip to controls
+            percentages.append(percentage)
+        return percentages
+
+    def planSkinJoints(self,plan,crv,parts,percentages,stripWidth,attachMode,first=0,parentJoint=None,proxy=False):
+        '''Adds skin joints riding the rig's strip to plan, one per percentage,
+        numbered from first. parts are the rig's parts, as getRig returns
+        them. In classic mode the new joints are chained on to parentJoint
+        if it's given. With proxy they're the proxy chain's joints instead.
+        Returns the planned joints
+        '''
+        topNull = parts['rig']
+        hiddenStuff = parts['hidden']
+        surf = parts['surface']
+        if proxy:
+            skinJointParent,jointName,locName = parts['proxyJointGroup'],crv + "_proxyJoint%02d",crv + "proxyLoc%02d"
+            jointList,stretchList,lodState = 'proxyJoints','proxyStretchCtrls',".outColorG"
+        else:
+            skinJointParent,jointName,locName = parts['skinJointGroup'],crv + "_driverJoint%02d",crv + "driverLoc%02d"
+            jointList,stretchList,lodState = 'skinJoints','stretchCtrls',".outColorR"
+        offsetCrv = parts['path']
+        stretchAmountNode = parts['stretch']
+        if attachMode == 'matrix':
+            matrixAxes = self.matrixAxes(surf)
+            offsetParent = cmds.attributeQuery('offsetParentMatrix',type='joint',exists=True)
+        skinJoints = []
+        for i,percentage in enumerate(percentages,first):
+            if attachMode == 'matrix':
+                jnt = plan.createNode('joint',jointName%i,parent=skinJointParent)
+                posNode,orient,moPath,slider = self.planAttachMatrix(plan,jnt,surf,offsetCrv,stretchAmountNode,percentage,matrixAxes,offsetParent)
+            else:
+                parent = skinJoints[-1] if skinJoints else parentJoint or skinJointParent
+                jnt = plan.createNode('joint',jointName%i,parent=parent)
+                locator = plan.createNode('transform',locName%i,parent=hiddenStuff)
+                plan.createNode('locator',locator + "Shape",parent=locator)
+                plan.setAttr(locator + "Shape.localScale",[stripWidth,stripWidth,stripWidth])
+                posNode,aimCnss,moPath,slider = self.planAttach(plan,locator,surf,offsetCrv,stretchAmountNode,percentage)
+                orient = (aimCnss,)
+                plan.constrain('parentConstraint',locator,jnt)
+            plan.connectAttr(topNull + ".slideAmount", slider + ".i2")
+            obj = jnt if attachMode == 'matrix' else locator
+            plan.connectAttr(jnt + ".message", parts['meta'] + ".%s[%d]"%(jointList,i))
+            plan.connectAttr(obj + "StretchCtrl.message", parts['meta'] + ".%s[%d]"%(stretchList,i))
+            if parts.get('lod'):
+                #the LOD switch freezes this network while the other chain is picked
+                for node in (obj + "StretchCtrl",slider,moPath,obj + "ClsPnt",posNode) + orient:
+                    plan.connectAttr(parts['lod'] + lodState, node + ".nodeState")
+            skinJoints.append(jnt)
+            plan.setAttr(jnt + ".radius",stripWidth) #just cosmetic
+        return skinJoints
+
+    def planLength(self,plan,meta,surf,path,stretchSamples):
+        '''Adds the nodes measuring the strip's current length to plan, and
+        lists them on the rig's metadata node as lengthNodes. With
+        stretchSamples 0 it's a curveInfo integrating the arc length of path
+        (the live curve down the strip). Otherwise that many
+        pointOnSurfaceInfo nodes sample the middle of the strip, evenly
+        spaced in V, and the distanceBetween nodes between them are summed:
+        a fixed number of point evaluations, measuring chords rather than
+        the curve. fitPlugs measures the rest length the same way, so the
+        rig doesn't stretch at rest.
+        Returns the plug the length comes out of
+        '''
+        if not stretchSamples:
+            crvInfo = plan.createNode('curveInfo',path + "Info")
+            plan.connectAttr(path + ".worldSpace[0]", crvInfo + ".ic")
+            plan.connectAttr(crvInfo + ".message", meta + ".lengthNodes[0]")
+            return crvInfo + ".al"
+        total = plan.createNode('plusMinusAverage',path + "Length")
+        nodes = [total]
+        for i in range(stretchSamples):
+            sample = plan.createNode('pointOnSurfaceInfo',path + "Sample%02d"%i)
+            plan.setAttr(sample + ".turnOnPercentage", 1)
+            plan.setAttr(sample + ".parameterU", 0.5)
+            plan.setAttr(sample + ".parameterV", i/(stretchSamples-1.0))
+            plan.connectAttr(surf + ".worldSpace[0]", sample + ".inputSurface")
+            if i:
+                dist = plan.createNode('distanceBetween',path + "Dist%02d"%(i-1))
+                plan.connectAttr(nodes[-1] + ".position", dist + ".point1")
+                plan.connectAttr(sample + ".position", dist + ".point2")
+                plan.connectAttr(dist + ".distance", total + ".input1D[%d]"%(i-1))
+                nodes.append(dist)
+            nodes.append(sample)
+        for i,node in enumerate(nodes):
+            plan.connectAttr(node + ".message", meta + ".lengthNodes[%d]"%i)
+        return total + ".output1D"
+
+    def planLod(self,plan,parts,ctrl,attachMode):
+        '''Adds the LOD switch to plan: an lod enum on ctrl (the first
+        control) picking the full or the proxy joint chain, and the group the
+        proxy joints go under. The chain not picked is hidden, and its attach
+        networks are set to a blocking nodeState so they aren't evaluated
+        at all. The condition node doing this is added to parts as 'lod'.
+        '''
+        crv = parts['curve']
+        plan.addAttr(ctrl,'lod',at='enum',en=':'.join(LOD_LEVELS),k=1)
+        lod = plan.createNode('condition',crv + "_lod")
+        plan.connectAttr(ctrl + ".lod",lod + ".firstTerm")
+        #lod == full: R is the full chain's nodeState, G the proxy chain's,
+        #B the full chain's visibility
+        plan.setAttr(lod + ".colorIfTrue",[0,2,1])
+        plan.setAttr(lod + ".colorIfFalse",[2,0,0])
+        plan.connectAttr(lod + ".outColorB",parts['skinJointGroup'] + ".visibility")
+        proxyParent = plan.createNode('transform',crv + "_proxyJoints",parent=parts['rig'])
+        if attachMode == 'matrix':
+            plan.setAttr(proxyParent + ".inheritsTransform", 0)
+        plan.connectAttr(ctrl + ".lod",proxyParent + ".visibility")
+        parts['lod'] = lod
+        parts['proxyJointGroup'] = proxyParent
+
+    def planCtrl(self,plan,parts,i,zero,ctrl,fitted,stripWidth):
+        '''Adds control i's strip joint to plan, and puts the control in place.
+        parts are the rig's parts, as getRig returns them.
+        Returns the planned strip joint
+        '''
+        #Make the joint the control. These drive the nurbs strip.
+        jnt = plan.createNode('joint',ctrl + "StripJnt",parent=parts['stripJointGroup'])
+        plan.constrain('parentConstraint',ctrl,jnt)
+        plan.setAttr(jnt + ".radius", stripWidth * 1.3) #just cosmetic
+        plan.parent(zero,parts['ctrlGroup'])
+        plan.connectAttr(ctrl + ".message", parts['meta'] + ".ctrls[%d]"%i)
+        plan.connectAttr(jnt + ".message", parts['meta'] + ".stripJoints[%d]"%i)
+        self.planPlaceCtrl(plan,zero,fitted)
+        return jnt
+
+    def planPlaceCtrl(self,plan,zero,fitted):
+        '''align a control's zero to the strip, the same way attachObjToSurf would'''
+        plan.setAttr(zero + ".translate",fitted[zero + ".translate"],geometric=True)
+        plan.setAttr(zero + ".rotate",fitted[zero + ".rotate"],geometric=True)
+
+    def skinStrip(self,stripJoints,surf):
+        '''skin strip to controls'''
         #Can get some different behavior by chaning the strip's weights
         #or perhaps using dual quat. mode on the skinCluster
         skinObjs = stripJoints + [surf]
-        cmds.skinCluster(skinObjs,
+        return cmds.skinCluster(skinObjs,
             bindMethod=0, #closest Point
             sm=0, #standard bind method
             ih=True, #ignore hierarchy
-        )    
-        
-        #rebuild curve and skin to joints
+        )[0]
+
+    def makeSkinnedCurve(self,crv,parent,skinJoints,numJoints,suffix="_skinned"):
+        '''rebuild a copy of crv to suit the skin joints, and skin it to them.
+        This is the curve cable geo is wired to.
+        Returns (curve, skinCluster)
+        '''
         newCurve = cmds.duplicate(crv)[0]
-        newCurve = cmds.rename(newCurve, crv + "_skinned")
-        cmds.parent(newCurve, topNull)
+        newCurve = cmds.rename(newCurve, crv + suffix)
+        cmds.parent(newCurve, parent)
         cmds.rebuildCurve(newCurve,ch=0,rpo=1,rt=0,end=1,kr=0,kcp=0,kep=1,kt=0,s=numJoints-2,d=3,tol=0.01)
+        return newCurve,self.skinCurve(skinJoints,newCurve)
+
+    def skinCurve(self,skinJoints,newCurve):
+        '''skin the skinned curve to the skin joints'''
         skinObjs = skinJoints + [newCurve]
-        cmds.skinCluster(skinObjs,
+        return cmds.skinCluster(skinObjs,
             bindMethod = 0,
             sm = 0,
             ih=True,
             mi=1
-            )
-        if geo:
-            wireDef,wireCrv = cmds.wire(geo,w=newCurve,n=crv + "_wire",dds=(0,10),en=1.0,ce=0,li=0)
-            print wireDef
+            )[0]
+
+    def weightStrip(self,skin,surf,stripJoints,settings):
+        '''weight the strip to the controls' strip joints by the falloff in settings'''
+        percentages = self.ctrlPercentages(settings['numCtrls'],settings['uMin'],settings['uMax'])
+        stripGeo = curveGeometry.readSurface(surf)
+        weights = self.cachedArrays('stripWeights',curveCache.surfaceArrays(stripGeo),
+            lambda: {'weights':curveWeights.computeWeights(curveWeights.stripFractions(stripGeo),percentages,settings['falloff'])},
+            numCtrls=settings['numCtrls'],uMin=settings['uMin'],uMax=settings['uMax'],falloff=settings['falloff'])
+        curveWeights.writeWeights(skin,weights['weights'],stripJoints)
+
+    def weightCurve(self,skin,newCurve,skinJoints,settings):
+        '''weight a skinned curve to its joints (the skin or proxy joints) by the falloff in settings'''
+        percentages = self.jointPercentages(len(skinJoints),settings['uMin'],settings['uMax'])
+        curve = curveGeometry.readCurve(newCurve)
+        weights = self.cachedArrays('curveWeights',curveCache.curveArrays(curve),
+            lambda: {'weights':curveWeights.computeWeights(curveWeights.cvFractions(curve),percentages,settings['falloff'])},
+            numJoints=len(skinJoints),uMin=settings['uMin'],uMax=settings['uMax'],falloff=settings['falloff'])
+        curveWeights.writeWeights(skin,weights['weights'],skinJoints)
+
+    def wireGeo(self,crv,geo,wireCrv,hiddenStuff):
+        '''wire geo to the rig's skinned curve, returns the wire deformer'''
+        wireDef,wireCrv = cmds.wire(geo,w=wireCrv,n=crv + "_wire",dds=(0,10),en=1.0,ce=0,li=0)
+        #a curve wired before is already there
+        if cmds.listRelatives(wireCrv,p=True) != [hiddenStuff]:
             cmds.parent(wireCrv,hiddenStuff)
-            if cmds.objExists(wireCrv+"BaseWire"):
-                cmds.parent(wireCrv+"BaseWire",hiddenStuff)
+        if cmds.objExists(wireCrv+"BaseWire"):
+            cmds.parent(wireCrv+"BaseWire",hiddenStuff)
+        return wireDef
+
+    def bindGeo(self,crv,geo,rig,geoBind,settings=None):
+        '''Bind geo to the rig the way geoBind (one of GEO_BINDS) says, with
+        wireRig or skinGeo. rig is shaped like getRig's result, settings
+        like rigSettings' (only skinGeo needs them).
+        Returns the deformers made
+        '''
+        self.checkGeoBind(geoBind,settings['proxyJoints'] if settings else 0)
+        if geoBind == 'skin':
+            with self.stage('geoSkin'):
+                return [self.skinGeo(crv,geo,rig,settings)]
+        with self.stage('wire'):
+            return self.wireRig(crv,geo,rig)
+
+    def skinGeo(self,crv,geo,rig,settings):
+        '''Skin geo straight to the rig's skin joints. Each vertex is weighted
+        by where it's closest to on the skinned curve, in arc length,
+        against where the joints ride, with the rig's falloff (linear in
+        place of closest). The closest point search is done once, here,
+        where a wire does it every frame, so playback is a plain skinCluster.
+        Returns the skinCluster
+        '''
+        skinJoints = rig['skinJoints']
+        skin = cmds.skinCluster(skinJoints + [geo],
+            n=crv + "_geoSkin",
+            tsb=True, #just the skin joints
+            bindMethod=0,
+            sm=0,
+            ih=True
+            )[0]
+        falloff = 'linear' if settings['falloff'] == 'closest' else settings['falloff']
+        percentages = self.jointPercentages(len(skinJoints),settings['uMin'],settings['uMax'])
+        curve = curveGeometry.readCurve(rig['skinnedCurve'])
+        points = curveGeometry.readMeshPoints(geo)
+        inputs = curveCache.curveArrays(curve)
+        inputs['points'] = points
+        weights = self.cachedArrays('geoWeights',inputs,
+            lambda: {'weights':curveWeights.computeWeights(curveWeights.pointFractions(curve,points),percentages,falloff)},
+            numJoints=len(skinJoints),uMin=settings['uMin'],uMax=settings['uMax'],falloff=falloff)
+        curveWeights.writeWeights(skin,weights['weights'],skinJoints)
+        self.linkRigPart(rig['meta'],'geoSkins',skin)
+        return skin
+
+    def wireRig(self,crv,geo,rig):
+        '''Wire geo to the rig's skinned curve, and to its proxy skinned
+        curve if it has one, with the lod attr picking which wire deforms.
+        rig is shaped like getRig's result, though only the parts wiring
+        reads are needed. Returns the wires
+        '''
+        wires = [self.wireGeo(crv,geo,rig['skinnedCurve'],rig['hidden'])]
+        if rig['proxySkinnedCurve']:
+            wires.append(self.wireGeo(crv + "_proxy",geo,rig['proxySkinnedCurve'],rig['hidden']))
+            #a wire with no envelope is skipped
+            cmds.connectAttr(rig['lod'] + ".outColorB",wires[0] + ".envelope")
+            cmds.connectAttr(rig['ctrls'][0] + ".lod",wires[1] + ".envelope")
+        for wire in wires:
+            self.linkRigPart(rig['meta'],'wires',wire)
+        return wires
+
+    def captureTemplate(self,crv):
+        '''Capture crv's rig as a rigPlan.PlanTemplate for cloneRig.
+        The rig's network is planned again from the settings stored on it,
+        nothing is built. The template can be saved to disk and loaded in
+        another scene.
+        '''
+        rig = self.findRig(crv)
+        settings = self.rigSettings(rig['rig'])
+        #the plan is made with the names a fresh build would have, which is
+        #what cloneRig renames, whatever the rig's parts are called now
+        ctrls = [(crv + "_Ctrl%02d_Zero"%i, crv + "_Ctrl%02d"%i) for i in range(settings['numCtrls'])]
+        fitted = self.fitPlugs(crv,curveGeometry.readSurface(rig['surface']),ctrls,settings['uMin'],settings['uMax'],settings['stretchSamples'])
+        plan,nodesPerJoint = self.planRig(crv,crv + "_driverSurf",ctrls,fitted,settings)
+        return rigPlan.PlanTemplate(plan,crv,{'settings':settings,'nodesPerJoint':nodesPerJoint})
+
+    def cloneRig(self,template,crv,geo=None,geoBind='wire'):
+        '''Rig crv with the same settings and network as a captured rig
+        (see captureTemplate). Only the strip, the controls and the values
+        that depend on where the curve is (fitPlugs) are made again; the
+        rest is the template's plan, renamed for crv. This skips planning
+        and the surface queries rigFromCurve makes.
+        Returns the rig's top node (<crv>_Rig)
+        '''
+        settings = template.info['settings']
+        self.checkGeoBind(geoBind,settings['proxyJoints'])
+        with self.fastMode():
+            journal = rigPlan.NodeJournal()
+            self.profiler.begin()
+            try:
+                with self.stage('strip'):
+                    surf = self.makeStrip(crv,settings['numSpans'],settings['stripWidth'])
+                with self.stage('ctrlCurves'):
+                    ctrls = self.makeCtrls(crv,settings['numCtrls'],settings['ctrlWidth'])
+                with self.stage('geometry'):
+                    fitted = self.fitPlugs(crv,curveGeometry.readSurface(surf),ctrls,settings['uMin'],settings['uMax'],settings['stretchSamples'])
+                with self.stage('plan'):
+                    plan = template.instance(crv)
+                    for op in plan.ops:
+                        if op.get('geometric'):
+                            op['value'] = fitted[op['plug']]
+                topNull = self.finishRig(crv,surf,ctrls,plan,settings,geo,template.info['nodesPerJoint'],geoBind=geoBind)
+            except Exception:
+                journal.rollback()
+                raise
+            finally:
+                report = self.profiler.end()
+                journal.stop()
+        self.keepJournal(crv,topNull,journal)
+        self.reportBuild(report,'clone')
+        return topNull
+
+    def rigBundle(self,guide,cables,geo=None,geoBind='wire',**kwargs):
+        '''Rig a bundle of cables that run side by side along guide, e.g.
+        through the same wheels. guide gets a full rig (kwargs and geo are
+        rigFromCurve's), and each cable just gets a chain of skin joints
+        riding it, see attachCable. cables are curve names, or dicts with
+        'crv' and 'geo' like rigCurves' specs. The cables share the guide's
+        strip, controls, stretch and attach networks, so each costs its
+        joints, its skinned curve and its geo's deformer.
+        A bundle can't have a proxy chain, or be changed with updateRig;
+        rebuild it instead.
+        Returns the guide rig's top node
+        '''
+        specs = [spec if isinstance(spec,dict) else {'crv':spec} for spec in cables]
+        for spec in specs:
+            self.checkCurve(spec['crv'])
+        settings = self.checkSettings(**kwargs)
+        if settings['proxyJoints']:
+            #the cables ride the full chain only, which the LOD switch freezes
+            raise RuntimeError("a bundle can't have a proxy chain, its cables would freeze when lod is proxy")
+        self.checkGeoBind(geoBind,settings['proxyJoints'])
+
+        with self.fastMode():
+            journal = rigPlan.NodeJournal()
+            self.profiler.begin()
+            try:
+                topNull = self.buildRig(guide,settings,geo,geoBind)
+                rig = getRig(guide)
+                for spec in specs:
+                    self.attachCable(rig,spec['crv'],settings,spec.get('geo'),geoBind)
+            except Exception:
+                journal.rollback()
+                raise
+            finally:
+                report = self.profiler.end()
+                journal.stop()
+        self.keepJournal(guide,topNull,journal)
+        self.buildInfo['cables'] = [spec['crv'] for spec in specs]
+        self.reportBuild(report,'bundle')
+        return topNull
+
+    def attachCable(self,rig,cable,settings,geo=None,geoBind='wire'):
+        '''Give cable a chain of skin joints riding rig (the guide's, from
+        getRig, built with settings): one joint under each of the guide's
+        skin joints, offset to where cable passes it at rest. The joints are
+        carried by the guide's attach networks, so they stretch, slide and
+        follow the controls with it. cable gets its own skinned curve and
+        metadata node, which points at the guide's as 'bundle'.
+        Returns cable's metadata node
+        '''
+        with self.stage('geometry'):
+            offsets = self.cableOffsets(rig,cable,settings)
+        with self.stage('plan'):
+            plan = rigPlan.BuildPlan(cable)
+            meta = plan.createNode('network',cable + "_RigMeta")
+            plan.addAttr(meta,'cableRigMeta',at='long',dv=1)
+            for attr in META_PARTS:
+                plan.addAttr(meta,attr,at='message')
+            for attr in META_LISTS:
+                plan.addAttr(meta,attr,at='message',m=True)
+            plan.connectAttr(cable + ".message",meta + ".curve")
+            plan.connectAttr(rig['meta'] + ".message",meta + ".bundle")
+            for i,(guideJoint,offset) in enumerate(zip(rig['skinJoints'],offsets)):
+                jnt = plan.createNode('joint',cable + "_driverJoint%02d"%i,parent=guideJoint)
+                plan.setAttr(jnt + ".translate",[float(x) for x in offset],geometric=True)
+                plan.setAttr(jnt + ".radius",settings['stripWidth']) #just cosmetic
+                plan.connectAttr(jnt + ".message",meta + ".skinJoints[%d]"%i)
+        with self.stage('network'):
+            names = self.executor.execute(plan)
+        meta = names[meta]
+        self.linkRigPart(rig['meta'],'bundleCables',meta)
+        skinJoints = [names[cable + "_driverJoint%02d"%i] for i in range(len(offsets))]
+
+        with self.stage('skinnedCurve'):
+            newCurve,curveSkin = self.makeSkinnedCurve(cable,rig['rig'],skinJoints,len(skinJoints))
+            self.linkRigPart(meta,'skinnedCurve',newCurve)
+            self.linkRigPart(meta,'curveSkin',curveSkin)
+        if settings['falloff'] != 'closest':
+            with self.stage('weights'):
+                self.weightCurve(curveSkin,newCurve,skinJoints,settings)
+        if geo:
+            self.bindGeo(cable,geo,getRig(meta),geoBind,settings)
+        return meta
+
+    def cableOffsets(self,rig,cable,settings):
+        '''Where cable passes each of rig's skin joints at rest, in the
+        joint's space: the closest point on cable to the joint, moved into
+        the frame the joint's attach network gives it (see matrixAxes).
+        Returns a (numJoints,3) array
+        '''
+        percentages = self.jointPercentages(settings['numJoints'],settings['uMin'],settings['uMax'])
+        normalUp = settings['attachMode'] == 'matrix' and self.matrixAxes(rig['surface'])[1] != 'normalizedTangentU'
+        return curveGeometry.offsetsOnStrip(curveGeometry.readSurface(rig['surface']),percentages,
+            curveGeometry.readCurve(cable),normalUp)
+
+    def bakeRig(self,crv,start=None,end=None,path=None,step=1.0):
+        '''Sample crv's rig's skin joints (proxy joints too) from start to end,
+        the playback range by default, step frames apart, into a bake file at
+        path (see curveBake, beside the scene by default). Then play the rig
+        back from it, see useBake.
+        Returns path
+        '''
+        rig = self.findRig(crv)
+        if rig['bake']:
+            self.useLiveRig(crv)
+        path = path or curveBake.defaultPath(crv)
+        joints = rig['skinJoints'] + rig['proxyJoints']
+        times = curveBake.frameRange(start,end,step)
+        self.buildInfo = {'rig':rig['rig'],'bake':path,'frames':len(times)}
+        self.profiler.begin()
+        try:
+            with self.stage('sample'):
+                curveBake.sampleMatrices(joints,times,path)
+            self.useBake(crv,path)
+        finally:
+            report = self.profiler.end()
+        self.reportBuild(report,'bake')
+        return path
+
+    def useBake(self,crv,path):
+        '''Play crv's rig back from a bake (see bakeRig): key a transform
+        for each baked joint from the file, and point the rig's skinClusters
+        at them instead of the joints. The rig is hidden, so its strip,
+        stretch and attach networks aren't evaluated to draw it; a rig in a
+        bundle shares its top node, so it's left showing. The bake's group is
+        the rig's 'bake' part. useLiveRig swaps back.
+        Returns the bake's group
+        '''
+        rig = self.findRig(crv)
+        if rig['bake']:
+            self.useLiveRig(crv)
+        matrices,info = curveBake.loadBake(path)
+        joints = set(rig['skinJoints'] + rig['proxyJoints'])
+        stale = [node for node in info['nodes'] if node not in joints]
+        if stale:
+            raise RuntimeError("%s was baked from joints %s's rig doesn't have (%s), bake it again" % (path,crv,", ".join(stale[:3])))
+        times = info['times']
+        with self.stage('bakeKeys'):
+            group = cmds.createNode('transform',n=crv + "_Baked",p=rig['rig'],ss=True)
+            cmds.setAttr(group + ".inheritsTransform",0)
+            cmds.addAttr(group,ln='cacheFile',dt='string')
+            cmds.setAttr(group + ".cacheFile",path,type='string')
+            cmds.addAttr(group,ln='rigVisibility',at='long',dv=-1)
+            baked = dict()
+            for i,jnt in enumerate(info['nodes']):
+                bakedJoint = cmds.createNode('transform',n=crv + "_bakedJoint%02d" % i,p=group,ss=True)
+                cmds.addAttr(bakedJoint,ln='bakedJoint',at='message')
+                cmds.connectAttr(jnt + ".message",bakedJoint + ".bakedJoint")
+                curveBake.keyChannels(bakedJoint,times,curveBake.matrixChannels(matrices[:,i]))
+                baked[jnt] = bakedJoint
+        with self.stage('bakeSwap'):
+            for skin in self.bakeSkins(rig):
+                found = cmds.listConnections(skin + ".matrix",s=True,d=False,c=True,p=True) or []
+                for dst,src in zip(found[::2],found[1::2]):
+                    bakedJoint = baked.get(src.split('.')[0])
+                    if bakedJoint:
+                        cmds.connectAttr(bakedJoint + ".worldMatrix[0]",dst,f=True)
+            visibility = rig['rig'] + ".visibility"
+            if not rig['bundle'] and not rig['bundleCables'] and not cmds.listConnections(visibility,s=True,d=False):
+                cmds.setAttr(group + ".rigVisibility",int(cmds.getAttr(visibility)))
+                cmds.setAttr(visibility,0)
+            self.linkRigPart(rig['meta'],'bake',group)
+        return group
+
+    def useLiveRig(self,crv):
+        '''put crv's rig back in charge of its skinClusters and delete the
+        keys useBake made. The bake file is kept, to use again
+        '''
+        rig = self.findRig(crv)
+        group = rig['bake']
+        if not group:
+            raise RuntimeError("%s isn't playing back a bake" % crv)
+        bakedJoints = cmds.listRelatives(group,c=True,type='transform') or []
+        joints = dict()
+        for bakedJoint in bakedJoints:
+            jnt = cmds.listConnections(bakedJoint + ".bakedJoint",s=True,d=False)
+            if jnt:
+                joints[bakedJoint] = jnt[0]
+        for skin in self.bakeSkins(rig):
+            found = cmds.listConnections(skin + ".matrix",s=True,d=False,c=True,p=True) or []
+            for dst,src in zip(found[::2],found[1::2]):
+                jnt = joints.get(src.split('.')[0])
+                if jnt:
+                    cmds.connectAttr(jnt + ".worldMatrix[0]",dst,f=True)
+        visibility = cmds.getAttr(group + ".rigVisibility")
+        if visibility >= 0:
+            cmds.setAttr(rig['rig'] + ".visibility",visibility)
+        keys = [src for bakedJoint in bakedJoints for src in cmds.listConnections(bakedJoint,s=True,d=False) or []
+            if src not in joints.values()]
+        cmds.delete(keys + [group])
+
+    def bakeSkins(self,rig):
+        '''the skinClusters useBake points at baked joints'''
+        return [skin for skin in [rig['curveSkin'],rig['proxyCurveSkin']] + rig['geoSkins'] if skin]
+
+    def compareBake(self,crv,path,start=None,end=None,refresh=False):
+        '''Time playing crv's rig back live and from the bake at path, over
+        start to end (the playback range by default), with
+        curveBake.timePlayback. Each frame evaluates what the rig deforms:
+        its skinned curves, wires and skinned geo. The rig is left live or
+        baked, as it was.
+        Returns {'live': timing, 'baked': timing}
+        '''
+        rig = self.findRig(crv)
+        wasBaked = rig['bake']
+        if wasBaked:
+            self.useLiveRig(crv)
+        plugs = [node + ".outputGeometry[0]" for node in self.bakeSkins(rig) + rig['wires']]
+        timings = {'live':curveBake.timePlayback(start,end,plugs,refresh)}
+        self.useBake(crv,path)
+        try:
+            timings['baked'] = curveBake.timePlayback(start,end,plugs,refresh)
+        finally:
+            if not wasBaked:
+                self.useLiveRig(crv)
+        return timings
+
+    def compareStretch(self,crv,samples=(16,),start=None,end=None):
+        '''Time evaluating crv's rig's stretch over start to end (the
+        playback range by default) with curveBake.timePlayback, measuring
+        the strip's length with a curveInfo and with each stretchSamples
+        in samples. Each frame evaluates the stretch node, and so whatever
+        measures the length. The controls should be animated for this to
+        mean anything. The rig is put back to its own setting.
+        Returns {stretchSamples: timing}, 0 is the curveInfo
+        '''
+        original = self.rigSettings(self.findRig(crv)['rig'])['stretchSamples']
+        timings = dict()
+        try:
+            for stretchSamples in [0] + [s for s in samples if s]:
+                self.updateRig(crv,stretchSamples=stretchSamples)
+                timings[stretchSamples] = curveBake.timePlayback(start,end,[self.findRig(crv)['stretch'] + ".output"])
+        finally:
+            self.updateRig(crv,stretchSamples=original)
+        return timings
+
+    def findRig(self,crv):
+        '''getRig for crv, raises if crv's rig can't be found'''
+        rig = getRig(crv)
+        if not rig:
+            if cmds.objExists(crv + "_Rig"):
+                raise RuntimeError("%s_Rig has no metadata node, it was built by an older version of this tool. Rebuild it once to make it updatable" % crv)
+            raise RuntimeError("no rig found for %s, rig not built yet?" % crv)
+        return rig
+
+    def rigSettings(self,rigNode):
+        '''the settings a rig was built with, as a dict of RIG_SETTINGS'''
+        if not cmds.objExists(rigNode):
+            raise RuntimeError("%s not found in scene, rig not built yet?"%rigNode)
+        settings = dict()
+        for attr in RIG_SETTINGS:
+            if not cmds.attributeQuery(attr,node=rigNode,exists=True):
+                raise RuntimeError("%s has no %s attr, it was built by an older version of this tool. Rebuild it once to make it updatable" % (rigNode,attr))
+            settings[attr] = cmds.getAttr(rigNode + "." + attr)
+        for attr,choices in RIG_CHOICES.items():
+            settings[attr] = choices[settings[attr]]
+        return settings
+
+    def updateRig(self,crv,numSpans=None,numJoints=None,numCtrls=None,stripWidth=None,ctrlWidth=None,uMin=None,uMax=None,attachMode=None,falloff=None,proxyJoints=None,stretchSamples=None):
+        '''Change the settings of a rig made by rigFromCurve, in place.
+        Settings left as None are kept. Only what differs is touched: joints
+        and controls are added or deleted at the end of the rig, the ones
+        kept are moved with setAttr, and a skinCluster is only rebuilt if
+        its influences change. Painted strip weights survive unless numCtrls,
+        numSpans or stripWidth change, or the rig's falloff computes them
+        (then they're worked out again). The proxy chain is small, so it's
+        made again whenever it changes; adding or removing it remakes the
+        full chain too. Wires on the skinned curves are remade on the same
+        geo, and geo skinned to the joints (see skinGeo) is bound and
+        weighted again if the joints change. A new stretchSamples swaps the
+        nodes measuring the strip's length. Kept joints and locators are
+        redrawn at a new stripWidth, and kept controls are scaled to a new
+        ctrlWidth, keeping any reshaping done to them. The rig's parts are found with
+        getRig, so they may have been renamed.
+        The rig should be in its rest pose. The update is one undo chunk.
+        Returns the rig's top node
+        '''
+        rig = self.findRig(crv)
+        if rig['bundle'] or rig['bundleCables']:
+            raise RuntimeError("%s is part of a bundle (see rigBundle), rebuild the bundle to change it" % crv)
+        if rig['bake']:
+            raise RuntimeError("%s is playing back a bake, use the live rig (useLiveRig) to change it" % crv)
+        topNull = rig['rig']
+        old = self.rigSettings(topNull)
+        new = dict(old)
+        for attr,value in (('numSpans',numSpans),('numJoints',numJoints),('numCtrls',numCtrls),
+                ('stripWidth',stripWidth),('ctrlWidth',ctrlWidth),('uMin',uMin),('uMax',uMax),('attachMode',attachMode),('falloff',falloff),
+                ('proxyJoints',proxyJoints),('stretchSamples',stretchSamples)):
+            if value is not None:
+                new[attr] = value
+        for attr,choices in sorted(RIG_CHOICES.items()):
+            if new[attr] not in choices:
+                raise RuntimeError("unknown %s %s" % (attr,new[attr]))
+        self.checkProxyJoints(new['proxyJoints'],new['numJoints'])
+        if rig['geoSkins']:
+            self.checkGeoBind('skin',new['proxyJoints'])
+        self.checkStretchSamples(new['stretchSamples'])
+        changed = [attr for attr in RIG_SETTINGS if new[attr] != old[attr]]
+        self.buildInfo = {'rig':topNull,'attachMode':new['attachMode'],'changed':changed,'ops':dict()}
+        if not changed:
+            return topNull
+
+        cmds.undoInfo(openChunk=True,chunkName='updateRig')
+        self.profiler.begin()
+        try:
+            self.applyUpdate(crv,rig,old,new)
+        finally:
+            report = self.profiler.end()
+            cmds.undoInfo(closeChunk=True)
+        self.reportBuild(report,'update')
+        return topNull
+
+    def applyUpdate(self,crv,rig,old,new):
+        '''does the work for updateRig. rig comes from getRig, old and new
+        are rigSettings dicts
+        '''
+        meta = rig['meta']
+        topNull = rig['rig']
+        hiddenStuff = rig['hidden']
+        surf = rig['surface']
+        skinned = rig['skinnedCurve']
+        attachMode = new['attachMode']
+        plan = rigPlan.BuildPlan(crv)
+
+        #Work out what changed. Joints and controls below keepJoints and
+        #keepCtrls stay, the rest are deleted or made new.
+        newStrip = new['numSpans'] != old['numSpans'] or new['stripWidth'] != old['stripWidth']
+        newMode = attachMode != old['attachMode']
+        #the LOD switch is hooked into every joint, so adding or removing it
+        #remakes the full chain. The proxy chain is remade when it changes
+        hadProxy,hasProxy = old['proxyJoints'] > 0,new['proxyJoints'] > 0
+        newLod = hadProxy != hasProxy
+        newProxy = hasProxy and (not hadProxy or
+            any(new[attr] != old[attr] for attr in ('proxyJoints','attachMode','uMin','uMax','falloff')))
+        dropProxy = hadProxy and (newProxy or not hasProxy)
+        newJoints = newMode or newLod or new['numJoints'] != old['numJoints']
+        newCtrls = new['numCtrls'] != old['numCtrls']
+        newFalloff = new['falloff'] != old['falloff']
+        newLength = new['stretchSamples'] != old['stretchSamples']
+        weighted = new['falloff'] != 'closest'
+        #going back to closest point weights takes a fresh bind
+        rebindStrip = newStrip or newCtrls or (newFalloff and not weighted)
+        keepJoints = 0 if newMode or newLod else min(old['numJoints'],new['numJoints'])
+        keepCtrls = min(old['numCtrls'],new['numCtrls'])
+        oldPercentages = self.jointPercentages(old['numJoints'],old['uMin'],old['uMax'])
+        percentages = self.jointPercentages(new['numJoints'],new['uMin'],new['uMax'])
+        slidJoints = [i for i in range(keepJoints) if abs(percentages[i] - oldPercentages[i]) > 1e-9]
+        oldPercentages = self.ctrlPercentages(old['numCtrls'],old['uMin'],old['uMax'])
+        ctrlPercentages = self.ctrlPercentages(new['numCtrls'],new['uMin'],new['uMax'])
+        movedCtrls = [i for i in range(keepCtrls) if abs(ctrlPercentages[i] - oldPercentages[i]) > 1e-9]
+        if newStrip:
+            #a new strip is bound from scratch, so all the controls can follow it
+            movedCtrls = list(range(keepCtrls))
+        rebindCurve = not newJoints and (slidJoints or (newFalloff and not weighted))
+        #geo skinned to the joints is weighted by where they ride
+        reskinGeo = newJoints or slidJoints or newFalloff
+
+        #Take off skins and wires that are about to change, while all
+        #their influences are still around
+        wiredGeo = []
+        skinnedGeo = []
+        with self.stage('unbind'):
+            if reskinGeo:
+                for skin in rig['geoSkins']:
+                    skinnedGeo.extend(cmds.skinCluster(skin,q=True,g=True) or [])
+                    cmds.skinCluster(skin,e=True,ub=True)
+            if newJoints or newProxy or dropProxy:
+                for curve in (skinned,rig['proxySkinnedCurve']):
+                    for wire in (cmds.listConnections(curve + ".worldSpace",s=False,d=True,type='wire') or []) if curve else []:
+                        wiredGeo.extend(g for g in cmds.wire(wire,q=True,g=True) or [] if g not in wiredGeo)
+                        cmds.delete([wire] + (cmds.listConnections(wire + ".baseWire",s=True,d=False) or []))
+            if newJoints:
+                self.unbindSkin(skinned,rig['curveSkin'])
+                cmds.delete(skinned)
+            elif rebindCurve:
+                self.unbindSkin(skinned,rig['curveSkin'])
+            if dropProxy and rig['proxySkinnedCurve']:
+                self.unbindSkin(rig['proxySkinnedCurve'],rig['proxyCurveSkin'])
+                cmds.delete(rig['proxySkinnedCurve'])
+            if rebindStrip:
+                self.unbindSkin(surf,rig['stripSkin'])
+
+        #Swap in a new strip, and move everything reading the old one over
+        if newStrip:
+            with self.stage('strip'):
+                newSurf = self.makeStrip(crv,new['numSpans'],new['stripWidth'])
+                for dst in cmds.listConnections(surf + ".worldSpace",s=False,d=True,p=True) or []:
+                    cmds.connectAttr(newSurf + ".worldSpace[0]",dst,f=True)
+                cmds.delete(surf)
+                surf = cmds.rename(newSurf,surf)
+                cmds.parent(surf,hiddenStuff)
+                self.linkRigPart(meta,'surface',surf)
+                rig['surface'] = surf
+
+        #Skin joints: delete the extras, slide the ones kept, add the rest
+        with self.stage('plan'):
+            self.deleteSkinJoints(rig,range(keepJoints,old['numJoints']))
+            if dropProxy:
+                self.deleteSkinJoints(rig,range(old['proxyJoints']),proxy=True)
+            if newMode:
+                for group in (rig['skinJointGroup'],rig['proxyJointGroup'] if hasProxy else None):
+                    if group:
+                        plan.setAttr(group + ".inheritsTransform", 0 if attachMode == 'matrix' else 1)
+            if newLod and hasProxy:
+                self.planLod(plan,rig,rig['ctrls'][0],attachMode)
+                for attr in ('lod','proxyJointGroup'):
+                    plan.connectAttr(rig[attr] + ".message",meta + "." + attr)
+            elif newLod:
+                cmds.delete(rig['lod'],rig['proxyJointGroup'])
+                cmds.deleteAttr(rig['ctrls'][0] + ".lod")
+                rig['lod'] = rig['proxyJointGroup'] = None
+                #it was switched by the lod attr
+                plan.setAttr(rig['skinJointGroup'] + ".visibility",1)
+            if newLength:
+                cmds.delete(rig['lengthNodes'])
+                length = self.planLength(plan,meta,surf,rig['path'],new['stretchSamples'])
+                plan.connectAttr(length,rig['stretch'] + ".input2X")
+                plan.connectAttr(length,rig['stretchBlender'] + ".c2r")
+            for i in slidJoints:
+                plan.setAttr(rig['stretchCtrls'][i] + ".i1", percentages[i])
+            if new['stripWidth'] != old['stripWidth']:
+                #joints and locators are drawn at the strip's width (just cosmetic)
+                width = new['stripWidth']
+                keptProxy = 0 if newProxy or dropProxy else old['proxyJoints']
+                kept = self.attachNetworks(rig,range(keepJoints)) | self.attachNetworks(rig,range(keptProxy),proxy=True)
+                for jnt in rig['skinJoints'][:keepJoints] + rig['proxyJoints'][:keptProxy]:
+                    plan.setAttr(jnt + ".radius",width)
+                for shape in (cmds.listRelatives(sorted(kept),s=True,type='locator') or []) if kept else []:
+                    plan.setAttr(shape + ".localScale",[width,width,width])
+                for jnt in rig['stripJoints'][:keepCtrls]:
+                    plan.setAttr(jnt + ".radius",width * 1.3)
+            skinJoints = rig['skinJoints'][:keepJoints]
+            skinJoints += self.planSkinJoints(plan,crv,rig,percentages[keepJoints:],new['stripWidth'],attachMode,
+                first=keepJoints,parentJoint=skinJoints[-1] if skinJoints else None)
+            proxyJoints = []
+            if newProxy:
+                proxyJoints = self.planSkinJoints(plan,crv,rig,self.jointPercentages(new['proxyJoints'],new['uMin'],new['uMax']),
+                    new['stripWidth'],attachMode,proxy=True)
+
+        #Controls, the same again
+        with self.stage('ctrlCurves'):
+            for i in range(keepCtrls,old['numCtrls']):
+                cmds.delete(cmds.listRelatives(rig['ctrls'][i],p=True)[0], rig['stripJoints'][i])
+            ctrls = [(cmds.listRelatives(ctrl,p=True)[0], ctrl) for ctrl in rig['ctrls'][:keepCtrls]]
+            if new['ctrlWidth'] != old['ctrlWidth']:
+                #scale the CVs, so controls that were reshaped keep their shape
+                scale = float(new['ctrlWidth']) / old['ctrlWidth']
+                for zero,ctrl in ctrls:
+                    for i,point in enumerate(cmds.getAttr(ctrl + ".cv[*]")):
+                        cmds.setAttr(ctrl + ".cv[%d]"%i,*[value*scale for value in point])
+            for i in range(keepCtrls,new['numCtrls']):
+                ctrls.append(self.makeCubeCtrl(crv + "_Ctrl%02d"%i,size=new['ctrlWidth']))
+        with self.stage('geometry'):
+            fitted = self.fitPlugs(crv,curveGeometry.readSurface(surf),ctrls,new['uMin'],new['uMax'],new['stretchSamples'])
+        with self.stage('plan'):
+            if newStrip or newLength:
+                plan.setAttr(rig['stretchBlender'] + ".c1r", fitted[crv + "_driverSurfCrvStretchBlender.c1r"])
+            for i in movedCtrls:
+                self.planPlaceCtrl(plan,ctrls[i][0],fitted)
+            stripJoints = rig['stripJoints'][:keepCtrls]
+            for i in range(keepCtrls,new['numCtrls']):
+                zero,ctrl = ctrls[i]
+                stripJoints.append(self.planCtrl(plan,rig,i,zero,ctrl,fitted,new['stripWidth']))
+
+            for attr in RIG_SETTINGS:
+                if new[attr] != old[attr]:
+                    value = RIG_CHOICES[attr].index(new[attr]) if attr in RIG_CHOICES else new[attr]
+                    plan.setAttr(topNull + "." + attr, value)
+
+        with self.stage('network'):
+            names = self.executor.execute(plan)
+        self.lastPlan = plan
+        skinJoints = [rigPlan.resolve(names,j) for j in skinJoints]
+        stripJoints = [rigPlan.resolve(names,j) for j in stripJoints]
+        proxyJoints = [rigPlan.resolve(names,j) for j in proxyJoints]
+        self.buildInfo['ops'] = plan.counts()
+
+        #Strip skin. Rebind if its influences changed. If controls only
+        #moved, tell the skinCluster where they rest now, which keeps the weights
+        stripSkin = rig['stripSkin']
+        with self.stage('stripSkin'):
+            if rebindStrip:
+                stripSkin = self.skinStrip(stripJoints,surf)
+                self.linkRigPart(meta,'stripSkin',stripSkin)
+            elif movedCtrls:
+                influences = cmds.skinCluster(stripSkin,q=True,inf=True)
+                for i in movedCtrls:
+                    matrix = cmds.getAttr(stripJoints[i] + ".worldInverseMatrix[0]")
+                    cmds.setAttr(stripSkin + ".bindPreMatrix[%d]" % influences.index(stripJoints[i]),*matrix,type='matrix')
+        #computed weights follow the controls, painted ones are kept
+        if weighted and (rebindStrip or movedCtrls or newFalloff):
+            with self.stage('weights'):
+                self.weightStrip(stripSkin,surf,stripJoints,new)
+
+        #Skinned curve
+        curveSkin = rig['curveSkin']
+        if newJoints:
+            with self.stage('skinnedCurve'):
+                skinned,curveSkin = self.makeSkinnedCurve(crv,topNull,skinJoints,new['numJoints'])
+                self.linkRigPart(meta,'skinnedCurve',skinned)
+                self.linkRigPart(meta,'curveSkin',curveSkin)
+        elif rebindCurve:
+            with self.stage('skinnedCurve'):
+                curveSkin = self.skinCurve(skinJoints,skinned)
+                self.linkRigPart(meta,'curveSkin',curveSkin)
+        if weighted and (newJoints or rebindCurve or newFalloff):
+            with self.stage('weights'):
+                self.weightCurve(curveSkin,skinned,skinJoints,new)
+        if newProxy:
+            with self.stage('skinnedCurve'):
+                proxyCurve,proxySkin = self.makeSkinnedCurve(crv,topNull,proxyJoints,new['proxyJoints'],"_proxySkinned")
+                self.linkRigPart(meta,'proxySkinnedCurve',proxyCurve)
+                self.linkRigPart(meta,'proxyCurveSkin',proxySkin)
+            if weighted:
+                with self.stage('weights'):
+                    self.weightCurve(proxySkin,proxyCurve,proxyJoints,new)
+        if wiredGeo or skinnedGeo:
+            rig = getRig(meta)
+        for geo in wiredGeo:
+            self.bindGeo(crv,geo,rig,'wire')
+        for geo in skinnedGeo:
+            self.bindGeo(crv,geo,rig,'skin',new)
+
+    def linkRigPart(self,meta,attr,node):
+        '''connect node to the rig's metadata node as attr, one of
+        META_PARTS or META_LISTS (added to the end of the list)
+        '''
+        if attr in META_LISTS:
+            cmds.connectAttr(node + ".message",meta + "." + attr,na=True)
+        else:
+            cmds.connectAttr(node + ".message",meta + "." + attr,f=True)
+
+    def deleteSkinJoints(self,rig,indices,proxy=False):
+        '''Delete the skin joints of rig (from getRig) at indices, or its
+        proxy joints with proxy, and the networks attaching them to the
+        strip (see attachNetworks)
+        '''
+        nodes = self.attachNetworks(rig,indices,proxy)
+        if nodes:
+            cmds.delete(sorted(nodes))
+
+    def attachNetworks(self,rig,indices,proxy=False):
+        '''The skin joints of rig (from getRig) at indices, or its proxy
+        joints with proxy, and the networks attaching them to the strip, as
+        a set. A network is everything downstream of the joint's StretchCtrl
+        node, up to the dag nodes it drives (the locator, in classic mode).
+        All the networks are walked together a step at a time, so it's two
+        queries a step however many joints there are.
+        '''
+        if proxy:
+            joints,stretchCtrls = rig['proxyJoints'],rig['proxyStretchCtrls']
+        else:
+            joints,stretchCtrls = rig['skinJoints'],rig['stretchCtrls']
+        nodes = set(joints[i] for i in indices)
+        todo = set(stretchCtrls[i] for i in indices)
+        while todo:
+            nodes.update(todo)
+            dgNodes = todo.difference(cmds.ls(list(todo),dag=True))
+            found = cmds.listConnections(sorted(dgNodes),s=False,d=True) or [] if dgNodes else []
+            todo = set(found).difference(nodes,[rig['meta']])
+        return nodes
+
+    def findSkinCluster(self,obj):
+        '''the skinCluster deforming obj, or None'''
+        history = cmds.listHistory(obj,pdo=True)
+        skins = cmds.ls(history,type='skinCluster') if history else []
+        return skins[0] if skins else None
+
+    def unbindSkin(self,obj,skin=None):
+        '''take obj's skinCluster off, if it has one. Pass skin if it's known'''
+        skin = skin if skin and cmds.objExists(skin) else self.findSkinCluster(obj)
+        if skin:
+            cmds.skinCluster(skin,e=True,ub=True)
 
     def attachObjToSurf(self,obj,surf,path,stretchAmountNode,percentage):
         '''Given an object and a surface, attach object.
-        Returns created nodes like (poinOnSurface,aimCns)
+        Returns created nodes like (poinOnSurface,aimCns,moPath,slider)
         '''
-        #Make nodes
-        aimCns = cmds.createNode('aimConstraint',n=obj + "Cns")
-        moPath = cmds.createNode('motionPath', n=obj + "MoPath")
-        slider = cmds.createNode('addDoubleLinear',n=obj + "Slider")
-        cmds.setAttr(moPath + ".uValue", percentage)
-        closePnt = cmds.createNode('closestPointOnSurface', n=obj + "ClsPnt")
-        posNode1 = cmds.pointOnSurface(surf,
-            constructionHistory=True,
-            normal=True,
-            normalizedNormal=True, 
-            normalizedTangentU=True, 
-            normalizedTangentV=True, 
-            parameterV=0.5, 
-            parameterU=0.5, 
-            turnOnPercentage=True
-        ) 
-        
-        #Connect motion Path to closest point, then closest point to surface info node
-        cmds.setAttr(moPath + ".fractionMode", 1) #distance instead of param
-        cmds.connectAttr(path + ".worldSpace[0]", moPath + ".geometryPath")
-        cmds.connectAttr(surf + ".worldSpace[0]", closePnt + ".inputSurface")
-        cmds.connectAttr(moPath + ".xCoordinate", closePnt + ".ipx")
-        cmds.connectAttr(moPath + ".yCoordinate", closePnt + ".ipy")
-        cmds.connectAttr(moPath + ".zCoordinate", closePnt + ".ipz")
-        cmds.connectAttr(closePnt + ".result.u", posNode1 + ".u")
-        cmds.connectAttr(closePnt + ".result.v", posNode1 + ".v") 
-        
-        #Create Stretch Setup using stretchAmountNode node
-        stretchCtrl = cmds.createNode("multDoubleLinear", n=obj + "StretchCtrl")
-        cmds.setAttr(stretchCtrl + ".i1", percentage)
-        cmds.connectAttr(stretchAmountNode + ".outputX",stretchCtrl + ".i2")
-        cmds.connectAttr(stretchCtrl + ".o", slider + ".i1")
-        cmds.connectAttr(slider + ".o", moPath + ".uValue")
+        plan = rigPlan.BuildPlan()
+        nodes = self.planAttach(plan,obj,surf,path,stretchAmountNode,percentage)
+        names = self.executor.execute(plan)
+        return tuple(names[n] for n in nodes)
+
+    def planAttach(self,plan,obj,surf,path,stretchAmountNode,percentage):
+        '''Adds attachObjToSurf's network to plan.
+        Returns planned nodes like (poinOnSurface,aimCns,moPath,slider)
+        '''
+        posNode1,moPath,slider = self.planSurfSlider(plan,obj,surf,path,stretchAmountNode,percentage)
+        aimCns = plan.createNode('aimConstraint',obj + "Cns",parent=obj) #parented just for tidyness, doesn't matter
         
         #Hook up surface info attrs to aimCns to calculate rotation values
         #Then hook pointOnSurface and aimCns to locator
-        posNode1 = cmds.rename(posNode1,obj + 'SurfInfo')
-        cmds.setAttr(aimCns + ".worldUpType", 3)
-        cmds.connectAttr(posNode1 + ".position", obj + ".translate")
-        cmds.connectAttr(posNode1 + '.tv',aimCns + '.target[0].targetTranslate')
-        cmds.connectAttr(posNode1 + '.tu',aimCns + '.worldUpVector')
+        plan.setAttr(aimCns + ".worldUpType", 3)
+        plan.connectAttr(posNode1 + ".position", obj + ".translate")
+        plan.connectAttr(posNode1 + '.tv',aimCns + '.target[0].targetTranslate')
+        plan.connectAttr(posNode1 + '.tu',aimCns + '.worldUpVector')
         for axis in ('X','Y','Z'):
-            cmds.connectAttr(aimCns + ".constraintRotate" + axis, obj + ".rotate" + axis)
-        cmds.parent(aimCns,obj) #just for tidyness, doesn't matter
+            plan.connectAttr(aimCns + ".constraintRotate" + axis, obj + ".rotate" + axis)
         return (posNode1,aimCns,moPath,slider)
 
+    def planAttachMatrix(self,plan,obj,surf,path,stretchAmountNode,percentage,axes,offsetParent=True):
+        '''Lean version of planAttach, for driving a joint directly.
+        Surface info is packed into a fourByFourMatrix that drives the
+        object's offsetParentMatrix, or its translate/rotate through a
+        decomposeMatrix when offsetParent is False (Maya versions without
+        offsetParentMatrix). No locator or constraints are made, so obj
+        must not inherit any transform. axes comes from matrixAxes.
+        Tangent U isn't square to tangent V on a stretched or sheared strip,
+        so its row is the cross product of the other two instead, keeping
+        the frame orthonormal.
+        Returns planned nodes like (pointOnSurface,(cross,matrix),moPath,slider)
+        '''
+        posNode1,moPath,slider = self.planSurfSlider(plan,obj,surf,path,stretchAmountNode,percentage)
+        matrixNode = plan.createNode('fourByFourMatrix',obj + "Matrix")
+        crossRow = axes.index('normalizedTangentU')
+        cross = plan.createNode('vectorProduct',obj + "Cross")
+        plan.setAttr(cross + ".operation", 2)
+        plan.setAttr(cross + ".normalizeOutput", 1)
+        #the two rows after crossRow, in turn, so the frame stays right handed
+        plan.connectAttr(posNode1 + "." + axes[(crossRow+1)%3], cross + ".input1")
+        plan.connectAttr(posNode1 + "." + axes[(crossRow+2)%3], cross + ".input2")
+        for row,attr in enumerate(axes + ('position',)):
+            src = cross + ".output" if row == crossRow else posNode1 + "." + attr
+            for col,axis in enumerate(('X','Y','Z')):
+                plan.connectAttr(src + axis, matrixNode + ".in%d%d" % (row,col))
+        if offsetParent:
+            plan.connectAttr(matrixNode + ".output", obj + ".offsetParentMatrix")
+        else:
+            decomp = plan.createNode('decomposeMatrix',obj + "Decomp")
+            plan.connectAttr(matrixNode + ".output", decomp + ".inputMatrix")
+            plan.connectAttr(decomp + ".outputTranslate", obj + ".translate")
+            plan.connectAttr(decomp + ".outputRotate", obj + ".rotate")
+        return (posNode1,(cross,matrixNode),moPath,slider)
+
+    def matrixAxes(self,surf):
+        '''Which pointOnSurfaceInfo outputs make a right handed X,Y,Z frame
+        for planAttachMatrix. X always runs down the strip (tangent V);
+        the normal's direction depends on the surface, so it's queried once
+        here (no nodes made) rather than fixed up per joint. The tangent U
+        row is only a placeholder, planAttachMatrix crosses the other two.
+        '''
+        kwargs = {'u':0.5,'v':0.5,'turnOnPercentage':True}
+        normal = cmds.pointOnSurface(surf,normalizedNormal=True,**kwargs)
+        tu = cmds.pointOnSurface(surf,normalizedTangentU=True,**kwargs)
+        tv = cmds.pointOnSurface(surf,normalizedTangentV=True,**kwargs)
+        cross = (tv[1]*tu[2] - tv[2]*tu[1], tv[2]*tu[0] - tv[0]*tu[2], tv[0]*tu[1] - tv[1]*tu[0])
+        if sum(a*b for a,b in zip(cross,normal)) > 0:
+            #normal = tv x tu, so the aimConstraint's frame works as is
+            return ('normalizedTangentV','normalizedTangentU','normalizedNormal')
+        return ('normalizedTangentV','normalizedNormal','normalizedTangentU')
+
+    def planSurfSlider(self,plan,obj,surf,path,stretchAmountNode,percentage):
+        '''The part of the attach setup shared by both attach modes:
+        a motionPath sliding down path by arc length, snapped to surf,
+        with stretch and slide hooked up.
+        Returns planned nodes like (pointOnSurface,moPath,slider)
+        '''
+        #Make nodes
+        moPath = plan.createNode('motionPath',obj + "MoPath")
+        slider = plan.createNode('addDoubleLinear',obj + "Slider")
+        plan.setAttr(moPath + ".uValue", percentage)
+        closePnt = plan.createNode('closestPointOnSurface',obj + "ClsPnt")
+        posNode1 = plan.createNode('pointOnSurfaceInfo',obj + 'SurfInfo')
+        plan.setAttr(posNode1 + ".turnOnPercentage", 1)
+        plan.connectAttr(surf + ".worldSpace[0]", posNode1 + ".inputSurface")
+        
+        #Connect motion Path to closest point, then closest point to surface info node
+        plan.setAttr(moPath + ".fractionMode", 1) #distance instead of param
+        plan.connectAttr(path + ".worldSpace[0]", moPath + ".geometryPath")
+        plan.connectAttr(surf + ".worldSpace[0]", closePnt + ".inputSurface")
+        plan.connectAttr(moPath + ".xCoordinate", closePnt + ".ipx")
+        plan.connectAttr(moPath + ".yCoordinate", closePnt + ".ipy")
+        plan.connectAttr(moPath + ".zCoordinate", closePnt + ".ipz")
+        plan.connectAttr(closePnt + ".result.u", posNode1 + ".u")
+        plan.connectAttr(closePnt + ".result.v", posNode1 + ".v") 
+        
+        #Create Stretch Setup using stretchAmountNode node
+        stretchCtrl = plan.createNode("multDoubleLinear",obj + "StretchCtrl")
+        plan.setAttr(stretchCtrl + ".i1", percentage)
+        plan.connectAttr(stretchAmountNode + ".outputX",stretchCtrl + ".i2")
+        plan.connectAttr(stretchCtrl + ".o", slider + ".i1")
+        plan.connectAttr(slider + ".o", moPath + ".uValue")
+        return (posNode1,moPath,slider)
+
     def makeCubeCtrl(self,name,size=1.0):
         '''
         Make a nurbs curve cube with given name. Also can take size.
@@ -486,5 +2033,105 @@ class RigCurveTool(object):
             for axis in ('x','y','z'):
                 cmds.setAttr(obj + ".%s%s"%(attr,axis), keyable=False,channelBox=False,lock=lock)
         cmds.setAttr(obj + ".v", keyable=False,channelBox=False)
+
+def getRig(node):
+    '''Find the rig node belongs to, through the rig's metadata node
+    (<crv>_RigMeta). node can be the rigged curve, the metadata node, or
+    any part connected to it, under any name.
+    Returns a dict with the metadata node as 'meta', a node (or None) for
+    each of META_PARTS and a list of nodes for each of META_LISTS.
+    Returns None if node isn't part of a rig, or its rig was built before
+    rigs had metadata.
+    '''
+    if not cmds.objExists(node):
+        return None
+    if cmds.attributeQuery('cableRigMeta',node=node,exists=True):
+        meta = node
+    else:
+        metas = [m for m in cmds.listConnections(node + ".message",s=False,d=True,type='network') or []
+            if cmds.attributeQuery('cableRigMeta',node=m,exists=True)]
+        if not metas:
+            return None
+        meta = metas[0]
+
+    #one query for every part, as (plug, node) pairs
+    rig = dict((attr,None) for attr in META_PARTS)
+    rig['meta'] = meta
+    lists = dict((attr,[]) for attr in META_LISTS)
+    found = cmds.listConnections(meta,s=True,d=False,c=True) or []
+    for plug,src in zip(found[::2],found[1::2]):
+        attr = plug.split('.',1)[1]
+        if attr.endswith(']'):
+            attr,index = attr[:-1].split('[')
+            if attr in lists:
+                lists[attr].append((int(index),src))
+        elif attr in rig:
+            rig[attr] = src
+    for attr,items in lists.items():
+        rig[attr] = [src for index,src in sorted(items)]
+    #a cable in a bundle rides its guide's strip, controls and stretch
+    if rig['bundle']:
+        guide = getRig(rig['bundle'])
+        for attr in BUNDLE_SHARED:
+            rig[attr] = guide[attr]
+    return rig
+
+def rigCurves(specs,stopOnError=False,template=None,fast=False):
+    '''Rig many curves in one call, without the UI.
+    specs is a list of curve names, or of dicts holding 'crv' plus any
+    rigFromCurve keyword args, e.g.
+        rigCurves([{'crv':'cable1','geo':'cable1_geo','numJoints':40}, 'cable2'])
+    With a template (see RigCurveTool.captureTemplate) every curve is
+    cloned from it instead, and the only keyword args are geo and geoBind.
+    All builds share one undo chunk, the viewport is not redrawn until the
+    end, and the selection is put back afterwards. With fast, undo is off
+    for the whole batch (see RigCurveTool.fastMode), and a failed curve's
+    nodes are deleted by the tool's journal.
+    Returns a list of dicts like {'crv','rig','time','error','info'}, one per
+    spec, where info is the tool's buildInfo for that curve.
+    A failed curve is reported in 'error' and the rest still build, unless
+    stopOnError is set.
+    '''
+    tool = RigCurveTool(showUI=False)
+    tool.fastBuild = fast
+    results = []
+    sel = cmds.ls(sl=True)
+    cmds.undoInfo(openChunk=True,chunkName='rigCurves')
+    cmds.refresh(suspend=True)
+    try:
+        with tool.fastMode():
+            for spec in specs:
+                if not isinstance(spec,dict):
+                    spec = {'crv':spec}
+                kwargs = dict(spec)
+                crv = kwargs.pop('crv')
+                result = {'crv':crv,'rig':None,'time':0.0,'error':None,'info':{}}
+                start = time.time()
+                try:
+                    tool.checkCurve(crv)
+                    if template:
+                        result['rig'] = tool.cloneRig(template,crv,**kwargs)
+                    else:
+                        result['rig'] = tool.rigFromCurve(crv,**kwargs)
+                    result['info'] = dict(tool.buildInfo)
+                except Exception as e:
+                    result['error'] = str(e)
+                    if stopOnError:
+                        raise
+                finally:
+                    result['time'] = time.time() - start
+                    results.append(result)
+    finally:
+        cmds.refresh(suspend=False)
+        cmds.undoInfo(closeChunk=True)
+        if sel:
+            sel = cmds.ls(sel)
+        if sel:
+            cmds.select(sel,r=True)
+        else:
+            cmds.select(clear=True)
+    return results
+
 #Run the tool   
-RigCurveTool()
+if __name__ == '__main__':
+    RigCurveTool()
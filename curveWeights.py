@@ -0,0 +1,178 @@
+'''Skin weights for rig strips, skinned curves and cable geo, worked out in
+numpy. Each CV is weighted by how far down the curve it has the most
+influence, measured in arc length, against where the influences sit (the
+fractions jointPercentages and ctrlPercentages give). Mesh vertices are
+weighted the same way, by where they're closest to on the curve. Distances are measured in
+influence spacings, so a falloff always reaches the neighbouring
+influences however unevenly they're spread.
+
+Weights go to and from a skinCluster in one MFnSkinCluster call
+(readWeights, writeWeights), and can be kept on disk as compressed numpy
+arrays (exportWeights, importWeights). Only the Maya functions need Maya.
+'''
+import numpy as np
+
+FALLOFFS = ('linear', 'smoothstep', 'bspline')
+#most weights writeWeights sends to a mesh's skinCluster in one call
+WRITE_BLOCK = 2 ** 20
+
+
+def falloff(distance, profile='linear'):
+    '''weight at distance from an influence, in influence spacings.
+    linear and smoothstep reach the next influence over, bspline (the
+    cubic B-spline kernel) the one after that.
+    '''
+    d = np.abs(np.asarray(distance, dtype=float))
+    if profile == 'linear':
+        return np.clip(1.0 - d, 0.0, 1.0)
+    if profile == 'smoothstep':
+        t = np.clip(1.0 - d, 0.0, 1.0)
+        return t * t * (3.0 - 2.0 * t)
+    if profile == 'bspline':
+        near = 2.0 / 3.0 - d * d + 0.5 * d ** 3
+        far = (2.0 - np.minimum(d, 2.0)) ** 3 / 6.0
+        return np.where(d < 1.0, near, far)
+    raise ValueError('unknown falloff %s, expected one of %s' % (profile, ', '.join(FALLOFFS)))
+
+
+def computeWeights(fractions, influenceFractions, profile='linear', maxInfluences=None):
+    '''Weights for points at fractions (0-1) of arc length, from influences
+    at influenceFractions. Influences can be in any order; the columns of
+    the result follow influenceFractions. maxInfluences keeps only the
+    heaviest few per point.
+    Returns a (len(fractions), len(influenceFractions)) matrix, rows sum to 1
+    '''
+    fractions = np.atleast_1d(np.asarray(fractions, dtype=float))
+    influenceFractions = np.asarray(influenceFractions, dtype=float)
+    count = len(influenceFractions)
+    if count == 1:
+        return np.ones((len(fractions), 1))
+    #position of each point in influence spacings, along the sorted influences
+    order = np.argsort(influenceFractions, kind='mergesort')
+    index = np.interp(fractions, influenceFractions[order], np.arange(count))
+    weights = np.empty((len(fractions), count))
+    weights[:, order] = falloff(index[:, None] - np.arange(count), profile)
+    if maxInfluences and maxInfluences < count:
+        drop = np.argsort(weights, axis=1, kind='mergesort')[:, :count - maxInfluences]
+        np.put_along_axis(weights, drop, 0.0, axis=1)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def cvFractions(curve):
+    '''where each CV of a curveGeometry.NurbsCurve has the most influence,
+    as a fraction (0-1) of the curve's arc length
+    '''
+    return curve.lengthAt(curve.greville()) / curve.length()
+
+
+def pointFractions(curve, points):
+    '''where each of points is closest to on a curveGeometry.NurbsCurve,
+    as a fraction (0-1) of the curve's arc length. Lengths come off the
+    curve's arc length table, which is plenty close for weights.
+    '''
+    params, lengths = curve.arcLengthTable()
+    return np.interp(curve.closestParams(points), params, lengths) / lengths[-1]
+
+
+def stripFractions(surface):
+    '''cvFractions for every CV of a rig strip (V runs down it), measured
+    down the middle. Returns them flat, in Maya's CV order (U major)
+    '''
+    iso = surface.isoCurve(0.5 * sum(surface.domainU))
+    return np.tile(cvFractions(iso), surface.cvs.shape[0])
+
+
+def readWeights(skin):
+    '''(weights, influence names) for every CV skin deforms.
+    weights is a (numCVs, numInfluences) array
+    '''
+    fn, shape, components = _skinCluster(skin)
+    values, count = fn.getWeights(shape, components)
+    names = [path.partialPathName() for path in fn.influenceObjects()]
+    return np.reshape(np.asarray(values, dtype=float), (-1, count)), names
+
+
+def writeWeights(skin, weights, influences=None):
+    '''Set every weight of skin in one call. weights is a (numCVs, n)
+    array whose columns are the named influences, or all of skin's
+    influences in order. Influences not named are left at 0.
+    Meshes are written WRITE_BLOCK weights at a time, so a dense mesh
+    doesn't need all its weights in one MDoubleArray.
+    '''
+    import maya.api.OpenMaya as om
+    fn, shape, components = _skinCluster(skin)
+    names = [path.partialPathName() for path in fn.influenceObjects()]
+    influences = names if influences is None else list(influences)
+    missing = [name for name in influences if name not in names]
+    if missing:
+        raise ValueError('%s are not influences of %s' % (', '.join(missing), skin))
+    weights = np.asarray(weights, dtype=float)
+    if weights.shape[1] != len(influences):
+        raise ValueError('%d weight columns for %d influences' % (weights.shape[1], len(influences)))
+    #every influence is written, so unnamed ones are cleared
+    full = np.zeros((len(weights), len(names)))
+    full[:, [names.index(name) for name in influences]] = weights
+    if full.shape[0] != _componentCount(shape):
+        raise ValueError('%d rows of weights for %d CVs on %s' % (full.shape[0], _componentCount(shape), skin))
+    indices = om.MIntArray(list(range(len(names))))
+    if not shape.hasFn(om.MFn.kMesh) or full.size <= WRITE_BLOCK:
+        fn.setWeights(shape, components, indices, om.MDoubleArray(full.ravel().tolist()), False)
+        return
+    rows = max(1, WRITE_BLOCK // len(names))
+    for start in range(0, len(full), rows):
+        component = om.MFnSingleIndexedComponent()
+        block = component.create(om.MFn.kMeshVertComponent)
+        component.addElements(list(range(start, min(start + rows, len(full)))))
+        fn.setWeights(shape, block, indices, om.MDoubleArray(full[start:start + rows].ravel().tolist()), False)
+
+
+def exportWeights(skin, path):
+    '''save skin's weights to a .npz file, keyed by influence name'''
+    weights, names = readWeights(skin)
+    np.savez_compressed(path, weights=weights.astype(np.float32), influences=np.array(names))
+
+
+def importWeights(skin, path):
+    '''Load weights saved by exportWeights on to skin. It needs the same
+    number of CVs and at least the saved influences, in any order.
+    '''
+    data = np.load(path)
+    weights = data['weights'].astype(float)
+    weights /= np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+    writeWeights(skin, weights, [str(name) for name in data['influences']])
+
+
+def _skinCluster(skin):
+    '''(MFnSkinCluster, deformed shape's dag path, all its CVs or vertices as a component)'''
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+    sel = om.MSelectionList()
+    sel.add(skin)
+    fn = oma.MFnSkinCluster(sel.getDependNode(0))
+    shape = om.MDagPath.getAPathTo(fn.getOutputGeometry()[0])
+    if shape.hasFn(om.MFn.kNurbsSurface):
+        surface = om.MFnNurbsSurface(shape)
+        component = om.MFnDoubleIndexedComponent()
+        components = component.create(om.MFn.kSurfaceCVComponent)
+        component.setCompleteData(surface.numCVsInU, surface.numCVsInV)
+    elif shape.hasFn(om.MFn.kNurbsCurve):
+        component = om.MFnSingleIndexedComponent()
+        components = component.create(om.MFn.kCurveCVComponent)
+        component.setCompleteData(om.MFnNurbsCurve(shape).numCVs)
+    elif shape.hasFn(om.MFn.kMesh):
+        component = om.MFnSingleIndexedComponent()
+        components = component.create(om.MFn.kMeshVertComponent)
+        component.setCompleteData(om.MFnMesh(shape).numVertices)
+    else:
+        raise ValueError('%s does not deform a nurbs curve, surface or mesh' % skin)
+    return fn, shape, components
+
+
+def _componentCount(shape):
+    import maya.api.OpenMaya as om
+    if shape.hasFn(om.MFn.kNurbsSurface):
+        surface = om.MFnNurbsSurface(shape)
+        return surface.numCVsInU * surface.numCVsInV
+    if shape.hasFn(om.MFn.kMesh):
+        return om.MFnMesh(shape).numVertices
+    return om.MFnNurbsCurve(shape).numCVs
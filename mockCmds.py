@@ -0,0 +1,1148 @@
+'''In-memory stand-in for the subset of maya.cmds used by curveRigger.
+
+Call install() before importing curveRigger to run the tool outside Maya.
+Every command is recorded in MockCmds.calls, and nodes and connections are
+kept in a small graph so builds can be counted and inspected. Nothing is
+evaluated: getAttr returns what was set (or 0), and geometry commands only
+do enough to give the geometry kernel sensible CVs and knots to read.
+'''
+from __future__ import print_function
+import copy
+import json
+import os
+import re
+import shlex
+import sys
+import types
+
+SHAPE_TYPES = set(['nurbsCurve', 'nurbsSurface', 'locator', 'mesh'])
+ATTR_DEFAULTS = {'visibility': 1, 'v': 1, 'sx': 1, 'sy': 1, 'sz': 1,
+    'scaleX': 1, 'scaleY': 1, 'scaleZ': 1, 'inheritsTransform': 1, 'envelope': 1}
+DAG_TYPES = SHAPE_TYPES | set(['transform', 'joint', 'aimConstraint', 'parentConstraint'])
+#MEL flags that take no argument, by command
+MEL_SWITCHES = {'addAttr': ('m', 'multi', 'uac', 'usedAsColor')}
+UI_COMMANDS = ('window', 'columnLayout', 'textFieldButtonGrp', 'button', 'text',
+    'intSliderGrp', 'floatSliderGrp', 'optionMenuGrp', 'menuItem', 'showWindow', 'progressBar', 'control',
+    'checkBox')
+
+
+class MockNode(object):
+    '''One node in the mock scene'''
+    def __init__(self, name, nodeType, uuid):
+        self.name = name
+        self.type = nodeType
+        self.uuid = uuid
+        self.parent = None
+        self.children = []
+        self.attrs = dict()
+        self.userAttrs = dict()
+        self.data = None
+
+
+def command(func):
+    '''record every call to a mock command'''
+    def wrapper(self, *args, **kwargs):
+        self.calls.append(func.__name__)
+        return func(self, *args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.isCommand = True
+    return wrapper
+
+
+class MockCmds(object):
+    '''Node/connection graph plus the maya.cmds commands that drive it'''
+    def __init__(self):
+        #node added callbacks outlive reset, like Maya's outlive a new scene
+        self.nodeAddedCallbacks = dict()
+        self.reset()
+
+    def reset(self):
+        '''empty the scene and the call log'''
+        self.nodes = dict()
+        self.connections = dict() #destination plug -> source plug
+        self.calls = []
+        self.selection = []
+        self.optionVars = dict()
+        self.undoState = True
+        self.undoChunks = 0
+        self.suspended = False
+        self.uiValues = dict()
+        self.nodesCreated = 0
+        self.sceneName = ''
+        self.deferred = []
+        self.time = 1.0
+        self.playback = (1.0, 24.0)
+
+    #Bookkeeping
+    def callCounts(self):
+        '''returns {command: count} for everything called so far'''
+        counts = dict()
+        for name in self.calls:
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def _uniqueName(self, name):
+        if name not in self.nodes:
+            return name
+        base = re.sub(r'\d+$', '', name)
+        i = 1
+        while base + str(i) in self.nodes:
+            i += 1
+        return base + str(i)
+
+    def _make(self, nodeType, name=None, parent=None):
+        if not name:
+            name = nodeType + '1'
+        name = self._uniqueName(name)
+        self.nodesCreated += 1
+        node = MockNode(name, nodeType, 'MOCK-%08d' % self.nodesCreated)
+        self.nodes[name] = node
+        if parent:
+            self._reparent(node, self._node(parent))
+        for func, clientData in list(self.nodeAddedCallbacks.values()):
+            func(_MObject(self, name), clientData)
+        return node
+
+    def _node(self, name):
+        name = name.split('|')[-1].split('.')[0]
+        if name not in self.nodes:
+            raise RuntimeError('No object matches name: %s' % name)
+        return self.nodes[name]
+
+    def _reparent(self, node, parent):
+        if node.parent:
+            node.parent.children.remove(node)
+        node.parent = parent
+        if parent:
+            parent.children.append(node)
+
+    def _shape(self, name):
+        node = self._node(name)
+        if node.type in SHAPE_TYPES:
+            return node
+        for kid in node.children:
+            if kid.type in SHAPE_TYPES:
+                return kid
+        raise RuntimeError('%s has no shape' % name)
+
+    def _descendants(self, node):
+        result = []
+        for kid in node.children:
+            result.append(kid)
+            result.extend(self._descendants(kid))
+        return result
+
+    def _flatten(self, items):
+        result = []
+        for item in items:
+            if isinstance(item, (list, tuple)):
+                result.extend(self._flatten(item))
+            elif item is not None:
+                result.append(item)
+        return result
+
+    def _attrName(self, plug):
+        return plug.split('.', 1)[1]
+
+    def _plug(self, plug):
+        '''geometry plugs named on a transform really live on its shape'''
+        name, attr = plug.split('.', 1)
+        node = self._node(name)
+        if node.type == 'transform' and attr.split('[')[0] in ('worldSpace', 'local', 'create'):
+            return self._shape(node.name).name + '.' + attr
+        return plug
+
+    def _newCurve(self, name, degree, cvs, knots, parent=None):
+        xform = self._make('transform', name or 'curve1', parent)
+        shape = self._make('nurbsCurve', xform.name + 'Shape', xform.name)
+        shape.data = {'degree': degree, 'cvs': [tuple(p) for p in cvs], 'knots': list(knots)}
+        return xform
+
+    def _newSurface(self, name, data, parent=None):
+        xform = self._make('transform', name, parent)
+        shape = self._make('nurbsSurface', xform.name + 'Shape', xform.name)
+        shape.data = data
+        return xform
+
+    #Scene queries
+    @command
+    def ls(self, *args, **kwargs):
+        if kwargs.get('sl') or kwargs.get('selection'):
+            names = list(self.selection)
+        elif args:
+            names = []
+            for item in self._flatten(args):
+                if item in self.nodes:
+                    names.append(item)
+                    continue
+                for node in self.nodes.values():
+                    if item == node.uuid:
+                        names.append(node.name)
+        else:
+            names = list(self.nodes)
+        nodeType = kwargs.get('type')
+        if nodeType:
+            names = [n for n in names if self.nodes[n].type == nodeType]
+        if kwargs.get('dag'):
+            names = [n for n in names if self.nodes[n].type in DAG_TYPES]
+        if kwargs.get('uuid'):
+            return [self.nodes[n].uuid for n in names]
+        return names
+
+    @command
+    def objExists(self, name):
+        name = name.split('|')[-1]
+        if '.' in name:
+            node, attr = name.split('.', 1)
+            return node in self.nodes and self._hasAttr(self.nodes[node], attr)
+        return name in self.nodes
+
+    def _hasAttr(self, node, attr):
+        attr = attr.split('[')[0]
+        return attr in node.attrs or attr in node.userAttrs or attr in ATTR_DEFAULTS
+
+    @command
+    def nodeType(self, name, isTypeName=False, inherited=False, **kwargs):
+        if isTypeName:
+            nodeType = name
+        else:
+            nodeType = self._node(name).type
+        if inherited:
+            return (['dagNode'] if nodeType in DAG_TYPES else []) + [nodeType]
+        return nodeType
+
+    def mel(self, command):
+        '''run a line of MEL: one of the mock's commands, its flags, then
+        its args. Flags take a value unless MEL_SWITCHES says otherwise.
+        '''
+        tokens = shlex.split(command)
+        name, args, kwargs = tokens[0], [], dict()
+        switches = MEL_SWITCHES.get(name, ())
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            if token.startswith('-') and not _isNumber(token):
+                flag = token[1:]
+                if flag in switches:
+                    kwargs[flag] = True
+                    i += 1
+                    continue
+                if i + 1 == len(tokens):
+                    raise RuntimeError('%s: flag -%s needs a value' % (name, flag))
+                kwargs[flag] = _melValue(tokens[i + 1])
+                i += 2
+            else:
+                args.append(_melValue(token))
+                i += 1
+        if not getattr(getattr(self, name, None), 'isCommand', False):
+            raise RuntimeError('Cannot find procedure "%s"' % name)
+        try:
+            return getattr(self, name)(*args, **kwargs)
+        except (TypeError, AttributeError):
+            raise RuntimeError('Invalid arguments for %s: %s' % (name, command))
+
+    @command
+    def listRelatives(self, *args, **kwargs):
+        names = self._flatten(args) or list(self.selection)
+        result = []
+        for name in names:
+            node = self._node(name)
+            if kwargs.get('p') or kwargs.get('parent'):
+                if node.parent:
+                    result.append(node.parent.name)
+                continue
+            if kwargs.get('ad') or kwargs.get('allDescendents'):
+                kids = self._descendants(node)
+            else:
+                kids = list(node.children)
+            if kwargs.get('s') or kwargs.get('shapes'):
+                kids = [k for k in kids if k.type in SHAPE_TYPES]
+            if kwargs.get('type'):
+                kids = [k for k in kids if k.type == kwargs['type']]
+            result.extend(k.name for k in kids)
+        return result or None
+
+    @command
+    def listConnections(self, *args, **kwargs):
+        names = [self._plug(n) if '.' in n else n for n in self._flatten(args)]
+        nodeNames = set(n for n in names if '.' not in n)
+        plugNames = [n for n in names if '.' in n]
+        source = kwargs.get('s', kwargs.get('source', True))
+        dest = kwargs.get('d', kwargs.get('destination', True))
+        plugs = kwargs.get('p', kwargs.get('plugs', False))
+        pairs = kwargs.get('c', kwargs.get('connections', False))
+        nodeType = kwargs.get('type')
+        found = []
+        for dst, src in self.connections.items():
+            for mine, other, wanted in ((dst, src, source), (src, dst, dest)):
+                if not wanted:
+                    continue
+                if mine.split('.')[0] not in nodeNames and not [p for p in plugNames
+                        if mine == p or mine.startswith(p + '[') or mine.startswith(p + '.')]:
+                    continue
+                otherNode = other.split('.')[0]
+                if not (plugs or kwargs.get('sh') or kwargs.get('shapes')):
+                    #like Maya, report shapes by their transform
+                    node = self.nodes[otherNode]
+                    if node.type in SHAPE_TYPES and node.parent:
+                        otherNode = node.parent.name
+                if nodeType and self.nodes[other.split('.')[0]].type != nodeType:
+                    continue
+                found.append((_plugKey(dst), mine, other if plugs else otherNode))
+        result = []
+        for key, mine, other in sorted(found):
+            if pairs:
+                result.append(mine)
+            result.append(other)
+        return result or None
+
+    @command
+    def listHistory(self, *args, **kwargs):
+        '''everything upstream of the given nodes (and their shapes).
+        pdo stops at dag nodes, like Maya's pruneDagObjects
+        '''
+        prune = kwargs.get('pdo') or kwargs.get('pruneDagObjects')
+        sources = dict()
+        for dst, src in self.connections.items():
+            sources.setdefault(dst.split('.')[0], []).append(src.split('.')[0])
+        todo = []
+        for name in self._flatten(args) or list(self.selection):
+            node = self._node(name)
+            todo.append(node.name)
+            todo.extend(k.name for k in node.children if k.type in SHAPE_TYPES)
+        start = set(todo)
+        result = []
+        seen = set()
+        while todo:
+            name = todo.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            if prune and name not in start and self.nodes[name].type in DAG_TYPES:
+                continue
+            result.append(name)
+            todo.extend(sorted(sources.get(name, [])))
+        return result
+
+    @command
+    def attributeQuery(self, attr, node=None, type=None, exists=False, **kwargs):
+        if attr == 'offsetParentMatrix':
+            return True
+        return self._hasAttr(self._node(node), attr)
+
+    #Node creation and editing
+    @command
+    def createNode(self, nodeType, n=None, name=None, p=None, parent=None, ss=False, **kwargs):
+        name = n or name
+        parent = p or parent
+        if nodeType in SHAPE_TYPES and not parent:
+            parent = self._make('transform', 'transform1').name
+        node = self._make(nodeType, name, parent)
+        if nodeType == 'nurbsCurve':
+            node.data = {'degree': 1, 'cvs': [], 'knots': []}
+        if not ss:
+            self.selection = [node.name]
+        return node.name
+
+    @command
+    def rename(self, old, new):
+        node = self._node(old)
+        new = self._uniqueName(new)
+        del self.nodes[node.name]
+        for dst, src in list(self.connections.items()):
+            if dst.split('.')[0] == node.name or src.split('.')[0] == node.name:
+                del self.connections[dst]
+                dst = re.sub('^%s\\.' % re.escape(node.name), new + '.', dst)
+                src = re.sub('^%s\\.' % re.escape(node.name), new + '.', src)
+                self.connections[dst] = src
+        oldName, node.name = node.name, new
+        self.nodes[new] = node
+        #shapes named after their transform follow it, as in Maya
+        for kid in list(node.children):
+            if kid.type in SHAPE_TYPES and kid.name.startswith(oldName):
+                self.rename(kid.name, new + kid.name[len(oldName):])
+        return new
+
+    @command
+    def parent(self, *args, **kwargs):
+        items = self._flatten(args)
+        if kwargs.get('w') or kwargs.get('world'):
+            kids, newParent = items, None
+        else:
+            kids, newParent = items[:-1], self._node(items[-1])
+        for kid in kids:
+            self._reparent(self._node(kid), newParent)
+        return list(kids)
+
+    @command
+    def delete(self, *args, **kwargs):
+        items = [item.split('|')[-1] for item in self._flatten(args) or list(self.selection)]
+        for name in items:
+            if name not in self.nodes:
+                raise RuntimeError('No object matches name: %s' % name)
+        doomed = set()
+        for name in items:
+            if name not in self.nodes:
+                #under something deleted already
+                continue
+            node = self.nodes[name]
+            for gone in [node] + self._descendants(node):
+                self.nodes.pop(gone.name, None)
+                doomed.add(gone.name)
+            self._reparent(node, None)
+        for dst, src in list(self.connections.items()):
+            if dst.split('.')[0] in doomed or src.split('.')[0] in doomed:
+                del self.connections[dst]
+        self.selection = [s for s in self.selection if s in self.nodes]
+
+    @command
+    def duplicate(self, name, **kwargs):
+        node = self._node(name)
+        copy = self._make(node.type, name + '1', node.parent.name if node.parent else None)
+        copy.attrs = dict(node.attrs)
+        for kid in node.children:
+            if kid.type in SHAPE_TYPES:
+                shape = self._make(kid.type, copy.name + 'Shape', copy.name)
+                shape.data = dict(kid.data) if kid.data else None
+        return [copy.name]
+
+    @command
+    def select(self, *args, **kwargs):
+        if kwargs.get('clear') or kwargs.get('cl'):
+            self.selection = []
+            return
+        items = self._flatten(args)
+        for item in items:
+            self._node(item)
+        if kwargs.get('add'):
+            self.selection.extend(items)
+        else:
+            self.selection = list(items)
+
+    #Attributes
+    @command
+    def addAttr(self, name, ln=None, longName=None, dv=0.0, defaultValue=None, **kwargs):
+        node = self._node(name)
+        attr = ln or longName
+        if defaultValue is not None:
+            dv = defaultValue
+        value = kwargs.get('dt') and '' or dv
+        node.userAttrs[attr] = kwargs
+        node.attrs[attr] = value
+
+    @command
+    def deleteAttr(self, plug, **kwargs):
+        node = self._node(plug)
+        attr = self._attrName(plug)
+        node.userAttrs.pop(attr, None)
+        node.attrs.pop(attr, None)
+        for dst, src in list(self.connections.items()):
+            if plug in (dst, src):
+                del self.connections[dst]
+
+    @command
+    def setAttr(self, plug, *values, **kwargs):
+        node = self._node(plug)
+        attr = self._attrName(plug)
+        if not values:
+            return
+        if plug in self.connections and not kwargs.get('l') and not kwargs.get('lock'):
+            raise RuntimeError('setAttr: %s is connected' % plug)
+        if attr.startswith('cv['):
+            shape = self._shape(node.name)
+            shape.data['cvs'][int(attr[3:-1])] = tuple(values)
+            return
+        node.attrs[attr] = values[0] if len(values) == 1 else tuple(values)
+
+    @command
+    def getAttr(self, plug, **kwargs):
+        node = self._node(plug)
+        attr = self._attrName(plug)
+        if attr.startswith('cv['):
+            shape = self._shape(node.name)
+            return [tuple(p) for p in shape.data['cvs']]
+        if attr in node.attrs:
+            return node.attrs[attr]
+        if attr == 'worldMatrix[0]' or attr == 'worldInverseMatrix[0]':
+            return [1.0, 0, 0, 0, 0, 1.0, 0, 0, 0, 0, 1.0, 0, 0, 0, 0, 1.0]
+        return ATTR_DEFAULTS.get(attr, 0.0)
+
+    @command
+    def connectAttr(self, src, dst, f=False, force=False, **kwargs):
+        src = self._plug(src)
+        dst = self._plug(dst)
+        if kwargs.get('na') or kwargs.get('nextAvailable'):
+            index = 0
+            while '%s[%d]' % (dst, index) in self.connections:
+                index += 1
+            dst = '%s[%d]' % (dst, index)
+        if dst in self.connections and not (f or force):
+            raise RuntimeError('%s is already connected' % dst)
+        self.connections[dst] = src
+
+    @command
+    def disconnectAttr(self, src, dst):
+        src = self._plug(src)
+        dst = self._plug(dst)
+        if self.connections.get(dst) != src:
+            raise RuntimeError('%s is not connected to %s' % (src, dst))
+        del self.connections[dst]
+
+    #Rigging commands
+    @command
+    def joint(self, p=(0, 0, 0), n=None, name=None, **kwargs):
+        parent = None
+        if self.selection and self.nodes[self.selection[0]].type == 'joint':
+            parent = self.selection[0]
+        node = self._make('joint', n or name or 'joint1', parent)
+        node.attrs['translate'] = tuple(p)
+        self.selection = [node.name]
+        return node.name
+
+    @command
+    def spaceLocator(self, n=None, name=None, **kwargs):
+        xform = self._make('transform', n or name or 'locator1')
+        self._make('locator', xform.name + 'Shape', xform.name)
+        self.selection = [xform.name]
+        return [xform.name]
+
+    @command
+    def curve(self, d=3, p=(), k=None, n=None, **kwargs):
+        xform = self._newCurve(n or 'curve1', d, p, list(k) if k is not None else [])
+        self.selection = [xform.name]
+        return xform.name
+
+    @command
+    def extrude(self, *args, **kwargs):
+        profile, path = [self._shape(n).data for n in self.selection[:2]]
+        grid = []
+        for offset in profile['cvs']:
+            grid.append([tuple(a + b for a, b in zip(pnt, offset)) for pnt in path['cvs']])
+        data = {'degreeU': profile['degree'], 'degreeV': path['degree'],
+            'knotsU': list(profile['knots']), 'knotsV': list(path['knots']), 'cvs': grid}
+        return [self._newSurface('extrudedSurface1', data).name]
+
+    @command
+    def surface(self, du=3, dv=3, ku=(), kv=(), p=(), n=None, **kwargs):
+        numV = len(kv) - dv + 1
+        points = [tuple(pt[:3]) for pt in p]
+        grid = [points[i:i + numV] for i in range(0, len(points), numV)]
+        data = {'degreeU': du, 'degreeV': dv, 'knotsU': list(ku), 'knotsV': list(kv), 'cvs': grid}
+        xform = self._newSurface(n or 'surface1', data)
+        self.selection = [xform.name]
+        return xform.name
+
+    @command
+    def rebuildSurface(self, surf, sv=None, du=3, dv=3, **kwargs):
+        data = self._shape(surf).data
+        rows = [_resample(row, sv + dv) for row in data['cvs']]
+        data.update({'cvs': rows, 'degreeU': du, 'degreeV': dv,
+            'knotsU': _uniformKnots(len(rows) - du, du), 'knotsV': _uniformKnots(sv, dv)})
+        return [surf]
+
+    @command
+    def rebuildCurve(self, crv, s=4, d=3, **kwargs):
+        data = self._shape(crv).data
+        data.update({'cvs': _resample(data['cvs'], s + d), 'degree': d, 'knots': _uniformKnots(s, d)})
+        return [crv]
+
+    @command
+    def pointOnSurface(self, surf, **kwargs):
+        if not kwargs.get('constructionHistory', kwargs.get('ch')):
+            if kwargs.get('normalizedTangentU') or kwargs.get('ntu'):
+                return [0.0, 0.0, 1.0]
+            if kwargs.get('normalizedTangentV') or kwargs.get('ntv'):
+                return [1.0, 0.0, 0.0]
+            return [0.0, -1.0, 0.0]
+        node = self._make('pointOnSurfaceInfo', 'pointOnSurfaceInfo1')
+        self.connections[node.name + '.inputSurface'] = self._plug(surf + '.worldSpace[0]')
+        return node.name
+
+    def _constraint(self, kind, driver, driven):
+        node = self._make(kind, driven + '_' + kind + '1', driven)
+        self.connections[node.name + '.target[0].targetParentMatrix'] = driver + '.parentMatrix[0]'
+        self.connections[node.name + '.constraintParentInverseMatrix'] = driven + '.parentInverseMatrix[0]'
+        for attr in ('translateX', 'translateY', 'translateZ', 'rotateX', 'rotateY', 'rotateZ'):
+            out = node.name + '.constraint' + attr[0].upper() + attr[1:]
+            self.connections[driven + '.' + attr] = out
+        return [node.name]
+
+    @command
+    def parentConstraint(self, driver, driven, **kwargs):
+        return self._constraint('parentConstraint', driver, driven)
+
+    @command
+    def skinCluster(self, *args, **kwargs):
+        items = self._flatten(args)
+        if kwargs.get('e') or kwargs.get('edit'):
+            if kwargs.get('ub') or kwargs.get('unbind'):
+                self.delete(items)
+            return
+        if kwargs.get('q') or kwargs.get('query'):
+            skin = items[0]
+            if kwargs.get('g') or kwargs.get('geometry'):
+                out = skin + '.outputGeometry['
+                return sorted(d.split('.')[0] for d, s in self.connections.items() if s.startswith(out))
+            return [self.connections[d].split('.')[0] for d in sorted(self.connections, key=_plugKey)
+                if d.startswith(skin + '.matrix[')]
+        joints = [i for i in items if self._node(i).type == 'joint']
+        geo = [i for i in items if i not in joints][0]
+        skin = self._make('skinCluster', kwargs.get('n') or 'skinCluster1')
+        for i, jnt in enumerate(joints):
+            self.connections['%s.matrix[%d]' % (skin.name, i)] = jnt + '.worldMatrix[0]'
+        shape = self._shape(geo)
+        plug = shape.name + ('.inMesh' if shape.type == 'mesh' else '.create')
+        if plug in self.connections:
+            #stack on top of the deformers already there
+            self.connections[skin.name + '.input[0].inputGeometry'] = self.connections[plug]
+        self.connections[plug] = skin.name + '.outputGeometry[0]'
+        return [skin.name]
+
+    @command
+    def wire(self, geo, w=None, n=None, **kwargs):
+        if kwargs.get('q') or kwargs.get('query'):
+            #follow the deformer stack down to the geometry
+            found = []
+            todo = [geo]
+            while todo:
+                out = todo.pop(0) + '.outputGeometry['
+                for d, s in sorted(self.connections.items()):
+                    if s.startswith(out):
+                        node = d.split('.')[0]
+                        (todo if self.nodes[node].type == 'wire' else found).append(node)
+            return found
+        node = self._make('wire', n or 'wire1')
+        base = self._newCurve(w + 'BaseWire', 1, [], [])
+        self.connections[node.name + '.deformedWire[0]'] = self._shape(w).name + '.worldSpace[0]'
+        self.connections[node.name + '.baseWire[0]'] = self._shape(base.name).name + '.worldSpace[0]'
+        inMesh = self._shape(geo).name + '.inMesh'
+        if inMesh in self.connections:
+            #stack on top of the deformers already there
+            self.connections[node.name + '.input[0].inputGeometry'] = self.connections[inMesh]
+        self.connections[inMesh] = node.name + '.outputGeometry[0]'
+        return [node.name, w]
+
+    #Environment
+    @command
+    def optionVar(self, **kwargs):
+        if 'exists' in kwargs:
+            return kwargs['exists'] in self.optionVars
+        if 'q' in kwargs:
+            return self.optionVars[kwargs['q']]
+        for flag in ('iv', 'fv', 'sv'):
+            if flag in kwargs:
+                key, value = kwargs[flag]
+                self.optionVars[key] = value
+
+    @command
+    def undoInfo(self, *args, **kwargs):
+        if kwargs.get('q') or kwargs.get('query'):
+            return self.undoState
+        if kwargs.get('openChunk'):
+            self.undoChunks += 1
+        if kwargs.get('closeChunk'):
+            self.undoChunks -= 1
+        for flag in ('state', 'stateWithoutFlush', 'swf'):
+            if flag in kwargs:
+                self.undoState = bool(kwargs[flag])
+
+    @command
+    def evalDeferred(self, func, **kwargs):
+        self.deferred.append(func)
+
+    def runDeferred(self):
+        '''run what evalDeferred queued, as Maya does when it's idle'''
+        while self.deferred:
+            self.deferred.pop(0)()
+
+    #Time
+    @command
+    def currentTime(self, *args, **kwargs):
+        if kwargs.get('q') or kwargs.get('query'):
+            return self.time
+        self.time = float(args[0])
+        return self.time
+
+    @command
+    def playbackOptions(self, *args, **kwargs):
+        for flags, i in ((('min', 'minTime'), 0), (('max', 'maxTime'), 1)):
+            for flag in flags:
+                if flag in kwargs:
+                    if kwargs.get('q') or kwargs.get('query'):
+                        return self.playback[i]
+                    playback = list(self.playback)
+                    playback[i] = float(kwargs[flag])
+                    self.playback = tuple(playback)
+
+    @command
+    def dgeval(self, *args, **kwargs):
+        pass
+
+    @command
+    def keyTangent(self, *args, **kwargs):
+        pass
+
+    @command
+    def file(self, *args, **kwargs):
+        '''Scene files: open empties the scene (the file must exist), save
+        writes the scene's node names and types as json. Also rename and
+        querying the scene name.
+        '''
+        if kwargs.get('q') or kwargs.get('query'):
+            if kwargs.get('sn') or kwargs.get('sceneName'):
+                return self.sceneName
+            return None
+        if kwargs.get('o') or kwargs.get('open'):
+            if not os.path.exists(args[0]):
+                raise RuntimeError('File not found: %s' % args[0])
+            optionVars = self.optionVars
+            self.reset()
+            self.optionVars = optionVars
+            self.sceneName = args[0]
+        rename = kwargs.get('rn', kwargs.get('rename'))
+        if rename:
+            self.sceneName = rename
+        if kwargs.get('s') or kwargs.get('save'):
+            with open(self.sceneName, 'w') as f:
+                json.dump(dict((n, node.type) for n, node in self.nodes.items()), f, indent=1, sort_keys=True)
+            return self.sceneName
+
+    @command
+    def refresh(self, suspend=None, **kwargs):
+        if suspend is not None:
+            self.suspended = bool(suspend)
+
+    def _ui(self, name, *args, **kwargs):
+        if kwargs.get('ex') or kwargs.get('exists'):
+            return True
+        if kwargs.get('q') or kwargs.get('query'):
+            key = args[0] if args else name
+            return self.uiValues.get(key, 0)
+        if kwargs.get('e') or kwargs.get('edit'):
+            for flag in ('v', 'value', 'text', 'progress', 'pr'):
+                if flag in kwargs:
+                    self.uiValues[args[0]] = kwargs[flag]
+            return
+        widget = '%s%d' % (name, len(self.uiValues) + 1)
+        for flag in ('v', 'value', 'text'):
+            if flag in kwargs:
+                self.uiValues[widget] = kwargs[flag]
+        return widget
+
+
+def _plugKey(plug):
+    '''sort key putting multi plugs in index order, like Maya lists them'''
+    parts = re.split(r'\[(\d+)\]', plug)
+    return [int(part) if i % 2 else part for i, part in enumerate(parts)]
+
+
+def _uniformKnots(spans, degree):
+    '''Maya-style (spans + 2*degree - 1) clamped knots on 0..1'''
+    inner = [float(i) / spans for i in range(1, spans)]
+    return [0.0] * degree + inner + [1.0] * degree
+
+
+def _isNumber(token):
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _melValue(token):
+    '''a MEL token as a python value'''
+    for kind in (int, float):
+        try:
+            return kind(token)
+        except ValueError:
+            pass
+    return token
+
+
+def _resample(points, count):
+    '''evenly resample a polyline to count points'''
+    points = [tuple(p) for p in points]
+    if len(points) < 2 or count < 2:
+        return points
+    lengths = [0.0]
+    for a, b in zip(points[:-1], points[1:]):
+        lengths.append(lengths[-1] + sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5)
+    total = lengths[-1] or 1.0
+    result = []
+    seg = 0
+    for i in range(count):
+        target = total * i / (count - 1.0)
+        while seg < len(points) - 2 and lengths[seg + 1] < target:
+            seg += 1
+        span = (lengths[seg + 1] - lengths[seg]) or 1.0
+        t = min(max((target - lengths[seg]) / span, 0.0), 1.0)
+        a, b = points[seg], points[seg + 1]
+        result.append(tuple(x + (y - x) * t for x, y in zip(a, b)))
+    return result
+
+
+class _MPoint(object):
+    def __init__(self, p):
+        self.x, self.y, self.z = p[:3]
+        self.w = 1.0
+
+
+class _MSpace(object):
+    kWorld = 4
+    kObject = 2
+
+
+class _MFn(object):
+    kTransform = 'transform'
+    kNurbsCurve = 'nurbsCurve'
+    kNurbsSurface = 'nurbsSurface'
+    kMesh = 'mesh'
+    kCurveCVComponent = 'curveCV'
+    kSurfaceCVComponent = 'surfaceCV'
+    kMeshVertComponent = 'meshVertex'
+    kDagNode = 'dagNode'
+
+
+class _MDagPath(object):
+    def __init__(self, mock, name):
+        self._mock = mock
+        self._name = name
+
+    def hasFn(self, fn):
+        return self._mock._node(self._name).type == fn
+
+    def extendToShape(self):
+        self._name = self._mock._shape(self._name).name
+
+    def partialPathName(self):
+        return self._name
+
+    fullPathName = partialPathName
+
+    @staticmethod
+    def getAPathTo(obj):
+        return _MDagPath(obj._mock, obj._name)
+
+
+class _MObject(object):
+    def __init__(self, mock, name):
+        self._mock = mock
+        self._name = name
+
+    def isNull(self):
+        return self._name is None
+
+    def hasFn(self, fn):
+        nodeType = self._mock._node(self._name).type
+        return nodeType == fn or (fn == _MFn.kDagNode and nodeType in DAG_TYPES)
+
+
+_MObject.kNullObj = _MObject(None, None)
+
+
+class _MPlug(object):
+    '''a plug by name; a compound's children (translateX...) set its
+    value's items, the way setAttr stores it
+    '''
+    def __init__(self, mock, name, parent=None, index=None):
+        self._mock = mock
+        self._name = name
+        self._parent = parent
+        self._index = index
+
+    def name(self):
+        return self._name
+
+    def child(self, index):
+        return _MPlug(self._mock, self._name + 'XYZ'[index], self, index)
+
+    def _set(self, value):
+        if self._parent:
+            values = list(self._parent._get() or (0.0, 0.0, 0.0))
+            values[self._index] = value
+            self._parent._set(tuple(values))
+            return
+        if self._name in self._mock.connections:
+            raise RuntimeError('%s is connected' % self._name)
+        self._mock._node(self._name).attrs[self._mock._attrName(self._name)] = value
+
+    def _get(self):
+        return self._mock._node(self._name).attrs.get(self._mock._attrName(self._name))
+
+
+class _MDGModifier(object):
+    '''MDGModifier and MDagModifier: edits are queued and made on doIt.
+    undoIt puts the scene back the way it was before doIt, even after a
+    doIt that failed part way. Edits are API calls, so they aren't logged
+    as commands, except what commandToExecute runs.
+    '''
+    def __init__(self, mock):
+        self._mock = mock
+        self._edits = []
+        self._before = None
+
+    def createNode(self, nodeType, parent=None):
+        obj = _MObject(self._mock, None)
+
+        def create():
+            parentName = parent._name if parent is not None else None
+            obj._name = self._mock.createNode(nodeType, p=parentName, ss=True)
+        self._edits.append((create, False))
+        return obj
+
+    def renameNode(self, obj, name):
+        self._edits.append((lambda: setattr(obj, '_name', self._mock.rename(obj._name, name)), False))
+
+    def reparentNode(self, obj, parent=None):
+        self._edits.append((lambda: self._mock.parent(obj._name, parent._name), False))
+
+    def connect(self, src, dst):
+        self._edits.append((lambda: self._mock.connectAttr(src.name(), dst.name()), False))
+
+    def newPlugValue(self, plug, value):
+        self._edits.append((lambda: plug._set(value), False))
+
+    newPlugValueBool = newPlugValueInt = newPlugValueDouble = newPlugValueString = newPlugValue
+
+    def commandToExecute(self, command):
+        self._edits.append((lambda: self._mock.mel(command), True))
+
+    def doIt(self):
+        mock = self._mock
+        self._before = copy.deepcopy((mock.nodes, mock.connections))
+        for edit, logged in self._edits:
+            calls = len(mock.calls)
+            edit()
+            if not logged:
+                del mock.calls[calls:]
+
+    def undoIt(self):
+        if self._before:
+            self._mock.nodes, self._mock.connections = copy.deepcopy(self._before)
+
+
+class _MFnMatrixData(object):
+    def create(self, matrix):
+        return tuple(matrix)
+
+
+class _MSelectionList(object):
+    def __init__(self, mock):
+        self._mock = mock
+        self._items = []
+
+    def add(self, name):
+        self._mock._node(name)
+        self._items.append(name)
+        return self
+
+    def getDagPath(self, i):
+        return _MDagPath(self._mock, self._items[i])
+
+    def getDependNode(self, i):
+        return _MObject(self._mock, self._items[i])
+
+    def getPlug(self, i):
+        return _MPlug(self._mock, self._mock._plug(self._items[i]))
+
+
+class _MUuid(object):
+    def __init__(self, uuid):
+        self._uuid = uuid
+
+    def asString(self):
+        return self._uuid
+
+
+class _MFnDependencyNode(object):
+    def __init__(self, mock, obj):
+        self._node = mock._node(obj._name)
+
+    def name(self):
+        return self._node.name
+
+    def uuid(self):
+        return _MUuid(self._node.uuid)
+
+
+class _MDGMessage(object):
+    def __init__(self, mock):
+        self._mock = mock
+        self._nextId = 0
+
+    def addNodeAddedCallback(self, func, nodeType='dependNode', clientData=None):
+        self._nextId += 1
+        self._mock.nodeAddedCallbacks[self._nextId] = (func, clientData)
+        return self._nextId
+
+
+class _MMessage(object):
+    def __init__(self, mock):
+        self._mock = mock
+
+    def removeCallback(self, callbackId):
+        self._mock.nodeAddedCallbacks.pop(callbackId, None)
+
+
+class _MFnComponent(object):
+    '''single and double indexed components, kept as a flat list of indices'''
+    def create(self, kind):
+        self.kind = kind
+        self.elements = []
+        return self
+
+    def setCompleteData(self, *counts):
+        total = 1
+        for count in counts:
+            total *= count
+        self.elements = list(range(total))
+
+    def addElements(self, elements):
+        self.elements.extend(elements)
+
+
+class _MFnSkinCluster(object):
+    '''weights are kept on the skinCluster node as {cv: [weight per influence]}'''
+    def __init__(self, obj):
+        self._mock = obj._mock
+        self._node = obj._mock._node(obj._name)
+        if self._node.data is None:
+            self._node.data = {'weights': dict()}
+
+    def influenceObjects(self):
+        return [_MDagPath(self._mock, name) for name in self._mock.skinCluster(self._node.name, q=True, inf=True)]
+
+    def getOutputGeometry(self):
+        plug = self._node.name + '.outputGeometry[0]'
+        return [_MObject(self._mock, dst.split('.')[0]) for dst, src in self._mock.connections.items() if src == plug]
+
+    def getWeights(self, shape, components):
+        count = len(self.influenceObjects())
+        weights = self._node.data['weights']
+        values = []
+        for cv in components.elements:
+            values.extend(weights.get(cv, [0.0] * count))
+        return values, count
+
+    def setWeights(self, shape, components, influences, values, normalize=True, returnOldWeights=False):
+        count = len(self.influenceObjects())
+        weights = self._node.data['weights']
+        for n, cv in enumerate(components.elements):
+            row = weights.setdefault(cv, [0.0] * count)
+            for i, influence in enumerate(influences):
+                row[influence] = values[n * len(influences) + i]
+
+
+class _MFnNurbsCurve(object):
+    def __init__(self, mock, dagPath):
+        self._data = mock._shape(dagPath.partialPathName()).data
+        self.degree = self._data['degree']
+        self.numCVs = len(self._data['cvs'])
+        self.form = 1
+
+    def cvPositions(self, space=_MSpace.kObject):
+        return [_MPoint(p) for p in self._data['cvs']]
+
+    def knots(self):
+        return list(self._data['knots'])
+
+
+class _MFnNurbsSurface(object):
+    def __init__(self, mock, dagPath):
+        self._data = mock._shape(dagPath.partialPathName()).data
+        self.degreeInU = self._data['degreeU']
+        self.degreeInV = self._data['degreeV']
+        self.numCVsInU = len(self._data['cvs'])
+        self.numCVsInV = len(self._data['cvs'][0])
+        self.formInU = self.formInV = 1
+
+    def cvPositions(self, space=_MSpace.kObject):
+        return [_MPoint(p) for row in self._data['cvs'] for p in row]
+
+    def knotsInU(self):
+        return list(self._data['knotsU'])
+
+    def knotsInV(self):
+        return list(self._data['knotsV'])
+
+
+class _MFnMesh(object):
+    '''vertices are kept on the mesh node as data['points']'''
+    def __init__(self, mock, dagPath):
+        data = mock._shape(dagPath.partialPathName()).data or {}
+        self._points = data.get('points', [])
+        self.numVertices = len(self._points)
+
+    def getPoints(self, space=_MSpace.kObject):
+        return [_MPoint(p) for p in self._points]
+
+
+def _openMayaModule(mock):
+    '''a maya.api.OpenMaya stand-in for the geometry readers and skin weights'''
+    om = types.ModuleType('maya.api.OpenMaya')
+    om.MSpace = _MSpace
+    om.MFn = _MFn
+    om.MPoint = _MPoint
+    om.MSelectionList = lambda: _MSelectionList(mock)
+    om.MFnNurbsCurve = lambda dag: _MFnNurbsCurve(mock, dag)
+    om.MFnNurbsSurface = lambda dag: _MFnNurbsSurface(mock, dag)
+    om.MFnMesh = lambda dag: _MFnMesh(mock, dag)
+    om.MDagPath = _MDagPath
+    om.MObject = _MObject
+    om.MFnDagNode = lambda obj: _MDagPath(mock, obj._name)
+    om.MDGModifier = lambda: _MDGModifier(mock)
+    om.MDagModifier = lambda: _MDGModifier(mock)
+    om.MFnMatrixData = _MFnMatrixData
+    om.MMatrix = tuple
+    om.MFnDependencyNode = lambda obj: _MFnDependencyNode(mock, obj)
+    om.MDGMessage = _MDGMessage(mock)
+    om.MMessage = _MMessage(mock)
+    om.MFnSingleIndexedComponent = _MFnComponent
+    om.MFnDoubleIndexedComponent = _MFnComponent
+    om.MIntArray = list
+    om.MDoubleArray = list
+    return om
+
+
+def _openMayaAnimModule(mock):
+    '''a maya.api.OpenMayaAnim stand-in for skin weights'''
+    oma = types.ModuleType('maya.api.OpenMayaAnim')
+    oma.MFnSkinCluster = _MFnSkinCluster
+    return oma
+
+
+def install(mock=None):
+    '''Put mock maya modules in sys.modules. Returns the MockCmds instance.
+    Must be called before curveRigger is imported.
+    '''
+    mock = mock or MockCmds()
+    cmds = types.ModuleType('maya.cmds')
+    for name in dir(mock):
+        attr = getattr(mock, name)
+        if getattr(attr, 'isCommand', False):
+            setattr(cmds, name, attr)
+    for name in UI_COMMANDS:
+        setattr(cmds, name, _uiCommand(mock, name))
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    maya.cmds = cmds
+    maya.api = api
+    api.OpenMaya = _openMayaModule(mock)
+    api.OpenMayaAnim = _openMayaAnimModule(mock)
+    sys.modules['maya'] = maya
+    sys.modules['maya.cmds'] = cmds
+    sys.modules['maya.api'] = api
+    sys.modules['maya.api.OpenMaya'] = api.OpenMaya
+    sys.modules['maya.api.OpenMayaAnim'] = api.OpenMayaAnim
+    cmds.mock = mock
+    return mock
+
+
+def _uiCommand(mock, name):
+    def ui(*args, **kwargs):
+        mock.calls.append(name)
+        return mock._ui(name, *args, **kwargs)
+    ui.__name__ = name
+    return ui
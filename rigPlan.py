@@ -0,0 +1,423 @@
+'''Declarative build plans for the cable rig.
+A BuildPlan is a flat list of node/attr/connection operations. It's plain
+data, so it can be dumped to JSON and diffed between versions of the tool
+without Maya. An executor then applies the whole plan in bulk: nodes
+first, then attributes and parenting, then values, connections last.
+
+CmdsExecutor applies plans with maya.cmds inside one undo chunk, or a
+chunk of ops at a time through steps() so a long build can be spread out.
+ModifierExecutor pushes them through OpenMaya DG/DAG modifiers instead.
+Either one rolls its plan back as a unit if anything fails.
+A PlanTemplate keeps a plan to be stamped out again under other names.
+A NodeJournal notes the nodes a build makes, to take it back out without
+Maya's undo.
+'''
+import difflib
+import json
+
+_dagTypes = dict()
+#op keys that hold node names or plugs
+_nameKeys = ('name', 'parent', 'node', 'plug', 'src', 'dst', 'driver', 'driven')
+#the order executors apply ops in
+PHASES = ('createNode', 'addAttr', 'parent', 'setAttr', 'connectAttr', 'constrain')
+
+
+class BuildPlan(object):
+    '''An ordered list of operations, each a small JSON friendly dict.
+    Node names in the plan are the names asked for. Executors return a map
+    from those to the names Maya actually gave, see resolve().
+    '''
+    def __init__(self, name=''):
+        self.name = name
+        self.ops = []
+
+    def createNode(self, nodeType, name, parent=None):
+        '''plan a node, returns its (planned) name'''
+        self.ops.append({'op': 'createNode', 'type': nodeType, 'name': name, 'parent': parent})
+        return name
+
+    def addAttr(self, node, attr, **flags):
+        '''plan a dynamic attr. flags are addAttr flags, like dv, min, max, k'''
+        self.ops.append({'op': 'addAttr', 'node': node, 'attr': attr, 'flags': flags})
+
+    def parent(self, node, parent):
+        self.ops.append({'op': 'parent', 'node': node, 'parent': parent})
+
+    def setAttr(self, plug, value, attrType=None, geometric=False):
+        '''plan a value. Lists and tuples set compound attrs like translate.
+        geometric marks values that depend on where the curve is, rather
+        than on the rig's settings (see curveRigger.captureTemplate)
+        '''
+        if isinstance(value, tuple):
+            value = list(value)
+        op = {'op': 'setAttr', 'plug': plug, 'value': value}
+        if attrType:
+            op['type'] = attrType
+        if geometric:
+            op['geometric'] = True
+        self.ops.append(op)
+
+    def connectAttr(self, src, dst):
+        self.ops.append({'op': 'connectAttr', 'src': src, 'dst': dst})
+
+    def constrain(self, kind, driver, driven):
+        '''plan a constraint, e.g. kind='parentConstraint' '''
+        self.ops.append({'op': 'constrain', 'kind': kind, 'driver': driver, 'driven': driven})
+
+    def extend(self, other):
+        '''append another plan's ops to this one'''
+        self.ops.extend(other.ops)
+
+    def renamed(self, old, new):
+        '''a copy of the plan with every name that starts with old
+        starting with new instead
+        '''
+        plan = BuildPlan(new + self.name[len(old):] if self.name.startswith(old) else self.name)
+        for op in self.ops:
+            op = dict(op)
+            for key in _nameKeys:
+                value = op.get(key)
+                if value and value.startswith(old):
+                    op[key] = new + value[len(old):]
+            plan.ops.append(op)
+        return plan
+
+    def phase(self, opName):
+        return [op for op in self.ops if op['op'] == opName]
+
+    def counts(self):
+        '''{op name: count}'''
+        counts = dict()
+        for op in self.ops:
+            counts[op['op']] = counts.get(op['op'], 0) + 1
+        return counts
+
+    def nodeCount(self):
+        '''how many nodes this plan makes, constraints included'''
+        return len(self.phase('createNode')) + len(self.phase('constrain'))
+
+    def toJson(self):
+        return json.dumps({'name': self.name, 'ops': self.ops}, indent=1, sort_keys=True)
+
+    @classmethod
+    def fromJson(cls, text):
+        data = json.loads(text)
+        plan = cls(data.get('name', ''))
+        plan.ops = data['ops']
+        return plan
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.toJson())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.fromJson(f.read())
+
+
+class PlanTemplate(object):
+    '''A plan captured under one name, to be stamped out again under others.
+    Every name in the plan starts with name. info is free for whatever
+    captured the template, e.g. the settings it was built with.
+    Values marked geometric are the ones an instance will usually want to
+    fill in again.
+    '''
+    def __init__(self, plan, name, info=None):
+        self.plan = plan
+        self.name = name
+        self.info = info or dict()
+        #find the names to swap once, so instances are just string joins
+        self._renames = []
+        for op in plan.ops:
+            keys = [(key, op[key][len(name):]) for key in _nameKeys
+                if op.get(key) and op[key].startswith(name)]
+            self._renames.append(keys)
+
+    def instance(self, name):
+        '''a copy of the plan, renamed for name'''
+        plan = BuildPlan(name + self.plan.name[len(self.name):])
+        for op, keys in zip(self.plan.ops, self._renames):
+            op = dict(op)
+            for key, suffix in keys:
+                op[key] = name + suffix
+            plan.ops.append(op)
+        return plan
+
+    def toJson(self):
+        return json.dumps({'name': self.name, 'info': self.info, 'plan': self.plan.name,
+            'ops': self.plan.ops}, indent=1, sort_keys=True)
+
+    @classmethod
+    def fromJson(cls, text):
+        data = json.loads(text)
+        plan = BuildPlan(data['plan'])
+        plan.ops = data['ops']
+        return cls(plan, data['name'], data['info'])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.toJson())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.fromJson(f.read())
+
+
+def diffPlans(old, new, oldName='old', newName='new'):
+    '''unified diff (list of lines) between two plans, one op per line'''
+    def lines(plan):
+        return [json.dumps(op, sort_keys=True) for op in plan.ops]
+    return list(difflib.unified_diff(lines(old), lines(new), oldName, newName, lineterm=''))
+
+
+def resolve(names, item):
+    '''map a planned node name, or node.attr plug, to what Maya called it'''
+    node, dot, attr = item.partition('.')
+    return names.get(node, node) + dot + attr
+
+
+class CmdsExecutor(object):
+    '''Applies plans with maya.cmds, phase by phase, in one undo chunk
+    (or one per step). Nodes it made are deleted again if any op fails.
+    '''
+    def execute(self, plan):
+        '''apply plan, returns {planned name: actual name}'''
+        names = dict()
+        for done in self.steps(plan, names):
+            pass
+        return names
+
+    def steps(self, plan, names, chunk=None):
+        '''Apply plan chunk ops at a time (all at once if chunk is None),
+        yielding how many ops are done after each chunk, so the caller can
+        hand control back to Maya in between. names is filled in with
+        {planned name: actual name} as nodes are made. Each chunk is its
+        own undo chunk. If an op fails, the nodes made so far are deleted;
+        if the caller stops early, they're left for it to clean up.
+        '''
+        import maya.cmds as cmds
+        ops = []
+        for phase in PHASES:
+            ops.extend(plan.phase(phase))
+        chunk = chunk or len(ops)
+        created = []
+        done = 0
+        try:
+            while done < len(ops):
+                cmds.undoInfo(openChunk=True, chunkName='buildPlan')
+                try:
+                    for op in ops[done:done + chunk]:
+                        self.apply(cmds, op, names, created)
+                finally:
+                    cmds.undoInfo(closeChunk=True)
+                done = min(done + chunk, len(ops))
+                yield done
+        except Exception:
+            for node in reversed(created):
+                if cmds.objExists(node):
+                    cmds.delete(node)
+            raise
+
+    def apply(self, cmds, op, names, created):
+        '''run one op, noting the nodes it makes in created'''
+        kind = op['op']
+        if kind == 'createNode':
+            kwargs = {'n': op['name'], 'ss': True}
+            if op['parent']:
+                kwargs['p'] = resolve(names, op['parent'])
+            names[op['name']] = cmds.createNode(op['type'], **kwargs)
+            created.append(names[op['name']])
+        elif kind == 'addAttr':
+            cmds.addAttr(resolve(names, op['node']), ln=op['attr'], **op['flags'])
+        elif kind == 'parent':
+            cmds.parent(resolve(names, op['node']), resolve(names, op['parent']))
+        elif kind == 'setAttr':
+            plug = resolve(names, op['plug'])
+            value = op['value']
+            kwargs = {'type': op['type']} if 'type' in op else {}
+            if isinstance(value, list):
+                cmds.setAttr(plug, *value, **kwargs)
+            else:
+                cmds.setAttr(plug, value, **kwargs)
+        elif kind == 'connectAttr':
+            cmds.connectAttr(resolve(names, op['src']), resolve(names, op['dst']))
+        elif kind == 'constrain':
+            func = getattr(cmds, op['kind'])
+            created.extend(func(resolve(names, op['driver']), resolve(names, op['driven']), mo=False))
+
+
+class ModifierExecutor(object):
+    '''Applies plans through OpenMaya modifiers: one doIt for all the
+    nodes, one for attrs and parenting, one for values and connections.
+    This skips the per-command overhead of cmds, but modifier edits don't
+    go on Maya's undo queue. A failed plan is undone here; a finished one
+    has to be deleted like any other node to get rid of it.
+    '''
+    def execute(self, plan):
+        '''apply plan, returns {planned name: actual name}'''
+        import maya.api.OpenMaya as om
+        names = dict()
+        done = []
+        try:
+            #Nodes. Parents are always planned before their children.
+            objects = dict()
+            dagMod = om.MDagModifier()
+            dgMod = om.MDGModifier()
+            for op in plan.phase('createNode'):
+                if self.isDag(op['type']):
+                    if op['parent'] in objects:
+                        parent = objects[op['parent']]
+                    elif op['parent']:
+                        parent = self.depNode(op['parent'])
+                    else:
+                        parent = om.MObject.kNullObj
+                    obj = dagMod.createNode(op['type'], parent)
+                    dagMod.renameNode(obj, op['name'])
+                else:
+                    obj = dgMod.createNode(op['type'])
+                    dgMod.renameNode(obj, op['name'])
+                objects[op['name']] = obj
+            for mod in (dgMod, dagMod):
+                #noted first, so a doIt that fails part way is undone too
+                done.append(mod)
+                mod.doIt()
+            for planned, obj in objects.items():
+                if obj.hasFn(om.MFn.kDagNode):
+                    names[planned] = om.MFnDagNode(obj).partialPathName()
+                else:
+                    names[planned] = om.MFnDependencyNode(obj).name()
+
+            #Attrs and parenting, so the values below have somewhere to go
+            mod = om.MDagModifier()
+            for op in plan.phase('addAttr'):
+                mod.commandToExecute('addAttr -ln "%s" %s "%s"' % (op['attr'], _melFlags(op['flags']), resolve(names, op['node'])))
+            for op in plan.phase('parent'):
+                mod.reparentNode(self.depNode(resolve(names, op['node'])),
+                    self.depNode(resolve(names, op['parent'])))
+            done.append(mod)
+            mod.doIt()
+
+            #Values, connections and constraints
+            mod = om.MDagModifier()
+            for op in plan.phase('setAttr'):
+                self.setPlug(mod, self.plug(resolve(names, op['plug'])), op['value'], op.get('type'))
+            for op in plan.phase('connectAttr'):
+                mod.connect(self.plug(resolve(names, op['src'])), self.plug(resolve(names, op['dst'])))
+            for op in plan.phase('constrain'):
+                mod.commandToExecute('%s "%s" "%s"' % (op['kind'],
+                    resolve(names, op['driver']), resolve(names, op['driven'])))
+            done.append(mod)
+            mod.doIt()
+        except Exception:
+            for mod in reversed(done):
+                mod.undoIt()
+            raise
+        return names
+
+    def steps(self, plan, names, chunk=None):
+        '''execute, as a single step: modifiers can't be split up'''
+        names.update(self.execute(plan))
+        yield len(plan.ops)
+
+    def isDag(self, nodeType):
+        import maya.cmds as cmds
+        if nodeType not in _dagTypes:
+            _dagTypes[nodeType] = 'dagNode' in (cmds.nodeType(nodeType, isTypeName=True, inherited=True) or [])
+        return _dagTypes[nodeType]
+
+    def depNode(self, name):
+        import maya.api.OpenMaya as om
+        sel = om.MSelectionList()
+        sel.add(name)
+        return sel.getDependNode(0)
+
+    def plug(self, name):
+        import maya.api.OpenMaya as om
+        sel = om.MSelectionList()
+        sel.add(name)
+        return sel.getPlug(0)
+
+    def setPlug(self, mod, plug, value, attrType=None):
+        import maya.api.OpenMaya as om
+        if attrType == 'matrix':
+            data = om.MFnMatrixData().create(om.MMatrix(value))
+            mod.newPlugValue(plug, data)
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                self.setPlug(mod, plug.child(i), child)
+        elif isinstance(value, bool):
+            mod.newPlugValueBool(plug, value)
+        elif isinstance(value, int):
+            mod.newPlugValueInt(plug, value)
+        elif isinstance(value, float):
+            mod.newPlugValueDouble(plug, value)
+        else:
+            mod.newPlugValueString(plug, value)
+
+
+#addAttr flags that are switches in MEL, given with no value
+_melSwitches = ('m', 'multi', 'uac', 'usedAsColor')
+
+
+def _melFlags(flags):
+    '''cmds style flags as MEL. Switches are left out when False.'''
+    words = []
+    for flag, value in sorted(flags.items()):
+        if flag in _melSwitches:
+            if value:
+                words.append('-%s' % flag)
+        else:
+            words.append('-%s %s' % (flag, _melValue(value)))
+    return ' '.join(words)
+
+
+def _melValue(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return '"%s"' % value
+
+
+class NodeJournal(object):
+    '''Notes the nodes a build makes, so they can be found, or deleted to
+    roll a failed build back. It's told about each node as it's made,
+    through a node added callback, rather than listing the whole scene, so
+    it costs the same in a big scene and keeps working with undo turned
+    off. Only nodes made between start() (called on creation) and stop()
+    are noted, so a build spread over Maya's idle time can leave out what
+    the user makes in between.
+    '''
+    def __init__(self):
+        self.uuids = []
+        self.callback = None
+        self.start()
+
+    def start(self):
+        if self.callback is None:
+            import maya.api.OpenMaya as om
+            self.callback = om.MDGMessage.addNodeAddedCallback(self.nodeAdded, 'dependNode')
+
+    def stop(self):
+        if self.callback is not None:
+            import maya.api.OpenMaya as om
+            om.MMessage.removeCallback(self.callback)
+            self.callback = None
+
+    def nodeAdded(self, node, clientData=None):
+        import maya.api.OpenMaya as om
+        self.uuids.append(om.MFnDependencyNode(node).uuid().asString())
+
+    def created(self):
+        '''uuids of the nodes noted, the ones since deleted included'''
+        return list(self.uuids)
+
+    def rollback(self):
+        '''stop noting nodes, and delete the ones noted that are still there'''
+        import maya.cmds as cmds
+        self.stop()
+        for node in reversed(cmds.ls(self.uuids) if self.uuids else []):
+            if cmds.objExists(node):
+                cmds.delete(node)
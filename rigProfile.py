@@ -0,0 +1,184 @@
+'''Stage timing for rig builds.
+
+A BuildProfiler splits a build into named stages (strip, plan, network,
+skinning...) and records the wall time of each. It can also count the
+maya.cmds calls and the nodes made in each stage, and run cProfile over
+the whole build. Counting wraps every maya.cmds function and adds a node
+added callback for as long as the build runs, so it's off by default.
+
+Stages don't overlap: time spent in a stage inside another is booked to
+the inner one only, and whatever isn't in any stage is booked to 'other'.
+A build spread over Maya's idle time pauses the profiler in between its
+steps, so the idle time and whatever runs in it are left out.
+'''
+from __future__ import print_function
+import contextlib
+import time
+
+STAT_KEYS = ('seconds', 'commands', 'nodes')
+
+
+class BuildProfiler(object):
+    '''Times the stages of one build at a time.
+        count = count maya.cmds calls and nodes made per stage
+        profile = run cProfile over the build, the pstats.Stats is
+            returned with the report
+    '''
+    def __init__(self, count=False, profile=False):
+        object.__init__(self)
+        self.count = count
+        self.profile = profile
+        self.depth = 0
+        self.commands = 0
+        self.nodes = 0
+        self.paused = None
+
+    def begin(self):
+        '''start a build. A build begun inside another is part of it'''
+        self.depth += 1
+        if self.depth > 1:
+            return
+        self.commands = 0
+        self.nodes = 0
+        self.order = []
+        self.totals = dict()
+        self.stack = []
+        self.wrapped = dict()
+        self.callback = None
+        self.profiler = None
+        self.paused = None
+        if self.count:
+            self.countCommands()
+        if self.profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start = self.snapshot()
+
+    def end(self):
+        '''Finish a build, and put maya.cmds back the way it was.
+        Returns a report like {'stages': [(name, totals)], 'total': totals,
+        'profile': pstats.Stats or None}, or None for a nested build.
+        totals hold STAT_KEYS, commands and nodes are None if not counted.
+        '''
+        self.depth -= 1
+        if self.depth:
+            return None
+        self.resume()
+        end = self.snapshot()
+        stats = None
+        if self.profiler:
+            import pstats
+            self.profiler.disable()
+            stats = pstats.Stats(self.profiler)
+        self.uncountCommands()
+        total = self.difference(end, self.start)
+        other = dict(total)
+        for name in self.order:
+            for key in STAT_KEYS:
+                other[key] -= self.totals[name][key]
+        stages = [(name, self.clean(self.totals[name])) for name in self.order]
+        stages.append(('other', self.clean(other)))
+        return {'stages': stages, 'total': self.clean(total), 'profile': stats}
+
+    def pause(self):
+        '''Stop the clock, the counts and cProfile until resume, e.g.
+        between the steps of a build run from the idle queue. Only a
+        build's outermost level can pause, and not inside a stage.
+        '''
+        if self.depth != 1 or self.stack or self.paused is not None:
+            return
+        self.paused = self.snapshot()
+        if self.profiler:
+            self.profiler.disable()
+
+    def resume(self):
+        '''start the clock again after pause, leaving out the time between'''
+        if self.paused is None:
+            return
+        spent = self.difference(self.snapshot(), self.paused)
+        for key in STAT_KEYS:
+            self.start[key] += spent[key]
+        self.paused = None
+        if self.profiler:
+            self.profiler.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''book what happens inside the with block to stage name'''
+        if not self.depth:
+            yield
+            return
+        start = self.snapshot()
+        self.stack.append(dict((key, 0) for key in STAT_KEYS))
+        try:
+            yield
+        finally:
+            inner = self.stack.pop()
+            spent = self.difference(self.snapshot(), start)
+            if self.stack:
+                for key in STAT_KEYS:
+                    self.stack[-1][key] += spent[key]
+            if name not in self.totals:
+                self.order.append(name)
+                self.totals[name] = dict((key, 0) for key in STAT_KEYS)
+            for key in STAT_KEYS:
+                self.totals[name][key] += spent[key] - inner[key]
+
+    def snapshot(self):
+        return {'seconds': time.time(), 'commands': self.commands, 'nodes': self.nodes}
+
+    def difference(self, end, start):
+        return dict((key, end[key] - start[key]) for key in STAT_KEYS)
+
+    def clean(self, totals):
+        '''totals as reported, without the counts if nothing was counted'''
+        if not self.count:
+            totals = dict(totals, commands=None, nodes=None)
+        return totals
+
+    def countCommands(self):
+        '''wrap every maya.cmds function, and count nodes as they're added'''
+        import maya.cmds as cmds
+        import maya.api.OpenMaya as om
+        for name in dir(cmds):
+            func = getattr(cmds, name)
+            if name.startswith('_') or not callable(func) or isinstance(func, type):
+                continue
+            self.wrapped[name] = func
+            setattr(cmds, name, self.counted(func))
+        self.callback = om.MDGMessage.addNodeAddedCallback(self.nodeAdded, 'dependNode')
+
+    def uncountCommands(self):
+        import maya.cmds as cmds
+        for name, func in self.wrapped.items():
+            setattr(cmds, name, func)
+        self.wrapped = dict()
+        if self.callback is not None:
+            import maya.api.OpenMaya as om
+            om.MMessage.removeCallback(self.callback)
+            self.callback = None
+
+    def counted(self, func):
+        def wrapper(*args, **kwargs):
+            if self.paused is None:
+                self.commands += 1
+            return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        return wrapper
+
+    def nodeAdded(self, node, clientData=None):
+        if self.paused is None:
+            self.nodes += 1
+
+
+def formatReport(report, title=None):
+    '''the report from BuildProfiler.end as a table'''
+    lines = []
+    if title:
+        lines.append(title)
+    lines.append('%-14s %9s %9s %7s' % ('stage', 'seconds', 'commands', 'nodes'))
+    for name, totals in report['stages'] + [('total', report['total'])]:
+        counts = tuple('-' if totals[key] is None else totals[key] for key in ('commands', 'nodes'))
+        lines.append('%-14s %9.4f %9s %7s' % ((name, totals['seconds']) + counts))
+    return '\n'.join(lines)
@@ -0,0 +1,29 @@
+'''Tests run outside Maya, on the mock maya.cmds benchmark.py installs.
+benchmark must be imported before anything that imports maya.cmds.
+'''
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture
+def mock():
+    '''the mock scene, emptied'''
+    benchmark.MOCK.reset()
+    yield benchmark.MOCK
+    assert not benchmark.MOCK.nodeAddedCallbacks, 'a journal was left recording'
+
+
+@pytest.fixture
+def tool(mock):
+    '''a RigCurveTool without its window, no cache and no printed reports'''
+    import curveRigger
+    tool = curveRigger.RigCurveTool(showUI=False)
+    tool.cache = None
+    tool.metricsHook = lambda info: None
+    return tool
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+import batchRig
+import benchmark
+
+
+def writeManifest(directory, manifest, scenes=('a.ma', 'b.ma')):
+    '''a manifest and (empty) scene files for it to open'''
+    for scene in scenes:
+        with open(str(directory / scene), 'w') as f:
+            f.write('//empty\n')
+    path = str(directory / 'jobs.json')
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    return path
+
+
+def test_load_manifest(tmp_path):
+    path = writeManifest(tmp_path, {
+        'defaults': {'numJoints': 8, 'falloff': 'linear'},
+        'jobs': [
+            {'scene': 'a.ma', 'curves': ['crvA', {'crv': 'crvB', 'numJoints': 4}]},
+            {'scene': 'sub/b.ma', 'name': 'second', 'output': 'out/b.ma', 'curves': ['crvC']}]})
+    first, second = batchRig.loadManifest(path)
+    assert first['name'] == 'a.ma'
+    assert first['scene'] == str(tmp_path / 'a.ma')
+    assert first['output'] == str(tmp_path / 'a_rigged.ma')
+    assert first['curves'] == [{'crv': 'crvA', 'numJoints': 8, 'falloff': 'linear'},
+        {'crv': 'crvB', 'numJoints': 4, 'falloff': 'linear'}]
+    assert second['name'] == 'second'
+    assert second['scene'] == str(tmp_path / 'sub' / 'b.ma')
+    assert second['output'] == str(tmp_path / 'out' / 'b.ma')
+
+
+def test_load_manifest_list(tmp_path):
+    path = writeManifest(tmp_path, [{'scene': 'a.ma', 'curves': ['crvA']}])
+    jobs = batchRig.loadManifest(path)
+    assert [job['curves'] for job in jobs] == [[{'crv': 'crvA'}]]
+
+
+@pytest.mark.parametrize('jobs', [
+    [{'curves': ['crvA']}],
+    [{'scene': 'a.ma', 'curves': []}],
+    [{'scene': 'a.ma', 'curves': ['crvA']}, {'scene': 'a.ma', 'curves': ['crvB']}]])
+def test_load_manifest_refuses(tmp_path, jobs):
+    path = writeManifest(tmp_path, jobs)
+    with pytest.raises(ValueError):
+        batchRig.loadManifest(path)
+
+
+def test_read_status(tmp_path):
+    path = str(tmp_path / 'status.jsonl')
+    assert batchRig.readStatus(path) == {}
+    with open(path, 'w') as f:
+        f.write(json.dumps({'name': 'a', 'status': 'failed'}) + '\n\n')
+        f.write(json.dumps({'name': 'a', 'status': 'ok'}) + '\n')
+    #the last result for a job wins
+    assert batchRig.readStatus(path) == {'a': {'name': 'a', 'status': 'ok'}}
+
+
+def test_fake_batch(tmp_path):
+    path = writeManifest(tmp_path, [
+        {'scene': 'a.ma', 'curves': ['crvA', {'crv': 'crvB', 'geo': 'geoB'}]},
+        {'scene': 'b.ma', 'curves': ['crvC']}])
+    assert batchRig.main([path, '--fake', '-j', '2']) == 0
+    status = batchRig.readStatus(str(tmp_path / 'jobs.status.jsonl'))
+    assert sorted(name for name, result in status.items() if result['status'] == 'ok') == ['a.ma', 'b.ma']
+    #the mock saves the scene's nodes
+    with open(str(tmp_path / 'a_rigged.ma')) as f:
+        nodes = json.load(f)
+    assert 'crvA_Rig' in nodes and 'crvB_Rig' in nodes
+    assert os.path.isdir(str(tmp_path / 'jobs_logs'))
+
+
+def test_batch_cleans_up_its_scratch(tmp_path, monkeypatch):
+    path = writeManifest(tmp_path, [{'scene': 'a.ma', 'curves': ['crvA']}])
+    scratch = tmp_path / 'tmp'
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(scratch))
+    results = batchRig.runBatch(batchRig.loadManifest(path), str(tmp_path / 'status.jsonl'), str(tmp_path / 'logs'),
+        1, batchRig.workerCommand(fake=True), report=lambda line: None)
+    assert [result['status'] for result in results] == ['ok']
+    assert not os.listdir(str(scratch))
+
+
+def test_fake_batch_resumes(tmp_path):
+    path = writeManifest(tmp_path, [
+        {'scene': 'a.ma', 'curves': ['crvA']},
+        {'scene': 'b.ma', 'curves': [{'crv': 'crvB', 'attachMode': 'nope'}]}])
+    statusPath = str(tmp_path / 'jobs.status.jsonl')
+    logDir = str(tmp_path / 'logs')
+    jobs = batchRig.loadManifest(path)
+    command = batchRig.workerCommand(fake=True)
+    results = batchRig.runBatch(jobs, statusPath, logDir, 2, command, report=lambda line: None)
+    assert sorted((r['name'], r['status']) for r in results) == [('a.ma', 'ok'), ('b.ma', 'failed')]
+    assert results[[r['name'] for r in results].index('b.ma')]['error']
+    #only the failed job runs again
+    lines = []
+    results = batchRig.runBatch(jobs, statusPath, logDir, 2, command, report=lines.append)
+    assert lines[0] == 'skipping 1 jobs already done'
+    assert [r['name'] for r in results] == ['b.ma']
+    #once fixed it's done, and then there's nothing left to run
+    with open(path, 'w') as f:
+        json.dump([{'scene': 'a.ma', 'curves': ['crvA']}, {'scene': 'b.ma', 'curves': ['crvB']}], f)
+    assert batchRig.main([path, '--fake']) == 0
+    lines = []
+    assert batchRig.runBatch(batchRig.loadManifest(path), statusPath, logDir, 2, command, report=lines.append) == []
+    assert lines[0] == 'skipping 2 jobs already done'
+    #unless restarted
+    assert batchRig.main([path, '--fake', '--restart']) == 0
+    assert sorted(batchRig.readStatus(statusPath)) == ['a.ma', 'b.ma']
+    with open(statusPath) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_fake_batch_from_a_template(mock, tool, tmp_path):
+    tool.rigFromCurve(benchmark.makeCurve('tpl'), numJoints=6, numCtrls=3)
+    tool.captureTemplate('tpl').save(str(tmp_path / 'template.json'))
+    path = writeManifest(tmp_path, {
+        'defaults': {'numJoints': 40},
+        'jobs': [{'scene': 'a.ma', 'template': 'template.json', 'curves': ['crvA', {'crv': 'crvB', 'numJoints': 4}]}]})
+    job, = batchRig.loadManifest(path)
+    assert job['template'] == str(tmp_path / 'template.json')
+    #a template's settings are its own
+    assert job['curves'] == [{'crv': 'crvA'}, {'crv': 'crvB', 'numJoints': 4}]
+    assert batchRig.main([path, '--fake']) == 0
+    with open(str(tmp_path / 'a_rigged.ma')) as f:
+        nodes = json.load(f)
+    assert sorted(name for name in nodes if '_driverJoint' in name and nodes[name] == 'joint') == [
+        'crv%s_driverJoint%02d' % (crv, i) for crv in 'AB' for i in range(6)]
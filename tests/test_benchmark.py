@@ -0,0 +1,36 @@
+import benchmark
+
+
+def totals(commands, nodes, seconds):
+    return {'commands': commands, 'nodes': nodes, 'seconds': seconds}
+
+
+def test_compare_checks_counts_only():
+    baseline = {'case': {'network': totals(100, 10, 0.1)}}
+    assert benchmark.compare({'case': {'network': totals(100, 10, 5.0)}}, baseline) == []
+    assert benchmark.compare({'case': {'network': totals(90, 9, 0.1)}}, baseline) == []
+    problems = benchmark.compare({'case': {'network': totals(101, 11, 0.1)}}, baseline)
+    assert len(problems) == 2
+
+
+def test_compare_reports_missing_cases_and_stages():
+    baseline = {'case': {'network': totals(1, 1, 0.1)}}
+    assert benchmark.compare({'other': {'network': totals(1, 1, 0.1)}}, baseline)
+    assert benchmark.compare({'case': {'plan': totals(1, 1, 0.1)}}, baseline)
+
+
+def test_slower_notes_time_over_tolerance():
+    baseline = {'case': {'network': totals(1, 1, 0.1)}}
+    assert benchmark.slower({'case': {'network': totals(1, 1, 0.2)}}, baseline, 2.0) == []
+    assert len(benchmark.slower({'case': {'network': totals(1, 1, 0.5)}}, baseline, 2.0)) == 1
+
+
+def test_stretch_case():
+    exact = benchmark.stretchCase(10, 0)
+    sampled = benchmark.stretchCase(10, 16)
+    assert (exact['lengthNodes'], exact['error'], exact['slip']) == (1, 0.0, 0.0)
+    assert sampled['lengthNodes'] == 32
+    #the same network otherwise, plus the sample points and distances
+    assert sampled['perFrame'] == exact['perFrame'] + 31
+    assert 0.0 < sampled['error'] < 1.0
+    assert exact['kernel'] > 0.0 and sampled['kernel'] > 0.0
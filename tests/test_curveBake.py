@@ -0,0 +1,178 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+import benchmark
+import curveBake
+
+
+def compose(translate, rotate, scale):
+    '''(n,4,4) world matrices from XYZ euler degrees, in Maya's row vector
+    convention, the inverse of matrixChannels
+    '''
+    x, y, z = np.radians(np.asarray(rotate, dtype=float)).T
+    one, zero = np.ones_like(x), np.zeros_like(x)
+    rx = np.stack([one, zero, zero, zero, np.cos(x), np.sin(x), zero, -np.sin(x), np.cos(x)], axis=1).reshape(-1, 3, 3)
+    ry = np.stack([np.cos(y), zero, -np.sin(y), zero, one, zero, np.sin(y), zero, np.cos(y)], axis=1).reshape(-1, 3, 3)
+    rz = np.stack([np.cos(z), np.sin(z), zero, -np.sin(z), np.cos(z), zero, zero, zero, one], axis=1).reshape(-1, 3, 3)
+    matrices = np.zeros((len(x), 4, 4))
+    matrices[:, :3, :3] = np.einsum('nij,njk,nkl->nil', rx, ry, rz) * np.asarray(scale, dtype=float)[:, :, None]
+    matrices[:, 3, :3] = translate
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def motion(times):
+    '''channels of a node moving over times, turning more than a full
+    circle about Z so the rotation has to be unwound
+    '''
+    times = np.asarray(times, dtype=float)
+    return {'translate': np.stack([times, np.sin(times), np.full_like(times, 2.0)], axis=1),
+        'rotate': np.stack([10.0 * np.sin(times), 5.0 * np.cos(times), 40.0 * times], axis=1),
+        'scale': np.stack([1.0 + 0.1 * times, np.ones_like(times), np.full_like(times, 2.0)], axis=1)}
+
+
+def test_sample_matrices_round_trip(mock, tmp_path, monkeypatch):
+    import maya.cmds as cmds
+    mover = cmds.createNode('transform', n='mover')
+    still = cmds.createNode('transform', n='still')
+    currentTime = cmds.currentTime
+
+    def stepping(*args, **kwargs):
+        #the mock doesn't animate, so the mover is posed as time moves
+        result = currentTime(*args, **kwargs)
+        channels = motion([mock.time])
+        pose = compose(channels['translate'], channels['rotate'], channels['scale'])[0]
+        mock.nodes[mover].attrs['worldMatrix[0]'] = pose.ravel().tolist()
+        return result
+    monkeypatch.setattr(cmds, 'currentTime', stepping)
+    mock.time = 7.0
+    times = curveBake.frameRange(1, 12)
+    path = str(tmp_path / 'bakes' / 'cab_bake.npy')
+    assert curveBake.sampleMatrices([mover, still], times, path) == path
+    assert mock.time == 7.0
+    matrices, info = curveBake.loadBake(path)
+    assert info == {'format': curveBake.FORMAT, 'nodes': ['mover', 'still'], 'times': times.tolist()}
+    assert matrices.shape == (12, 2, 4, 4)
+    assert not matrices.flags.writeable
+    expected = motion(times)
+    channels = curveBake.matrixChannels(matrices[:, 0])
+    for channel in ('translate', 'rotate', 'scale'):
+        assert np.allclose(channels[channel], expected[channel]), channel
+    #unwound past 360 rather than jumping back
+    assert channels['rotate'][-1, 2] == pytest.approx(480.0)
+    assert np.allclose(compose(channels['translate'], channels['rotate'], channels['scale']), matrices[:, 0])
+    channels = curveBake.matrixChannels(matrices[:, 1])
+    assert np.allclose(channels['translate'], 0.0) and np.allclose(channels['rotate'], 0.0)
+    assert np.allclose(channels['scale'], 1.0)
+
+
+def test_frame_range(mock):
+    mock.playback = (1.0, 24.0)
+    assert curveBake.frameRange().tolist() == list(range(1, 25))
+    assert curveBake.frameRange(start=20).tolist() == [20, 21, 22, 23, 24]
+    assert curveBake.frameRange(1, 10, 4).tolist() == [1, 5, 9]
+    assert curveBake.frameRange(1, 3, 0.5).tolist() == [1.0, 1.5, 2.0, 2.5, 3.0]
+    #steps that don't add up exactly still reach the end
+    assert len(curveBake.frameRange(0, 1, 0.1)) == 11
+    assert curveBake.frameRange(5, 5).tolist() == [5]
+    for start, end, step in ((10, 1, 1.0), (1, 10, 0.0), (1, 10, -1.0)):
+        with pytest.raises(ValueError):
+            curveBake.frameRange(start, end, step)
+
+
+def test_key_channels(mock):
+    import maya.cmds as cmds
+    node = cmds.createNode('transform', n='baked')
+    times = np.array([1.0, 2.0, 3.0])
+    channels = {'translate': [[0.0, 1.0, 2.0], [0.5, 1.0, 2.0], [1.0, 1.0, 2.0]],
+        'rotate': [[0.0, 0.0, 10.0], [0.0, 0.0, 20.0], [0.0, 0.0, 40.0]],
+        'scale': [[1.0, 1.0, 1.0]] * 3}
+    curves = curveBake.keyChannels(node, times, channels)
+    #only the moving channels are keyed
+    assert curves == ['baked_translateX', 'baked_rotateZ']
+    assert [mock.nodes[curve].type for curve in curves] == ['animCurveTL', 'animCurveTA']
+    assert mock.connections['baked.translateX'] == 'baked_translateX.output'
+    assert mock.connections['baked.rotateZ'] == 'baked_rotateZ.output'
+    #every key in one setAttr, as time value pairs
+    assert mock.getAttr('baked_translateX.ktv[0:2]') == (1.0, 0.0, 2.0, 0.5, 3.0, 1.0)
+    assert mock.getAttr('baked_rotateZ.ktv[0:2]') == (1.0, 10.0, 2.0, 20.0, 3.0, 40.0)
+    #the rest are set
+    assert mock.getAttr('baked.translateY') == 1.0 and mock.getAttr('baked.translateZ') == 2.0
+    assert mock.getAttr('baked.scaleX') == 1.0
+    assert not [dst for dst in mock.connections if dst.startswith('baked.') and dst not in ('baked.translateX', 'baked.rotateZ')]
+    #nothing moving, nothing keyed
+    still = cmds.createNode('transform', n='still')
+    calls = len(mock.calls)
+    assert curveBake.keyChannels(still, times, dict((c, [[0.0] * 3] * 3) for c in channels)) == []
+    assert 'keyTangent' not in mock.calls[calls:]
+
+
+def writeBake(path, frames=3, nodes=('a', 'b'), info=None):
+    np.save(path, np.zeros((frames, len(nodes), 4, 4)))
+    with open(curveBake.infoPath(path), 'w') as f:
+        json.dump(info or {'format': curveBake.FORMAT, 'nodes': list(nodes), 'times': list(range(frames))}, f)
+
+
+def test_load_bake_refuses(tmp_path):
+    path = str(tmp_path / 'cab_bake.npy')
+    writeBake(path)
+    matrices, info = curveBake.loadBake(path)
+    assert matrices.shape == (3, 2, 4, 4) and info['nodes'] == ['a', 'b']
+    writeBake(path, info={'format': curveBake.FORMAT + 1, 'nodes': ['a', 'b'], 'times': [0, 1, 2]})
+    with pytest.raises(ValueError):
+        curveBake.loadBake(path)
+    for info in ({'format': curveBake.FORMAT, 'nodes': ['a', 'b'], 'times': [0, 1]},
+            {'format': curveBake.FORMAT, 'nodes': ['a', 'b', 'c'], 'times': [0, 1, 2]}):
+        writeBake(path, info=info)
+        with pytest.raises(ValueError):
+            curveBake.loadBake(path)
+
+
+def test_default_path(mock):
+    assert curveBake.defaultPath('cab') == os.path.join(tempfile.gettempdir(), 'cab_bake.npy')
+    mock.sceneName = os.path.join('shots', 'sh010.ma')
+    assert curveBake.defaultPath('cab') == os.path.join('shots', 'sh010_cab_bake.npy')
+    assert curveBake.infoPath(curveBake.defaultPath('cab')) == os.path.join('shots', 'sh010_cab_bake.json')
+
+
+@pytest.mark.parametrize('visible', [1, 0])
+def test_bake_and_back_to_the_live_rig(mock, tool, tmp_path, visible):
+    import curveRigger
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    tool.rigFromCurve(crv, geo=geo, numJoints=6, numCtrls=3, proxyJoints=3)
+    rig = curveRigger.getRig(crv)
+    mock.setAttr(rig['rig'] + '.visibility', visible)
+    mock.playback = (1.0, 5.0)
+    live = (set(mock.nodes), dict(mock.connections))
+    path = str(tmp_path / 'cab_bake.npy')
+    assert tool.bakeRig(crv, path=path) == path
+    assert os.path.exists(path) and os.path.exists(curveBake.infoPath(path))
+    for swaps in range(2):
+        baked = curveRigger.getRig(crv)['bake']
+        assert baked == 'cab_Baked'
+        bakedJoints = dict((mock.connections[node + '.bakedJoint'].split('.')[0], node)
+            for node in mock.listRelatives(baked, c=True))
+        assert sorted(bakedJoints) == sorted(rig['skinJoints'] + rig['proxyJoints'])
+        #the skinClusters follow the baked joints instead, and the rig is hidden
+        for skin in (rig['curveSkin'], rig['proxyCurveSkin']):
+            sources = [src.split('.')[0] for dst, src in mock.connections.items() if dst.startswith(skin + '.matrix[')]
+            assert sources and set(sources) <= set(bakedJoints.values())
+        assert mock.getAttr(rig['rig'] + '.visibility') == 0
+        assert mock.getAttr(baked + '.rigVisibility') == visible
+        tool.useLiveRig(crv)
+        assert (set(mock.nodes), mock.connections) == live
+        assert mock.getAttr(rig['rig'] + '.visibility') == visible
+        assert curveRigger.getRig(crv)['bake'] is None
+        with pytest.raises(RuntimeError):
+            tool.useLiveRig(crv)
+        tool.useBake(crv, path)
+    tool.useLiveRig(crv)
+    #a bake from joints the rig no longer has isn't used
+    tool.updateRig(crv, numJoints=4, proxyJoints=0)
+    with pytest.raises(RuntimeError):
+        tool.useBake(crv, path)
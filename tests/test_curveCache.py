@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+import benchmark
+import curveCache
+import curveGeometry
+import curveRigger
+
+LINE = curveGeometry.NurbsCurve([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]],
+    curveGeometry.fullKnots([0, 0, 0, 1, 1, 1]), 3)
+
+
+def test_key_follows_content():
+    arrays = curveCache.curveArrays(LINE)
+    key = curveCache.contentKey('fit', arrays, uMin=0.0, uMax=1.0)
+    assert key.startswith('fit_')
+    #the same content and settings, however they're passed
+    assert key == curveCache.contentKey('fit', dict(arrays), uMax=1.0, uMin=0.0)
+    moved = dict(arrays, cvs=arrays['cvs'] + [0.0, 0.0, 1e-9])
+    others = [curveCache.contentKey('fit', moved, uMin=0.0, uMax=1.0),
+        curveCache.contentKey('fit', arrays, uMin=0.0, uMax=0.9),
+        curveCache.contentKey('strip', arrays, uMin=0.0, uMax=1.0),
+        curveCache.contentKey('fit', dict(arrays, degree=np.array(2)), uMin=0.0, uMax=1.0)]
+    assert len(set(others + [key])) == 5
+
+
+def test_key_sees_array_shapes():
+    flat = {'cvs': np.zeros(6)}
+    assert curveCache.contentKey('fit', flat) != curveCache.contentKey('fit', {'cvs': np.zeros((2, 3))})
+
+
+def test_surface_arrays_round_trip():
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, 4), np.linspace(0.0, 3.0, 4), indexing='ij')
+    surface = curveGeometry.NurbsSurface(np.stack((v, u, u * v), axis=2), LINE.knots, LINE.knots, 3, 3)
+    again = curveCache.toSurface(curveCache.surfaceArrays(surface))
+    assert np.allclose(again.evaluate([0.2, 0.7], [0.4, 0.9]), surface.evaluate([0.2, 0.7], [0.4, 0.9]))
+
+
+def test_save_and_load(tmp_path):
+    cache = curveCache.CurveCache(str(tmp_path / 'cache'))
+    assert cache.load('fit_a') is None
+    cache.save('fit_a', {'arcLength': np.array(2.5), 'positions': np.eye(3)})
+    arrays = cache.load('fit_a')
+    assert float(arrays['arcLength']) == 2.5
+    assert np.allclose(arrays['positions'], np.eye(3))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not [name for name in os.listdir(cache.directory) if name.endswith('.tmp')]
+
+
+def test_broken_entries_are_misses(tmp_path):
+    cache = curveCache.CurveCache(str(tmp_path))
+    with open(cache.path('fit_a'), 'wb') as f:
+        f.write(b'PK half written')
+    assert cache.load('fit_a') is None
+    assert not os.path.exists(cache.path('fit_a'))
+    assert cache.misses == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = curveCache.CurveCache(str(tmp_path), maxBytes=10 ** 9)
+    #random data doesn't compress, so entries are all about the same size
+    rng = np.random.RandomState(0)
+    for i, key in enumerate('abc'):
+        cache.save(key, {'data': rng.rand(1000)})
+        os.utime(cache.path(key), (1000 + i, 1000 + i))
+    #a load counts as a use, so a (the oldest) now outlives b
+    cache.load('a')
+    cache.maxBytes = cache.size() - 1
+    cache.evict()
+    assert sorted(name[0] for name in os.listdir(cache.directory)) == ['a', 'c']
+    cache.maxBytes = 0
+    cache.evict()
+    assert cache.size() == 0
+
+
+def test_save_keeps_the_limit(tmp_path):
+    cache = curveCache.CurveCache(str(tmp_path), maxBytes=20000)
+    rng = np.random.RandomState(1)
+    for i in range(10):
+        cache.save('entry%d' % i, {'data': rng.rand(1000)})
+        assert cache.size() <= cache.maxBytes
+    assert cache.load('entry9') is not None
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_from_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv('CURVERIGGER_CACHE', raising=False)
+    assert curveCache.fromEnvironment() is None
+    monkeypatch.setenv('CURVERIGGER_CACHE', str(tmp_path / 'env'))
+    monkeypatch.setenv('CURVERIGGER_CACHE_MB', '1.5')
+    cache = curveCache.fromEnvironment()
+    assert cache.directory == str(tmp_path / 'env')
+    assert cache.maxBytes == int(1.5 * 2 ** 20)
+
+
+def test_rebuild_reads_the_cache(mock, tmp_path):
+    tool = curveRigger.RigCurveTool(showUI=False)
+    tool.metricsHook = lambda info: None
+    tool.cache = curveCache.CurveCache(str(tmp_path))
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=10, numCtrls=4, falloff='linear')
+    built = sorted(mock.nodes)
+    assert tool.cache.hits == 0 and tool.cache.misses > 0
+    misses = tool.cache.misses
+    mock.reset()
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=10, numCtrls=4, falloff='linear')
+    assert tool.cache.misses == misses and tool.cache.hits == misses
+    assert sorted(mock.nodes) == built
@@ -0,0 +1,139 @@
+'''curveGeometry checked against analytic curves: a line, a circle arc
+and a helix. The arc and helix are least squares B-spline fits, close
+enough that their errors don't show at these tolerances.
+'''
+import numpy as np
+import pytest
+
+import curveGeometry
+
+BEZIER = curveGeometry.fullKnots([0, 0, 0, 1, 1, 1])
+
+
+def bernstein(t, cvs):
+    '''a cubic Bezier and its first two derivatives, from the textbook formulas'''
+    t = np.asarray(t, dtype=float)[:, None]
+    p0, p1, p2, p3 = cvs
+    point = (1 - t) ** 3 * p0 + 3 * t * (1 - t) ** 2 * p1 + 3 * t ** 2 * (1 - t) * p2 + t ** 3 * p3
+    first = 3 * ((1 - t) ** 2 * (p1 - p0) + 2 * t * (1 - t) * (p2 - p1) + t ** 2 * (p3 - p2))
+    second = 6 * ((1 - t) * (p2 - 2 * p1 + p0) + t * (p3 - 2 * p2 + p1))
+    return point, first, second
+
+
+def fitCurve(func, numCVs=40, degree=3):
+    '''NurbsCurve least squares fit to func(t) over t in [0,1]'''
+    inner = np.linspace(0.0, 1.0, numCVs - degree + 1)
+    knots = np.concatenate(([0.0] * degree, inner, [1.0] * degree))
+    t = np.linspace(0.0, 1.0, 20 * numCVs)
+    basis = curveGeometry.basisFunctions(knots, degree, t)
+    cvs = np.linalg.lstsq(basis, func(t), rcond=None)[0]
+    return curveGeometry.NurbsCurve(cvs, knots, degree)
+
+
+def arc(radius, angle):
+    return lambda t: np.stack((radius * np.cos(angle * t), radius * np.sin(angle * t), 0.0 * t), axis=1)
+
+
+def helix(radius, angle, rise):
+    return lambda t: np.stack((radius * np.cos(angle * t), radius * np.sin(angle * t), rise * t), axis=1)
+
+
+def eulerMatrix(x, y, z):
+    '''XYZ rotate order matrix from degrees, rows are the axes (row vectors)'''
+    x, y, z = np.radians([x, y, z])
+    rx = np.array([[1, 0, 0], [0, np.cos(x), np.sin(x)], [0, -np.sin(x), np.cos(x)]])
+    ry = np.array([[np.cos(y), 0, -np.sin(y)], [0, 1, 0], [np.sin(y), 0, np.cos(y)]])
+    rz = np.array([[np.cos(z), np.sin(z), 0], [-np.sin(z), np.cos(z), 0], [0, 0, 1]])
+    return rx.dot(ry).dot(rz)
+
+
+def test_bezier_matches_bernstein():
+    cvs = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, -1.0], [3.0, -1.0, 2.0], [4.0, 1.0, 0.5]])
+    curve = curveGeometry.NurbsCurve(cvs, BEZIER, 3)
+    t = np.linspace(0.0, 1.0, 11)
+    for deriv, expected in enumerate(bernstein(t, cvs)):
+        assert np.allclose(curve.evaluate(t, deriv), expected)
+
+
+def test_knots_must_fit_cvs():
+    with pytest.raises(ValueError):
+        curveGeometry.NurbsCurve(np.zeros((3, 3)), BEZIER, 3)
+
+
+def test_line():
+    cvs = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]])
+    curve = curveGeometry.NurbsCurve(cvs, BEZIER, 3)
+    assert np.isclose(curve.length(), 3.0)
+    fractions = np.linspace(0.0, 1.0, 7)
+    assert np.allclose(curve.paramsAtFractions(fractions), fractions)
+    assert np.allclose(curve.lengthAt(fractions), 3.0 * fractions)
+    points = np.array([[1.5, 2.0, 0.0], [-1.0, 0.0, 1.0], [9.0, -3.0, 0.0], [0.3, 0.0, -4.0]])
+    assert np.allclose(curve.closestParams(points), [0.5, 0.0, 1.0, 0.1])
+
+
+def test_circle_arc():
+    radius, angle = 2.0, 0.75 * np.pi
+    curve = fitCurve(arc(radius, angle))
+    assert np.isclose(curve.length(), radius * angle, rtol=1e-6)
+    fractions = np.linspace(0.0, 1.0, 9)
+    points = curve.evaluate(curve.paramsAtFractions(fractions))
+    assert np.allclose(np.arctan2(points[:, 1], points[:, 0]), angle * fractions, atol=1e-6)
+    #off the arc, outside and inside, the closest point is at the same angle
+    #(looser, the fit's own wobble shows from inside)
+    angles = np.array([0.1, 0.9, 1.7, 2.2])
+    outside = np.stack((np.cos(angles), np.sin(angles), 0.0 * angles), axis=1)
+    for scale in (3.0, 0.5):
+        closest = curve.evaluate(curve.closestParams(outside * scale))
+        assert np.allclose(np.arctan2(closest[:, 1], closest[:, 0]), angles, atol=1e-5)
+
+
+def test_helix():
+    radius, angle, rise = 1.0, 4.0 * np.pi, 3.0
+    curve = fitCurve(helix(radius, angle, rise), numCVs=80)
+    assert np.isclose(curve.length(), np.hypot(radius * angle, rise), rtol=1e-6)
+    #arc length runs evenly with height up a helix
+    fractions = np.linspace(0.0, 1.0, 13)
+    points = curve.evaluate(curve.paramsAtFractions(fractions))
+    assert np.allclose(points[:, 2], rise * fractions, atol=1e-5)
+    #from just outside the helix, the closest point is straight in
+    t = np.array([0.05, 0.3, 0.62, 0.9])
+    near = helix(radius, angle, rise)(t) * np.array([1.1, 1.1, 1.0])
+    assert np.allclose(curve.closestParams(near), t, atol=1e-4)
+
+
+def test_surface_frames_are_orthonormal():
+    #a strip bent up in V and sheared in U
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, 4), np.linspace(0.0, 3.0, 4), indexing='ij')
+    cvs = np.stack((v + 0.5 * u, u, 0.3 * v ** 2), axis=2)
+    surface = curveGeometry.NurbsSurface(cvs, BEZIER, BEZIER, 3, 3)
+    params = np.linspace(0.0, 1.0, 5)
+    positions, matrices = surface.frames(np.full(5, 0.5), params)
+    for m in matrices:
+        assert np.allclose(m.dot(m.T), np.eye(3))
+        assert np.isclose(np.linalg.det(m), 1.0)
+
+
+def test_matrixToEuler_round_trip():
+    rng = np.random.RandomState(3)
+    angles = np.stack((rng.uniform(-179, 179, 50), rng.uniform(-89, 89, 50), rng.uniform(-179, 179, 50)), axis=1)
+    matrices = np.array([eulerMatrix(*a) for a in angles])
+    assert np.allclose(curveGeometry.matrixToEuler(matrices), angles)
+
+
+def test_matrixToEuler_gimbal():
+    #looking straight down Y only X+Z (or X-Z) is defined, so compare matrices
+    angles = [(30.0, 90.0, 10.0), (-45.0, -90.0, 20.0), (0.0, 90.0, 0.0)]
+    matrices = np.array([eulerMatrix(*a) for a in angles])
+    found = curveGeometry.matrixToEuler(matrices)
+    assert np.allclose(found[:, 0], 0.0)
+    assert np.allclose(np.array([eulerMatrix(*a) for a in found]), matrices)
+
+
+def test_chord_length():
+    radius, angle = 2.0, 0.75 * np.pi
+    curve = fitCurve(arc(radius, angle))
+    #samples evenly spaced in param are near enough evenly spaced round the arc
+    for samples in (4, 16):
+        chord = 2.0 * radius * np.sin(angle / (samples - 1) / 2.0) * (samples - 1)
+        assert np.isclose(curve.chordLength(samples), chord, rtol=1e-3)
+    assert curve.chordLength(16) < curve.length()
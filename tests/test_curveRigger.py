@@ -0,0 +1,543 @@
+import time
+
+import numpy as np
+import pytest
+
+import benchmark
+import curveGeometry
+import curveRigger
+import rigPlan
+
+
+def runChunks(mock, between=None):
+    '''run the queued build steps, calling between after each'''
+    steps = 0
+    while mock.deferred:
+        mock.deferred.pop(0)()
+        steps += 1
+        if between and mock.deferred:
+            between(steps)
+    return steps
+
+
+def test_chunked_build_matches_rigFromCurve(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=20, numCtrls=4)
+    built = sorted(mock.nodes)
+    mock.reset()
+    crv = benchmark.makeCurve('cab')
+    done = []
+    tool.startBuild(crv, chunk=5, numJoints=20, numCtrls=4, onDone=done.append)
+    assert runChunks(mock) > 3
+    assert done == ['cab_Rig']
+    assert sorted(mock.nodes) == built
+
+
+def test_cancel_keeps_nodes_made_between_chunks(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    before = set(mock.nodes)
+    tool.startBuild(crv, chunk=5, numJoints=20, numCtrls=4)
+    mine = []
+    for i in range(4):
+        mock.deferred.pop(0)()
+        mine.append(mock.createNode('transform', n='userNode%d' % i))
+    tool.cancelBuild()
+    mock.runDeferred()
+    assert set(mock.nodes) == before | set(mine)
+    assert tool.running is None
+
+
+def test_failed_chunk_keeps_nodes_made_between_chunks(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    before = set(mock.nodes)
+    tool.startBuild(crv, chunk=5, numJoints=20, numCtrls=4)
+    mine = []
+    for i in range(3):
+        mock.deferred.pop(0)()
+        mine.append(mock.createNode('transform', n='userNode%d' % i))
+    tool.finishRig = None
+    try:
+        runChunks(mock)
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('the build should have failed')
+    assert set(mock.nodes) == before | set(mine)
+
+
+def test_failed_build_rolls_back_without_listing_the_scene(mock, tool, monkeypatch):
+    import maya.cmds as cmds
+    crv = benchmark.makeCurve('cab')
+    mock.createNode('transform', n='userNode')
+    before = set(mock.nodes)
+    listed = []
+    ls = cmds.ls
+
+    def recordingLs(*args, **kwargs):
+        if kwargs.get('uuid') and not args:
+            listed.append(kwargs)
+        return ls(*args, **kwargs)
+    monkeypatch.setattr(cmds, 'ls', recordingLs)
+
+    def fail(*args, **kwargs):
+        raise ValueError('boom')
+    monkeypatch.setattr(tool, 'finishRig', fail)
+    try:
+        tool.rigFromCurve(crv, numJoints=20, numCtrls=4)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('the build should have failed')
+    assert set(mock.nodes) == before
+    assert not listed
+
+
+@pytest.mark.parametrize('undo', [True, False])
+def test_fast_mode_puts_undo_back_when_it_fails(mock, tool, undo):
+    mock.undoState = undo
+    with pytest.raises(ValueError):
+        with tool.fastMode(True):
+            assert not mock.undoState and mock.suspended
+            raise ValueError('boom')
+    assert mock.undoState == undo
+    assert not mock.suspended
+    assert not tool.fastActive
+
+
+def test_fast_mode_inside_another_leaves_it_to_the_outer(mock, tool):
+    with pytest.raises(ValueError):
+        with tool.fastMode(True):
+            with pytest.raises(KeyError):
+                with tool.fastMode(True):
+                    raise KeyError('inner')
+            #the outer block is still fast
+            assert not mock.undoState and mock.suspended
+            raise ValueError('outer')
+    assert mock.undoState
+    assert not mock.suspended
+    #fast=False leaves undo alone
+    with tool.fastMode(False):
+        assert mock.undoState and not mock.suspended
+
+
+def test_failed_fast_build_rolls_back(mock, tool, monkeypatch):
+    crv = benchmark.makeCurve('cab')
+    before = set(mock.nodes)
+    tool.fastBuild = True
+
+    def fail(*args, **kwargs):
+        raise ValueError('boom')
+    monkeypatch.setattr(tool, 'finishRig', fail)
+    with pytest.raises(ValueError):
+        tool.rigFromCurve(crv, numJoints=8, numCtrls=3)
+    assert set(mock.nodes) == before
+    assert mock.undoState and not mock.suspended
+    assert mock.undoChunks == 0
+    assert not tool.fastBuilds
+
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_undo_rig_removes_a_fast_build(mock, tool, chunked):
+    crv = benchmark.makeCurve('cab')
+    other = benchmark.makeCurve('other')
+    tool.rigFromCurve(other, numJoints=6, numCtrls=3)
+    before = set(mock.nodes)
+    tool.fastBuild = True
+    if chunked:
+        tool.startBuild(crv, chunk=4, numJoints=8, numCtrls=3)
+        runChunks(mock, lambda steps: mock.createNode('transform', n='userNode%d' % steps))
+    else:
+        tool.rigFromCurve(crv, numJoints=8, numCtrls=3)
+    mock.createNode('transform', n='userNode')
+    assert mock.undoState and not mock.suspended
+    assert [build['crv'] for build in tool.fastBuilds] == ['cab']
+    assert tool.undoRig(crv) == 'cab_Rig'
+    #the rig built with undo on and the nodes made around the build stay
+    assert set(name for name in mock.nodes if not name.startswith('userNode')) == before
+    assert 'userNode' in mock.nodes
+    if chunked:
+        assert 'userNode1' in mock.nodes
+    assert mock.undoChunks == 0
+    with pytest.raises(RuntimeError):
+        tool.undoRig()
+
+
+def test_rig_curves_reports_each_curve(mock):
+    for name in ('cabA', 'cabB', 'cabC', 'cabD'):
+        benchmark.makeCurve(name)
+    geo = benchmark.makeGeo('cabBGeo', 'cabB', rings=20)
+    mock.selection = [geo]
+    before = set(mock.nodes)
+    results = curveRigger.rigCurves(['cabA', {'crv': 'cabB', 'numJoints': 6, 'geo': geo}, 'missing',
+        {'crv': 'cabC', 'attachMode': 'nope'}, 'cabD'])
+    assert [result['crv'] for result in results] == ['cabA', 'cabB', 'missing', 'cabC', 'cabD']
+    assert [result['rig'] for result in results] == ['cabA_Rig', 'cabB_Rig', None, None, 'cabD_Rig']
+    #the bad curves don't stop the rest
+    assert [bool(result['error']) for result in results] == [False, False, True, True, False]
+    assert 'nope' in results[3]['error']
+    assert all(result['time'] >= 0 for result in results)
+    assert [result['info'].get('rig') for result in results] == ['cabA_Rig', 'cabB_Rig', None, None, 'cabD_Rig']
+    assert curveRigger.getRig('cabB')['wires']
+    assert not [name for name in set(mock.nodes) - before if name.startswith('cabC')]
+    #one undo chunk, and the selection is put back
+    assert mock.undoChunks == 0
+    assert mock.selection == [geo]
+    assert not mock.suspended
+
+
+def test_rig_curves_stops_on_error(mock):
+    benchmark.makeCurve('cabA')
+    benchmark.makeCurve('cabB')
+    with pytest.raises(RuntimeError):
+        curveRigger.rigCurves(['cabA', 'missing', 'cabB'], stopOnError=True)
+    assert 'cabA_Rig' in mock.nodes and 'cabB_Rig' not in mock.nodes
+    assert mock.undoChunks == 0
+    assert mock.selection == []
+    assert not mock.suspended
+
+
+@pytest.mark.parametrize('undo', [True, False])
+def test_fast_rig_curves_puts_undo_back(mock, monkeypatch, undo):
+    benchmark.makeCurve('cabA')
+    benchmark.makeCurve('cabB')
+    before = set(mock.nodes)
+    mock.undoState = undo
+    recorded = []
+    finishRig = curveRigger.RigCurveTool.finishRig
+
+    def failOnB(self, crv, *args):
+        recorded.append(mock.undoState)
+        if crv == 'cabB':
+            raise ValueError('boom')
+        return finishRig(self, crv, *args)
+    monkeypatch.setattr(curveRigger.RigCurveTool, 'finishRig', failOnB)
+    results = curveRigger.rigCurves(['cabA', 'cabB'], fast=True)
+    assert [result['rig'] for result in results] == ['cabA_Rig', None]
+    assert results[1]['error'] == 'boom'
+    #undo was off for the builds, the failed one was rolled back from its journal
+    assert recorded == [False, False]
+    assert [name for name in set(mock.nodes) - before if name.startswith('cabB')] == []
+    assert mock.undoState == undo
+    assert mock.undoChunks == 0
+    assert not mock.suspended
+
+
+def test_matrix_frames_cross_for_tangent_u(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=5, numCtrls=2, attachMode='matrix', proxyJoints=2)
+    rig = tool.findRig(crv)
+    axes = tool.matrixAxes(rig['surface'])
+    row = axes.index('normalizedTangentU')
+    for jnt in rig['skinJoints'] + rig['proxyJoints']:
+        cross = jnt + 'Cross'
+        assert mock.getAttr(cross + '.operation') == 2
+        for col, axis in enumerate('XYZ'):
+            assert mock.listConnections('%sMatrix.in%d%d' % (jnt, row, col), s=True, d=False, p=True) == [cross + '.output' + axis]
+        #frozen with the rest of its chain's attach network
+        assert mock.listConnections(cross + '.nodeState', s=True, d=False) == [rig['rig'].replace('_Rig', '_lod')]
+    tool.updateRig(crv, numJoints=3)
+    assert sorted(node for node in mock.nodes if node.endswith('Cross')) == [
+        'cab_driverJoint00Cross', 'cab_driverJoint01Cross', 'cab_driverJoint02Cross', 'cab_proxyJoint00Cross', 'cab_proxyJoint01Cross']
+
+
+def plugValue(mock, plug):
+    '''what plug evaluates to, following its connection. The mock doesn't
+    evaluate nodes, so condition nodes are worked out here
+    '''
+    src = mock.connections.get(plug)
+    if src is None:
+        return mock.getAttr(plug)
+    node, attr = src.split('.', 1)
+    if mock.nodes[node].type != 'condition':
+        return plugValue(mock, src)
+    #operation 0 is equal, the only one the rig uses
+    assert mock.getAttr(node + '.operation') == 0
+    equal = plugValue(mock, node + '.firstTerm') == plugValue(mock, node + '.secondTerm')
+    color = mock.getAttr(node + ('.colorIfTrue' if equal else '.colorIfFalse'))
+    return color['RGB'.index(attr[-1])]
+
+
+@pytest.mark.parametrize('attachMode', ['classic', 'matrix'])
+def test_lod_switches_chains(mock, tool, attachMode):
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    tool.rigFromCurve(crv, geo=geo, numJoints=6, numCtrls=3, attachMode=attachMode, proxyJoints=3)
+    rig = tool.findRig(crv)
+    frozen = dict((dst.split('.')[0], src) for dst, src in mock.connections.items() if dst.endswith('.nodeState'))
+    chains = {'full': [node for node, src in frozen.items() if src == rig['lod'] + '.outColorR'],
+        'proxy': [node for node, src in frozen.items() if src == rig['lod'] + '.outColorG']}
+    assert set(rig['stretchCtrls']) <= set(chains['full'])
+    assert set(rig['proxyStretchCtrls']) <= set(chains['proxy'])
+    assert len(chains['full']) + len(chains['proxy']) == len(frozen)
+    assert len(chains['full']) == 2 * len(chains['proxy'])
+    wire, proxyWire = rig['wires']
+    for level, live, blocked in (('full', 'full', 'proxy'), ('proxy', 'proxy', 'full'), ('full', 'full', 'proxy')):
+        mock.setAttr(rig['ctrls'][0] + '.lod', curveRigger.LOD_LEVELS.index(level))
+        #the chain not picked is blocked and hidden, its wire skipped
+        assert set(plugValue(mock, node + '.nodeState') for node in chains[live]) == {0}
+        assert set(plugValue(mock, node + '.nodeState') for node in chains[blocked]) == {2}
+        assert plugValue(mock, rig['skinJointGroup'] + '.visibility') == (level == 'full')
+        assert plugValue(mock, rig['proxyJointGroup'] + '.visibility') == (level == 'proxy')
+        assert plugValue(mock, wire + '.envelope') == (level == 'full')
+        assert plugValue(mock, proxyWire + '.envelope') == (level == 'proxy')
+
+
+def test_get_rig_finds_renamed_parts(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    tool.rigFromCurve(crv, geo=geo, numJoints=6, numCtrls=3, proxyJoints=3)
+    rig = curveRigger.getRig(crv)
+    assert rig['meta'] == 'cab_RigMeta' and rig['rig'] == 'cab_Rig' and rig['curve'] == crv
+    assert rig['skinJoints'] == ['cab_driverJoint%02d' % i for i in range(6)]
+    assert len(rig['ctrls']) == len(rig['stripJoints']) == 3 and len(rig['proxyJoints']) == 3
+    assert [mock.nodes[wire].type for wire in rig['wires']] == ['wire', 'wire']
+    #parts are found by their connections, not their names
+    for part, name in ((rig['meta'], 'someMeta'), (rig['surface'], 'someSurface'), (rig['skinnedCurve'], 'someCurve'),
+            (rig['skinJoints'][2], 'someJoint'), (rig['ctrls'][0], 'someCtrl')):
+        mock.rename(part, name)
+    found = curveRigger.getRig(crv)
+    assert found['meta'] == 'someMeta'
+    assert found['surface'] == 'someSurface' and found['skinnedCurve'] == 'someCurve'
+    assert found['skinJoints'][2] == 'someJoint' and found['ctrls'][0] == 'someCtrl'
+    for node in (crv, 'someMeta', 'someJoint', 'someCtrl', found['wires'][1], found['lod']):
+        assert curveRigger.getRig(node) == found
+    assert curveRigger.getRig(geo) is None
+    assert curveRigger.getRig('missing') is None
+    #and tools go through it
+    tool.updateRig(crv, numJoints=8)
+    assert curveRigger.getRig(crv)['skinJoints'][:3] == ['cab_driverJoint00', 'cab_driverJoint01', 'someJoint']
+
+
+def bindGeoOnly(mock, tool, crv, geo, geoBind='wire'):
+    '''press Bind Geo Only with the curve and geo fields filled in'''
+    tool.widgets = {'curveNameGrp': 'curveField', 'geoNameGrp': 'geoField', 'geoBindGrp': 'geoBindMenu'}
+    mock.uiValues.update({'curveField': crv, 'geoField': geo, 'geoBindMenu': geoBind})
+    tool.wireOnly()
+
+
+def test_bind_geo_only_finds_the_rig(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=6, numCtrls=3)
+    rig = curveRigger.getRig(crv)
+    assert rig['wires'] == []
+    skinned = mock.rename(rig['skinnedCurve'], 'someCurve')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    bindGeoOnly(mock, tool, crv, geo)
+    wire, = curveRigger.getRig(crv)['wires']
+    assert mock.connections[wire + '.deformedWire[0]'].startswith(skinned)
+    #listed on the rig, so found from the wire too
+    assert curveRigger.getRig(wire)['rig'] == 'cab_Rig'
+    other = benchmark.makeGeo('otherGeo', crv, rings=20)
+    bindGeoOnly(mock, tool, crv, other, 'skin')
+    assert len(curveRigger.getRig(crv)['geoSkins']) == 1
+
+
+def test_bind_geo_only_on_a_rig_without_metadata(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=6, numCtrls=3)
+    #rigs from before the metadata node are found by name
+    mock.delete('cab_RigMeta')
+    assert curveRigger.getRig(crv) is None
+    with pytest.raises(RuntimeError):
+        tool.findRig(crv)
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    with pytest.raises(RuntimeError):
+        bindGeoOnly(mock, tool, crv, geo, 'skin')
+    bindGeoOnly(mock, tool, crv, geo)
+    assert mock.nodes['cab_wire'].type == 'wire'
+    assert mock.connections['cab_wire.deformedWire[0]'].startswith('cab_skinned')
+    mock.rename('cab_skinned', 'someCurve')
+    with pytest.raises(RuntimeError):
+        bindGeoOnly(mock, tool, crv, benchmark.makeGeo('otherGeo', crv, rings=20))
+
+
+def test_skinned_geo_refuses_a_proxy_chain(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    before = set(mock.nodes)
+    with pytest.raises(RuntimeError):
+        tool.rigFromCurve(crv, geo=geo, numJoints=10, proxyJoints=3, geoBind='skin')
+    with pytest.raises(RuntimeError):
+        tool.startBuild(crv, geo=geo, numJoints=10, proxyJoints=3, geoBind='skin')
+    assert set(mock.nodes) == before
+    tool.rigFromCurve(crv, numJoints=10, proxyJoints=3)
+    with pytest.raises(RuntimeError):
+        tool.bindGeo(crv, geo, tool.findRig(crv), 'skin', tool.rigSettings(crv + '_Rig'))
+
+
+def test_update_refuses_a_proxy_chain_under_skinned_geo(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    tool.rigFromCurve(crv, geo=geo, numJoints=10, geoBind='skin')
+    with pytest.raises(RuntimeError):
+        tool.updateRig(crv, proxyJoints=3)
+    assert tool.rigSettings(crv + '_Rig')['proxyJoints'] == 0
+
+
+def sceneGraph(mock, prefix):
+    '''the nodes named prefix* as {name: (type, parent, attrs)}, and the
+    connections into them as {destination: source}. Sources with default
+    names (skinCluster1...) go by their type, which doesn't depend on what
+    else is in the scene.
+    '''
+    def plug(src):
+        node, attr = src.split('.', 1)
+        return src if node.startswith(prefix) else mock.nodes[node].type + '.' + attr
+    nodes = dict((name, (node.type, node.parent.name if node.parent else None, node.attrs))
+        for name, node in mock.nodes.items() if name.startswith(prefix))
+    connections = dict((dst, plug(src)) for dst, src in mock.connections.items() if dst.startswith(prefix))
+    return nodes, connections
+
+
+@pytest.mark.parametrize('attachMode', ['classic', 'matrix'])
+def test_clone_matches_a_fresh_build(mock, tool, tmp_path, attachMode):
+    settings = dict(numJoints=12, numCtrls=4, attachMode=attachMode, proxyJoints=3, falloff='linear')
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, **settings)
+    built = sceneGraph(mock, 'cab')
+    mock.reset()
+    tool.rigFromCurve(benchmark.makeCurve('tpl'), **settings)
+    path = str(tmp_path / 'template.json')
+    tool.captureTemplate('tpl').save(path)
+    template = rigPlan.PlanTemplate.load(path)
+    assert template.info['settings']['numJoints'] == 12
+    tool.cloneRig(template, benchmark.makeCurve('cab'))
+    assert sceneGraph(mock, 'cab') == built
+
+
+UPDATE_FROM = dict(numSpans=8, numJoints=8, numCtrls=4, stripWidth=1.0, ctrlWidth=2.0, uMin=0.0, uMax=1.0,
+    attachMode='classic', falloff='closest', proxyJoints=3, stretchSamples=0)
+UPDATE_TO = dict(numSpans=6, numJoints=5, numCtrls=3, stripWidth=2.0, ctrlWidth=3.0, uMin=0.1, uMax=0.9,
+    attachMode='matrix', falloff='linear', proxyJoints=4, stretchSamples=8)
+
+
+def riggedGraph(mock, tool, **settings):
+    '''a wired rig with settings, as sceneGraph returns it but leaving out
+    values set on plugs that are connected since Maya doesn't use them, and
+    the controls' CVs
+    '''
+    crv = benchmark.makeCurve('cab')
+    geo = benchmark.makeGeo('cabGeo', crv, rings=20)
+    if 'update' in settings:
+        tool.rigFromCurve(crv, geo=geo, **UPDATE_FROM)
+        tool.updateRig(crv, **settings['update'])
+    else:
+        tool.rigFromCurve(crv, geo=geo, **settings)
+    nodes, connections = sceneGraph(mock, 'cab')
+    for name, (kind, parent, attrs) in nodes.items():
+        attrs = dict((attr, value) for attr, value in attrs.items() if '%s.%s' % (name, attr) not in connections)
+        nodes[name] = (kind, parent, attrs)
+    cvs = [mock.getAttr(ctrl + '.cv[*]') for ctrl in curveRigger.getRig(crv)['ctrls']]
+    return nodes, connections, cvs
+
+
+@pytest.mark.parametrize('attr', curveRigger.RIG_SETTINGS)
+def test_update_matches_a_fresh_build(mock, tool, attr):
+    settings = dict(UPDATE_FROM)
+    settings[attr] = UPDATE_TO[attr]
+    nodes, connections, cvs = riggedGraph(mock, tool, **settings)
+    mock.reset()
+    updated, updatedConnections, updatedCvs = riggedGraph(mock, tool, update={attr: UPDATE_TO[attr]})
+    assert updatedConnections == connections
+    assert sorted(updated) == sorted(nodes)
+    for name in nodes:
+        assert updated[name] == nodes[name], name
+    assert np.allclose(updatedCvs, cvs)
+
+
+def test_sampled_stretch(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=10, numCtrls=4, stretchSamples=8)
+    rig = curveRigger.getRig(crv)
+    types = sorted(mock.nodes[node].type for node in rig['lengthNodes'])
+    assert types == ['distanceBetween'] * 7 + ['plusMinusAverage'] + ['pointOnSurfaceInfo'] * 8
+    assert not [node for node in mock.nodes.values() if node.type == 'curveInfo']
+    #the rest length is the polyline's too, so the rig is still at rest
+    rest = curveGeometry.readSurface(rig['surface']).isoCurve(0.5).chordLength(8)
+    assert np.isclose(mock.getAttr(rig['stretchBlender'] + '.c1r'), rest)
+    assert mock.listConnections(rig['stretch'] + '.input2X', s=True, d=False) == ['cab_driverSurfCrvLength']
+    with pytest.raises(RuntimeError):
+        tool.rigFromCurve(benchmark.makeCurve('other'), stretchSamples=1)
+
+
+def test_update_switches_stretch_measure(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=10, numCtrls=4, stretchSamples=6)
+    built = sceneGraph(mock, 'cab')
+    tool.updateRig(crv, stretchSamples=0)
+    assert [mock.nodes[node].type for node in curveRigger.getRig(crv)['lengthNodes']] == ['curveInfo']
+    tool.updateRig(crv, stretchSamples=6)
+    assert sceneGraph(mock, 'cab') == built
+
+
+def test_compare_stretch(mock, tool):
+    crv = benchmark.makeCurve('cab')
+    tool.rigFromCurve(crv, numJoints=10, numCtrls=4, stretchSamples=6)
+    built = sceneGraph(mock, 'cab')
+    timings = tool.compareStretch(crv, samples=(4, 16), start=1, end=10)
+    assert sorted(timings) == [0, 4, 16]
+    assert all(timing['frames'] == 10 for timing in timings.values())
+    assert tool.rigSettings('cab_Rig')['stretchSamples'] == 6
+    assert sceneGraph(mock, 'cab') == built
+
+
+def test_bundle_cables_ride_the_guide(mock, tool):
+    guide = benchmark.makeCurve('guide')
+    cable = benchmark.makeCurve('cable', 0.3)
+    geo = benchmark.makeGeo('cableGeo', cable, rings=20)
+    tool.rigBundle(guide, [{'crv': cable, 'geo': geo}], numJoints=6, numCtrls=3)
+    rig = curveRigger.getRig(guide)
+    cableRig = curveRigger.getRig(cable)
+    assert rig['bundleCables'] == [cableRig['meta']]
+    assert cableRig['bundle'] == rig['meta']
+    for attr in curveRigger.BUNDLE_SHARED:
+        assert cableRig[attr] == rig[attr]
+    assert [mock.listRelatives(jnt, p=True)[0] for jnt in cableRig['skinJoints']] == rig['skinJoints']
+    assert cableRig['wires'] == ['cable_wire']
+    with pytest.raises(RuntimeError):
+        tool.updateRig(cable, numJoints=4)
+
+
+def test_bundle_refuses_a_proxy_chain(mock, tool):
+    guide = benchmark.makeCurve('guide')
+    cable = benchmark.makeCurve('cable', 0.3)
+    geo = benchmark.makeGeo('cableGeo', cable, rings=20)
+    before = set(mock.nodes)
+    with pytest.raises(RuntimeError):
+        tool.rigBundle(guide, [{'crv': cable, 'geo': geo}], numJoints=6, numCtrls=3, proxyJoints=3)
+    assert set(mock.nodes) == before
+
+
+@pytest.mark.parametrize('attachMode', ['classic', 'matrix'])
+def test_modifier_executor_builds_the_same_rig(mock, tool, attachMode):
+    settings = dict(numJoints=8, numCtrls=3, attachMode=attachMode, proxyJoints=3)
+    tool.rigFromCurve(benchmark.makeCurve('cab'), **settings)
+    built = sceneGraph(mock, 'cab')
+    mock.reset()
+    tool.executor = rigPlan.ModifierExecutor()
+    tool.rigFromCurve(benchmark.makeCurve('cab'), **settings)
+    assert sceneGraph(mock, 'cab') == built
+    assert curveRigger.getRig('cab')['skinJoints'] == ['cab_driverJoint%02d' % i for i in range(8)]
+
+
+def test_chunked_build_profiles_only_its_steps(mock, tool, monkeypatch):
+    import maya.cmds as cmds
+    import rigProfile
+    tool.profiler = rigProfile.BuildProfiler(count=True)
+    tool.startBuild(benchmark.makeCurve('cab'), chunk=5, numJoints=20, numCtrls=4)
+    runChunks(mock)
+    alone = tool.buildInfo['total']
+    mock.reset()
+    #an hour passes between steps, and the user makes a node
+    clock = [time.time]
+    monkeypatch.setattr(time, 'time', lambda: clock[0]() + 3600.0 * len(clock) - 3600.0)
+
+    def idle(steps):
+        clock.append(None)
+        cmds.createNode('transform', n='userNode%d' % steps)
+    tool.startBuild(benchmark.makeCurve('cab'), chunk=5, numJoints=20, numCtrls=4)
+    assert runChunks(mock, idle) > 3
+    total = tool.buildInfo['total']
+    assert total['seconds'] < 3600.0
+    #the user's node and the idle queue's commands aren't the build's
+    assert (total['commands'], total['nodes']) == (alone['commands'], alone['nodes'])
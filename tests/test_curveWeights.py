@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+import benchmark
+import curveGeometry
+import curveWeights
+
+LINE = curveGeometry.NurbsCurve([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]],
+    curveGeometry.fullKnots([0, 0, 0, 1, 1, 1]), 3)
+
+
+def test_falloff_profiles():
+    d = np.array([0.0, 0.5, 1.0, 1.5, 2.0, 3.0])
+    assert np.allclose(curveWeights.falloff(d, 'linear'), [1.0, 0.5, 0.0, 0.0, 0.0, 0.0])
+    assert np.allclose(curveWeights.falloff(d, 'smoothstep'), [1.0, 0.5, 0.0, 0.0, 0.0, 0.0])
+    assert np.allclose(curveWeights.falloff(d, 'bspline'), [2.0 / 3.0, 23.0 / 48.0, 1.0 / 6.0, 1.0 / 48.0, 0.0, 0.0])
+    #symmetric, and the bspline kernel is continuous where its pieces meet
+    for profile in curveWeights.FALLOFFS:
+        assert np.allclose(curveWeights.falloff(-d, profile), curveWeights.falloff(d, profile))
+    assert np.isclose(curveWeights.falloff(1.0 - 1e-9, 'bspline'), curveWeights.falloff(1.0, 'bspline'))
+    with pytest.raises(ValueError):
+        curveWeights.falloff(d, 'cosine')
+
+
+@pytest.mark.parametrize('profile', curveWeights.FALLOFFS)
+def test_weights_are_normalized(profile):
+    influences = [0.0, 0.1, 0.5, 0.55, 1.0]
+    weights = curveWeights.computeWeights(np.linspace(0.0, 1.0, 101), influences, profile)
+    assert weights.shape == (101, 5)
+    assert np.allclose(weights.sum(axis=1), 1.0)
+    assert (weights >= 0.0).all()
+
+
+def test_weights_at_influences():
+    influences = [0.0, 0.25, 0.5, 1.0]
+    weights = curveWeights.computeWeights(influences, influences, 'linear')
+    assert np.allclose(weights, np.eye(4))
+    #halfway between two influences, however far apart they are
+    weights = curveWeights.computeWeights([0.75], influences, 'linear')
+    assert np.allclose(weights, [[0.0, 0.0, 0.5, 0.5]])
+
+
+def test_weights_follow_influence_order():
+    fractions = np.linspace(0.0, 1.0, 17)
+    influences = np.array([0.0, 0.3, 0.6, 1.0])
+    order = [2, 0, 3, 1]
+    weights = curveWeights.computeWeights(fractions, influences, 'bspline')
+    shuffled = curveWeights.computeWeights(fractions, influences[order], 'bspline')
+    assert np.allclose(shuffled, weights[:, order])
+
+
+def test_max_influences():
+    weights = curveWeights.computeWeights(np.linspace(0.0, 1.0, 33), np.linspace(0.0, 1.0, 6), 'bspline', maxInfluences=2)
+    assert ((weights > 0).sum(axis=1) <= 2).all()
+    assert np.allclose(weights.sum(axis=1), 1.0)
+
+
+def test_one_influence():
+    assert np.allclose(curveWeights.computeWeights([0.0, 0.4, 1.0], [0.5]), 1.0)
+
+
+def test_fractions_on_a_line():
+    assert np.allclose(curveWeights.cvFractions(LINE), [0.0, 1.0 / 3.0, 2.0 / 3.0, 1.0])
+    points = [[0.75, 1.0, 0.0], [3.0, 0.0, 2.0], [-1.0, 0.0, 0.0]]
+    assert np.allclose(curveWeights.pointFractions(LINE, points), [0.25, 1.0, 0.0])
+
+
+def test_strip_fractions_repeat_across_u():
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, 4), np.linspace(0.0, 3.0, 4), indexing='ij')
+    surface = curveGeometry.NurbsSurface(np.stack((v, u, 0.0 * u), axis=2), LINE.knots, LINE.knots, 3, 3)
+    assert np.allclose(curveWeights.stripFractions(surface), np.tile([0.0, 1.0 / 3.0, 2.0 / 3.0, 1.0], 4))
+
+
+def skinnedCurve(mock):
+    '''a test curve skinned to three joints, and the joints'''
+    crv = benchmark.makeCurve('crv')
+    joints = [mock.createNode('joint', n='jnt%d' % i) for i in range(3)]
+    return mock.skinCluster(joints + [crv])[0], joints
+
+
+def test_write_and_read_weights(mock):
+    skin, joints = skinnedCurve(mock)
+    weights = curveWeights.computeWeights(np.linspace(0.0, 1.0, 16), [0.0, 0.5, 1.0])
+    curveWeights.writeWeights(skin, weights)
+    found, names = curveWeights.readWeights(skin)
+    assert names == joints
+    assert np.allclose(found, weights)
+    #named influences only, the rest are cleared
+    curveWeights.writeWeights(skin, np.ones((16, 1)), ['jnt2'])
+    found, names = curveWeights.readWeights(skin)
+    assert np.allclose(found, [[0.0, 0.0, 1.0]] * 16)
+
+
+def test_write_weights_checks_its_input(mock):
+    skin, joints = skinnedCurve(mock)
+    with pytest.raises(ValueError):
+        curveWeights.writeWeights(skin, np.ones((16, 1)), ['nobody'])
+    with pytest.raises(ValueError):
+        curveWeights.writeWeights(skin, np.ones((16, 2)), ['jnt0'])
+    with pytest.raises(ValueError):
+        curveWeights.writeWeights(skin, np.ones((15, 3)))
+
+
+def test_export_and_import_weights(mock, tmp_path):
+    skin, joints = skinnedCurve(mock)
+    weights = curveWeights.computeWeights(np.linspace(0.0, 1.0, 16), [0.0, 0.5, 1.0], 'smoothstep')
+    curveWeights.writeWeights(skin, weights)
+    path = str(tmp_path / 'weights.npz')
+    curveWeights.exportWeights(skin, path)
+    curveWeights.writeWeights(skin, np.zeros((16, 3)))
+    curveWeights.importWeights(skin, path)
+    #kept as float32 on disk
+    assert np.allclose(curveWeights.readWeights(skin)[0], weights, atol=1e-6)
@@ -0,0 +1,176 @@
+import pytest
+
+import rigPlan
+
+
+def smallPlan(value=2.0):
+    plan = rigPlan.BuildPlan('cab')
+    top = plan.createNode('transform', 'cab_Rig')
+    plan.addAttr(top, 'stretchAmount', dv=1.0)
+    node = plan.createNode('multiplyDivide', 'cab_Stretch')
+    plan.setAttr(node + '.input1X', value)
+    plan.setAttr(top + '.translate', (1.0, 2.0, 3.0))
+    plan.connectAttr(top + '.stretchAmount', node + '.input2X')
+    return plan
+
+
+def test_plan_ops():
+    plan = smallPlan()
+    assert plan.counts() == {'createNode': 2, 'addAttr': 1, 'setAttr': 2, 'connectAttr': 1}
+    assert plan.nodeCount() == 2
+    #tuples are kept as lists, so plans match after a trip through JSON
+    assert plan.phase('setAttr')[1]['value'] == [1.0, 2.0, 3.0]
+    plan.constrain('parentConstraint', 'cab_Rig', 'cab_Stretch')
+    assert plan.nodeCount() == 3
+    other = rigPlan.BuildPlan()
+    other.extend(plan)
+    assert other.ops == plan.ops
+
+
+def test_plan_json(tmp_path):
+    plan = smallPlan()
+    again = rigPlan.BuildPlan.fromJson(plan.toJson())
+    assert (again.name, again.ops) == (plan.name, plan.ops)
+    path = str(tmp_path / 'plan.json')
+    plan.save(path)
+    assert rigPlan.BuildPlan.load(path).ops == plan.ops
+
+
+def test_diff_plans():
+    assert rigPlan.diffPlans(smallPlan(), smallPlan()) == []
+    diff = rigPlan.diffPlans(smallPlan(2.0), smallPlan(3.0), 'before', 'after')
+    assert diff[:2] == ['--- before', '+++ after']
+    removed = [line for line in diff if line.startswith('-') and not line.startswith('---')]
+    added = [line for line in diff if line.startswith('+') and not line.startswith('+++')]
+    assert len(removed) == len(added) == 1
+    assert '2.0' in removed[0] and '3.0' in added[0]
+
+
+def test_template_instances():
+    plan = smallPlan()
+    plan.setAttr('cab_Rig.rotate', [0.0, 90.0, 0.0], geometric=True)
+    plan.connectAttr('world.message', 'cab_Rig.nope')
+    template = rigPlan.PlanTemplate(plan, 'cab', {'settings': {'numJoints': 4}})
+    other = template.instance('wire')
+    assert other.name == 'wire'
+    assert other.ops == plan.renamed('cab', 'wire').ops
+    assert [op['name'] for op in other.phase('createNode')] == ['wire_Rig', 'wire_Stretch']
+    #names from outside the plan are left alone
+    assert other.ops[-1] == {'op': 'connectAttr', 'src': 'world.message', 'dst': 'wire_Rig.nope'}
+    assert [op for op in other.ops if op.get('geometric')] == [
+        {'op': 'setAttr', 'plug': 'wire_Rig.rotate', 'value': [0.0, 90.0, 0.0], 'geometric': True}]
+    #instances are copies
+    other.ops[0]['name'] = 'changed'
+    assert template.instance('wire').ops[0]['name'] == 'wire_Rig'
+    again = rigPlan.PlanTemplate.fromJson(template.toJson())
+    assert again.info == template.info
+    assert again.instance('wire').ops == template.instance('wire').ops
+
+
+def test_resolve():
+    names = {'cab_Rig': 'cab_Rig1'}
+    assert rigPlan.resolve(names, 'cab_Rig') == 'cab_Rig1'
+    assert rigPlan.resolve(names, 'cab_Rig.translateX') == 'cab_Rig1.translateX'
+    assert rigPlan.resolve(names, 'other.tx') == 'other.tx'
+
+
+def test_cmds_executor(mock):
+    names = rigPlan.CmdsExecutor().execute(smallPlan())
+    assert sorted(names) == ['cab_Rig', 'cab_Stretch']
+    assert mock.getAttr(names['cab_Stretch'] + '.input1X') == 2.0
+    assert mock.listConnections(names['cab_Stretch'] + '.input2X', s=True, d=False, p=True) == [names['cab_Rig'] + '.stretchAmount']
+
+
+def test_cmds_executor_steps(mock):
+    plan = smallPlan()
+    names = dict()
+    done = list(rigPlan.CmdsExecutor().steps(plan, names, chunk=2))
+    assert done == [2, 4, 6]
+    assert sorted(names) == ['cab_Rig', 'cab_Stretch']
+
+
+def test_cmds_executor_rolls_back(mock):
+    mine = mock.createNode('transform', n='mine')
+    plan = smallPlan()
+    plan.connectAttr('nowhere.output', 'cab_Stretch.input1Y')
+    with pytest.raises(RuntimeError):
+        rigPlan.CmdsExecutor().execute(plan)
+    assert sorted(mock.nodes) == [mine]
+
+
+def test_mel_flags():
+    assert rigPlan._melFlags({'at': 'message', 'm': True}) == '-at "message" -m'
+    assert rigPlan._melFlags({'dv': 1.5, 'k': True, 'm': False}) == '-dv 1.5 -k 1'
+
+
+def fullPlan():
+    '''smallPlan with every kind of op'''
+    plan = smallPlan()
+    plan.addAttr('cab_Rig', 'parts', at='message', m=True)
+    plan.addAttr('cab_Rig', 'mode', at='enum', en='a:b', dv=1)
+    plan.connectAttr('cab_Stretch.message', 'cab_Rig.parts[0]')
+    jnt = plan.createNode('joint', 'cab_Joint', parent='cab_Rig')
+    loc = plan.createNode('transform', 'cab_Loc')
+    plan.createNode('locator', 'cab_LocShape', parent=loc)
+    plan.setAttr(loc + 'Shape.localScale', [2.0, 2.0, 2.0])
+    plan.setAttr(jnt + '.offsetParentMatrix', [float(i) for i in range(16)], 'matrix')
+    plan.setAttr(jnt + '.segmentScaleCompensate', False)
+    plan.parent(loc, 'cab_Rig')
+    plan.constrain('parentConstraint', loc, jnt)
+    return plan
+
+
+def test_modifier_executor_matches_cmds(mock):
+    names = rigPlan.CmdsExecutor().execute(fullPlan())
+    built = dict((name, (node.type, node.parent and node.parent.name, node.attrs, node.userAttrs))
+        for name, node in mock.nodes.items())
+    connections = dict(mock.connections)
+    mock.reset()
+    assert rigPlan.ModifierExecutor().execute(fullPlan()) == names
+    assert dict((name, (node.type, node.parent and node.parent.name, node.attrs, node.userAttrs))
+        for name, node in mock.nodes.items()) == built
+    assert mock.connections == connections
+    assert mock.nodes['cab_Rig'].userAttrs['parts'] == {'at': 'message', 'm': True}
+
+
+def test_modifier_executor_rolls_back(mock):
+    mine = mock.createNode('transform', n='mine')
+    plan = fullPlan()
+    plan.connectAttr('nowhere.output', 'cab_Stretch.input1Y')
+    with pytest.raises(RuntimeError):
+        rigPlan.ModifierExecutor().execute(plan)
+    assert sorted(mock.nodes) == [mine]
+    assert not mock.connections
+
+
+def test_mock_mel_knows_switches(mock):
+    node = mock.createNode('network', n='meta')
+    #what ModifierExecutor used to write, -multi takes no value
+    with pytest.raises(RuntimeError):
+        mock.mel('addAttr -ln "parts" -at "message" -m 1 "meta"')
+    mock.mel('addAttr -ln "parts" -at "message" -m "meta"')
+    assert mock.nodes[node].userAttrs['parts'] == {'at': 'message', 'm': True}
+
+
+def test_journal_notes_nodes_while_started(mock):
+    before = mock.createNode('transform', n='before')
+    journal = rigPlan.NodeJournal()
+    first = mock.createNode('transform', n='first')
+    journal.stop()
+    between = mock.createNode('transform', n='between')
+    journal.start()
+    second = mock.createNode('multiplyDivide', n='second')
+    journal.stop()
+    assert mock.ls(journal.created()) == [first, second]
+    journal.rollback()
+    assert sorted(mock.nodes) == sorted([before, between])
+
+
+def test_journal_rollback_skips_deleted_nodes(mock):
+    journal = rigPlan.NodeJournal()
+    nodes = [mock.createNode('transform', n='node%d' % i) for i in range(3)]
+    mock.delete(nodes[1])
+    assert len(journal.created()) == 3
+    journal.rollback()
+    assert journal.callback is None
+    assert not mock.nodes
@@ -0,0 +1,75 @@
+import pstats
+import time
+
+import rigProfile
+
+
+class Clock(object):
+    '''a time.time that only moves when told to'''
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_pause_leaves_out_time_and_counts(mock, monkeypatch):
+    import maya.cmds as cmds
+    clock = Clock()
+    monkeypatch.setattr(time, 'time', clock)
+    profiler = rigProfile.BuildProfiler(count=True)
+    profiler.begin()
+    with profiler.stage('network'):
+        clock.now += 1.0
+        cmds.createNode('transform', n='built')
+    profiler.pause()
+    clock.now += 50.0
+    cmds.createNode('transform', n='between')
+    profiler.resume()
+    clock.now += 0.5
+    cmds.createNode('transform', n='after')
+    report = profiler.end()
+    assert report['total'] == {'seconds': 1.5, 'commands': 2, 'nodes': 2}
+    assert report['stages'] == [('network', {'seconds': 1.0, 'commands': 1, 'nodes': 1}),
+        ('other', {'seconds': 0.5, 'commands': 1, 'nodes': 1})]
+
+
+def profiledBuild(tool, profiler):
+    import benchmark
+    tool.profiler = profiler
+    tool.rigFromCurve(benchmark.makeCurve('cab'), numJoints=6, numCtrls=3)
+    return tool.buildInfo
+
+
+def test_profile_a_build(mock, tool):
+    import maya.cmds as cmds
+    createNode = cmds.createNode
+    info = profiledBuild(tool, rigProfile.BuildProfiler(count=True, profile=True))
+    stages = dict(info['stages'])
+    assert [name for name, totals in info['stages']] == ['strip', 'ctrlCurves', 'geometry', 'plan', 'network',
+        'stripSkin', 'skinnedCurve', 'other']
+    #the stages add up to the build
+    for key in rigProfile.STAT_KEYS:
+        assert abs(sum(totals[key] for totals in stages.values()) - info['total'][key]) < 1e-6
+    #planning is numpy only, the network is where the nodes are made
+    assert stages['geometry']['commands'] == stages['plan']['commands'] == 0
+    assert stages['network']['nodes'] == max(totals['nodes'] for totals in stages.values())
+    assert info['total']['commands'] > info['total']['nodes'] > 0
+    assert info['total']['nodes'] >= len([name for name in mock.nodes if name.startswith('cab_')])
+    #cProfile ran over the build's own functions
+    assert isinstance(info['profile'], pstats.Stats)
+    assert any(func[2] == 'buildSteps' for func in info['profile'].stats)
+    #and maya.cmds is itself again afterwards
+    assert cmds.createNode is createNode
+    assert not mock.nodeAddedCallbacks
+
+
+def test_profile_without_counts(mock, tool):
+    info = profiledBuild(tool, rigProfile.BuildProfiler())
+    assert info['profile'] is None
+    assert info['total']['seconds'] > 0
+    assert all(totals['commands'] is None and totals['nodes'] is None for name, totals in info['stages'])
+    lines = rigProfile.formatReport(info, 'cab build').splitlines()
+    assert lines[:2] == ['cab build', 'stage            seconds  commands   nodes']
+    assert lines[-1].split()[0] == 'total' and lines[-1].split()[2:] == ['-', '-']
+    assert len(lines) == len(info['stages']) + 3